@@ -0,0 +1,142 @@
+"""Admission control: per-class concurrency limits with bounded wait queues.
+
+Every request is sorted into a priority class (or exempted) by a classifier.
+A classifier can also give a single route its own AdmissionClass, for
+per-route limits on expensive endpoints. Each class admits up to `concurrency` requests at a time and queues up to
+`queue_size` more, FIFO, for at most `queue_timeout` seconds. Anything beyond
+that is shed at once with 503 and a Retry-After header instead of piling up
+behind work it would time out waiting for, which keeps latency bounded under
+overload. Classes have separate slots, so a flood of expensive writes cannot
+take the slots cheap reads need; exempt requests (health checks, metrics,
+long-lived streams) are never limited.
+
+Environment:
+    ADMISSION_CONTROL     0 disables admission control (default 1)
+    ADMISSION_<CLASS>     "concurrency,queue_size,queue_timeout" overriding a
+                          class's (or route's) limits, e.g. ADMISSION_WRITE=8,32,2.0
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Callable, Deque, Optional
+
+from app.core.metrics import REGISTRY, Counter, Histogram
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "1") != "0"
+
+ADMISSION_WAIT = REGISTRY.register(Histogram(
+    "pesaprime_admission_wait_seconds",
+    "Time admitted requests waited for a slot, by admission class",
+    ("class",),
+))
+ADMISSION_REJECTED = REGISTRY.register(Counter(
+    "pesaprime_admission_rejected_total",
+    "Requests shed by admission control, by class and reason (queue_full, timeout)",
+    ("class", "reason"),
+))
+
+
+class AdmissionClass:
+    def __init__(self, name: str, concurrency: int, queue_size: int, queue_timeout: float):
+        override = os.getenv(f"ADMISSION_{name.upper()}")
+        if override:
+            concurrency, queue_size, queue_timeout = override.split(",")
+        self.name = name
+        self.concurrency = int(concurrency)
+        self.queue_size = int(queue_size)
+        self.queue_timeout = float(queue_timeout)
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout))
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot, waiting in the queue if needed; the reason on rejection, else None"""
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            return None
+        if len(self.waiters) >= self.queue_size:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as we gave up on it: pass it on
+                self.release()
+            else:
+                self._discard(waiter)
+            if isinstance(exc, asyncio.TimeoutError):
+                return "timeout"
+            raise
+        # release() handed its slot straight to us, so `active` already counts it
+        return None
+
+    def release(self):
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _discard(self, waiter: asyncio.Future):
+        try:
+            self.waiters.remove(waiter)
+        except ValueError:
+            pass
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying admission control to HTTP requests.
+
+    `classify(method, path)` returns the request's AdmissionClass, or None to
+    exempt it.
+    """
+
+    def __init__(self, app, classify: Callable[[str, str], Optional[AdmissionClass]],
+                 enabled: bool = ADMISSION_CONTROL):
+        self.app = app
+        self.classify = classify
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        admission = self.classify(scope["method"], scope["path"])
+        if admission is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        rejected = await admission.acquire()
+        if rejected is not None:
+            ADMISSION_REJECTED.inc(1, admission.name, rejected)
+            await _overloaded(send, admission.retry_after)
+            return
+        ADMISSION_WAIT.observe(time.perf_counter() - started, admission.name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release()
+
+
+async def _overloaded(send, retry_after: int):
+    body = b'{"detail":"Server is busy, retry shortly"}'
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
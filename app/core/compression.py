@@ -0,0 +1,169 @@
+"""gzip/brotli response compression.
+
+CompressionMiddleware compresses JSON, text and CSV bodies of at least
+COMPRESSION_MIN_SIZE bytes with the best encoding the client accepts
+(brotli when the optional `brotli` package is installed, else gzip).
+Streaming bodies are compressed incrementally. Responses that already carry
+a Content-Encoding pass through untouched, which is how pre-compressed
+bodies (the shared market snapshot) skip per-request compression.
+Server-sent event streams are never compressed, since buffering would
+delay events. A strong ETag on a compressed response is made weak, since it
+was computed for the uncompressed bytes.
+
+Environment:
+    COMPRESSION_MIN_SIZE  smallest body worth compressing (default 1024)
+    GZIP_LEVEL            1-9 (default 6)
+    BROTLI_QUALITY        0-11 (default 4; higher is much slower)
+"""
+import gzip
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+NEVER_COMPRESS_TYPES = ("text/event-stream",)
+
+
+def supported_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the preferred supported encoding allowed by an Accept-Encoding header"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in supported_encodings():
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    return (content_type.startswith(COMPRESSIBLE_TYPES)
+            and not content_type.startswith(NEVER_COMPRESS_TYPES))
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            # wbits=31 produces a gzip container
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def process(self, data: bytes) -> bytes:
+        return self._brotli.process(data) if self._brotli else self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        return self._brotli.finish() if self._brotli else self._zlib.flush()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressionResponder(send, encoding, self.minimum_size).send)
+
+
+class _CompressionResponder:
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.compressor: Optional[_StreamCompressor] = None
+        self.passthrough = False
+
+    def _should_compress(self, status: int, headers: MutableHeaders, body: bytes, more_body: bool) -> bool:
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        if not is_compressible(headers.get("content-type", "")):
+            return False
+        if more_body:
+            content_length = headers.get("content-length")
+            return content_length is None or int(content_length) >= self.minimum_size
+        return len(body) >= self.minimum_size
+
+    async def send(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # Hold the headers until the first body chunk shows whether to compress
+            self.start_message = message
+            return
+        if message_type != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            if not self._should_compress(start["status"], headers, body, more_body):
+                self.passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag is not None and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            if not more_body:
+                body = compress(body, self.encoding)
+                headers["Content-Length"] = str(len(body))
+                await self._send(start)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+
+            if "content-length" in headers:
+                del headers["content-length"]
+            self.compressor = _StreamCompressor(self.encoding)
+            await self._send(start)
+
+        data = self.compressor.process(body)
+        if not more_body:
+            data += self.compressor.finish()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -0,0 +1,141 @@
+"""Per-user equity snapshots for portfolio value charts.
+
+Snapshots are 16-byte records (timestamp, user, equity) appended to a
+binary log, with users interned in a `.users` side file as in the position
+store. A user's index is their line number in that file; new users are
+appended under an exclusive lock after reading the lines other writers added,
+so two workers can never give one index to different users. A user's value is only recorded when it changed, or when the last
+recorded point is older than `max_gap`, so idle accounts cost almost nothing.
+
+Readers keep the records sorted by (user, time), which makes a range query
+two binary searches. Records appended since the last sort (by this or
+another worker) are picked up by reading the log from the last offset read,
+and are merged into the sorted index once enough of them accumulate.
+"""
+import fcntl
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+EQUITY_DTYPE = np.dtype([("ts", "<u4"), ("user", "<u4"), ("equity", "<f8")])
+
+# Pending records merged into the sorted index once there are this many
+_MERGE_THRESHOLD = 65536
+
+
+class EquityStore:
+    def __init__(self, path: str, max_gap: float = 86400):
+        self.path = path
+        self.users_path = f"{path}.users"
+        self.max_gap = max_gap
+        self.users: List[str] = []
+        self.user_index: Dict[str, int] = {}
+        # Sorted by (user, ts), with the slice of each user
+        self.sorted = np.empty(0, dtype=EQUITY_DTYPE)
+        self._user_starts = np.zeros(1, dtype=np.intp)
+        self.pending = np.empty(0, dtype=EQUITY_DTYPE)
+        self._offset = 0
+        self._users_offset = 0
+        # user -> (ts, equity) of the last recorded point, to skip unchanged values
+        self._last: Dict[int, Tuple[int, float]] = {}
+        self.refresh()
+        self._merge()
+
+    def __len__(self):
+        return len(self.sorted) + len(self.pending)
+
+    def _read_users(self):
+        if not os.path.exists(self.users_path):
+            return
+        with open(self.users_path) as f:
+            f.seek(self._users_offset)
+            data = f.read()
+        # Only whole lines; a concurrent writer may be mid-line
+        complete = data[:data.rfind("\n") + 1]
+        for phone_number in complete.splitlines():
+            self.user_index[phone_number] = len(self.users)
+            self.users.append(phone_number)
+        self._users_offset += len(complete.encode())
+
+    def refresh(self):
+        """Read whatever was appended to the log since the last call"""
+        self._read_users()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        usable = len(data) - len(data) % EQUITY_DTYPE.itemsize
+        if not usable:
+            return
+        records = np.frombuffer(data[:usable], dtype=EQUITY_DTYPE)
+        self._offset += usable
+        for user, ts, equity in zip(records["user"].tolist(), records["ts"].tolist(), records["equity"].tolist()):
+            self._last[user] = (ts, equity)
+        self.pending = np.concatenate([self.pending, records])
+        if len(self.pending) >= _MERGE_THRESHOLD:
+            self._merge()
+
+    def _merge(self):
+        records = np.concatenate([self.sorted, self.pending])
+        self.sorted = records[np.lexsort((records["ts"], records["user"]))]
+        self.pending = np.empty(0, dtype=EQUITY_DTYPE)
+        self._user_starts = np.searchsorted(self.sorted["user"], np.arange(len(self.users) + 1))
+
+    def _intern(self, phone_numbers) -> List[int]:
+        """Indexes of the users, appending the ones not yet in the side file"""
+        if any(phone_number not in self.user_index for phone_number in phone_numbers):
+            with open(self.users_path, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # Lines appended by other writers come first and fix their indexes
+                    self._read_users()
+                    f.write("".join(f"{phone_number}\n" for phone_number in dict.fromkeys(phone_numbers)
+                                    if phone_number not in self.user_index))
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            self._read_users()
+        return [self.user_index[phone_number] for phone_number in phone_numbers]
+
+    def record(self, timestamp: int, equities: Dict[str, float]) -> int:
+        """Append a snapshot of every user's equity, skipping unchanged values; returns records written"""
+        self.refresh()
+        users, values = [], []
+        for user, equity in zip(self._intern(list(equities)), equities.values()):
+            last = self._last.get(user)
+            if last is not None and abs(last[1] - equity) < 0.005 and timestamp - last[0] < self.max_gap:
+                continue
+            users.append(user)
+            values.append(equity)
+        if not users:
+            return 0
+        records = np.empty(len(users), dtype=EQUITY_DTYPE)
+        records["ts"] = timestamp
+        records["user"] = users
+        records["equity"] = values
+        # One write in append mode, so concurrent writers cannot interleave records
+        with open(self.path, "ab") as f:
+            f.write(records.tobytes())
+        self.refresh()
+        return len(records)
+
+    def series(self, phone_number: str, start: Optional[float] = None,
+               end: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, equity) of the user's points in [start, end], oldest first"""
+        self.refresh()
+        user = self.user_index.get(phone_number)
+        if user is None:
+            return np.empty(0, dtype=np.uint32), np.empty(0)
+        if user + 1 < len(self._user_starts):
+            records = self.sorted[self._user_starts[user]:self._user_starts[user + 1]]
+        else:
+            records = self.sorted[:0]
+        if len(self.pending):
+            # Pending records are newer than anything already sorted
+            records = np.concatenate([records, self.pending[self.pending["user"] == user]])
+        ts = records["ts"]
+        lo = 0 if start is None else np.searchsorted(ts, start, side="left")
+        hi = len(ts) if end is None else np.searchsorted(ts, end, side="right")
+        return ts[lo:hi], records["equity"][lo:hi]
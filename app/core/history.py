@@ -0,0 +1,146 @@
+"""Per-asset price history: tick ring buffers and OHLC candles.
+
+PriceHistory keeps the last `capacity` ticks of every asset in one
+preallocated (capacity, assets) array used as a ring buffer, plus a running
+sum over the last `window` ticks. Recording a tick and reading the moving
+average, the change over the buffered history and the trend are all O(1)
+per asset, and nothing is reallocated as ticks arrive.
+
+Candles are maintained the same way. Every resolution has its own ring of
+(open, high, low, close) bars that each tick updates in place, so serving
+bars is a slice, not an aggregation over raw ticks.
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Candle resolutions served by the candles endpoint, in seconds
+RESOLUTIONS = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600}
+
+
+class CandleSeries:
+    def __init__(self, resolution: int, asset_count: int, capacity: int = 500):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.starts = np.zeros(capacity)
+        # (bar, asset, open/high/low/close)
+        self.bars = np.zeros((capacity, asset_count, 4))
+        self.head = -1
+        self.count = 0
+
+    def update(self, timestamp: float, prices: np.ndarray):
+        bucket = timestamp - timestamp % self.resolution
+        if self.count and bucket <= self.starts[self.head]:
+            bar = self.bars[self.head]
+            np.maximum(bar[:, 1], prices, out=bar[:, 1])
+            np.minimum(bar[:, 2], prices, out=bar[:, 2])
+            bar[:, 3] = prices
+            return
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.starts[self.head] = bucket
+        self.bars[self.head] = prices[:, None]
+
+    def latest(self, column: int, limit: int) -> List[dict]:
+        """Up to `limit` most recent bars of one asset, oldest first"""
+        limit = min(limit, self.count)
+        rows = [(self.head - i) % self.capacity for i in range(limit - 1, -1, -1)]
+        return [
+            {"time": int(self.starts[row]), "open": round(float(o), 4), "high": round(float(h), 4),
+             "low": round(float(l), 4), "close": round(float(c), 4)}
+            for row, (o, h, l, c) in zip(rows, self.bars[rows, column])
+        ]
+
+
+class PriceHistory:
+    def __init__(self, asset_ids: Sequence[str], capacity: int = 720, window: int = 20,
+                 resolutions: Optional[Dict[str, int]] = None, candle_capacity: int = 500):
+        if not 0 < window <= capacity:
+            raise ValueError("window must be between 1 and capacity")
+        self.asset_ids = list(asset_ids)
+        self.columns = {asset_id: i for i, asset_id in enumerate(self.asset_ids)}
+        self.capacity = capacity
+        self.window = window
+        self.ticks = np.zeros((capacity, len(self.asset_ids)))
+        self.timestamps = np.zeros(capacity)
+        self.head = -1
+        self.count = 0
+        self.window_sum = np.zeros(len(self.asset_ids))
+        self.last_timestamp: Optional[float] = None
+        self.candles = {
+            name: CandleSeries(seconds, len(self.asset_ids), candle_capacity)
+            for name, seconds in (resolutions or RESOLUTIONS).items()
+        }
+
+    def __len__(self):
+        return self.count
+
+    def vector(self, prices: Dict[str, float]) -> np.ndarray:
+        """Prices by column; assets missing from `prices` keep their last price"""
+        vector = self.ticks[self.head].copy() if self.count else np.zeros(len(self.asset_ids))
+        for asset_id, price in prices.items():
+            column = self.columns.get(asset_id)
+            if column is not None:
+                vector[column] = price
+        return vector
+
+    def _ago(self, ticks: int) -> np.ndarray:
+        """Prices `ticks` ticks before the latest one (requires ticks < count)"""
+        return self.ticks[(self.head - ticks) % self.capacity]
+
+    def _window_after(self, prices: np.ndarray):
+        """(window sum, window length) once `prices` is recorded"""
+        if self.count >= self.window:
+            return self.window_sum + prices - self._ago(self.window - 1), self.window
+        return self.window_sum + prices, self.count + 1
+
+    def _oldest_after(self, prices: np.ndarray) -> np.ndarray:
+        """Oldest buffered prices once `prices` is recorded"""
+        if self.count == 0:
+            return prices
+        if self.count >= self.capacity:
+            return self._ago(self.capacity - 2) if self.capacity > 1 else prices
+        return self._ago(self.count - 1)
+
+    def stats(self, prices: Dict[str, float]) -> Dict[str, dict]:
+        """moving_average, change_percentage and trend per asset as they would be with `prices` recorded"""
+        vector = self.vector(prices)
+        window_sum, window_length = self._window_after(vector)
+        moving_average = window_sum / window_length
+        oldest = self._oldest_after(vector)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = np.where(oldest > 0, (vector / oldest - 1) * 100, 0.0)
+        return {
+            asset_id: {
+                "moving_average": float(moving_average[column]),
+                "change_percentage": float(change[column]),
+                "trend": "up" if vector[column] >= moving_average[column] else "down",
+            }
+            for asset_id, column in self.columns.items() if asset_id in prices
+        }
+
+    def record(self, timestamp: float, prices: Dict[str, float]) -> bool:
+        """Append a tick; ticks not newer than the last recorded one are ignored"""
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            return False
+        vector = self.vector(prices)
+        self.window_sum, _ = self._window_after(vector)
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.ticks[self.head] = vector
+        self.timestamps[self.head] = timestamp
+        self.last_timestamp = timestamp
+        if self.head == 0 and self.count >= self.window:
+            # Re-sum once per lap so floating-point error cannot accumulate
+            self.window_sum = sum(self._ago(i) for i in range(self.window))
+        for series in self.candles.values():
+            series.update(timestamp, vector)
+        return True
+
+    def candle_bars(self, asset_id: str, resolution: str, limit: int = 100) -> Optional[List[dict]]:
+        """Latest OHLC bars for an asset, None if the asset or resolution is unknown"""
+        column = self.columns.get(asset_id)
+        series = self.candles.get(resolution)
+        if column is None or series is None:
+            return None
+        return series.latest(column, limit)
@@ -0,0 +1,314 @@
+"""Idempotency-Key support for endpoints that move money.
+
+A client that retries a POST with the same Idempotency-Key header gets the
+response of the first execution replayed instead of the request running
+again. Keys are scoped to the authenticated user, and remembered with a
+fingerprint of the request (method, path, body): reusing a key for a
+different request is rejected with 422.
+
+- The first request with a key claims it and runs. Duplicates arriving
+  while it runs wait for it (up to `wait` seconds, then 409) and then replay
+  its response.
+- Only 2xx responses are stored. After an error (insufficient balance, a
+  crash) the claim is released, so a retry runs again.
+- Replays carry an `Idempotent-Replayed: true` header.
+
+Stored responses live in an idempotency store:
+
+- LocalIdempotencyStore: in process, LRU-bounded with a TTL.
+- SQLIdempotencyStore: an `idempotency_keys` table, so a retry that lands
+  on another worker is still recognized, and concurrent duplicates in
+  different workers still run once.
+
+Environment:
+    IDEMPOTENCY_TTL_SECONDS   how long responses are replayable (default 86400)
+    IDEMPOTENCY_MAX_ENTRIES   responses kept by the in-process store (default 10000)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Collection, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Column, Float, Integer, LargeBinary, MetaData, String, Table, Text, text
+from starlette.datastructures import Headers
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+MAX_KEY_LENGTH = 255
+
+# An unfinished claim older than this is assumed abandoned (its worker died)
+_CLAIM_TTL = 60.0
+_POLL_SECONDS = 0.05
+_SWEEP_EVERY = 1024
+
+
+class KeyReused(Exception):
+    """The key was already used for a different request"""
+
+
+class KeyInFlight(Exception):
+    """The request holding the key did not finish in time"""
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+
+
+class LocalIdempotencyStore:
+    def __init__(self, max_entries: int = IDEMPOTENCY_MAX_ENTRIES, ttl: float = IDEMPOTENCY_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (expires at, response), least recently used first
+        self.completed: "OrderedDict[str, Tuple[float, StoredResponse]]" = OrderedDict()
+        # key -> (fingerprint, resolved when the claim is completed or released)
+        self.pending: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    def __len__(self):
+        return len(self.completed)
+
+    def _lookup(self, key: str) -> Optional[StoredResponse]:
+        entry = self.completed.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self.completed[key]
+            return None
+        self.completed.move_to_end(key)
+        return entry[1]
+
+    async def claim(self, key: str, fingerprint: str, wait: float) -> Optional[StoredResponse]:
+        """The stored response for `key`, or None once the caller owns the key and must
+        complete() or release() it"""
+        deadline = time.monotonic() + wait
+        while True:
+            stored = self._lookup(key)
+            if stored is not None:
+                if stored.fingerprint != fingerprint:
+                    raise KeyReused
+                return stored
+            pending = self.pending.get(key)
+            if pending is None:
+                self.pending[key] = (fingerprint, asyncio.get_running_loop().create_future())
+                return None
+            if pending[0] != fingerprint:
+                raise KeyReused
+            try:
+                await asyncio.wait_for(asyncio.shield(pending[1]), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                raise KeyInFlight from None
+
+    def complete(self, key: str, response: StoredResponse):
+        self.completed[key] = (time.monotonic() + self.ttl, response)
+        self.completed.move_to_end(key)
+        while len(self.completed) > self.max_entries:
+            self.completed.popitem(last=False)
+        self._finish(key)
+
+    def release(self, key: str):
+        self._finish(key)
+
+    def _finish(self, key: str):
+        pending = self.pending.pop(key, None)
+        if pending is not None and not pending[1].done():
+            pending[1].set_result(None)
+
+
+metadata = MetaData()
+
+idempotency_keys = Table(
+    "idempotency_keys",
+    metadata,
+    Column("key", String(512), primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+    # NULL until the request holding the claim completes
+    Column("status", Integer),
+    Column("headers", Text),
+    Column("body", LargeBinary),
+    Column("expires_at", Float, nullable=False, index=True),
+)
+
+_CLAIM = text(
+    "INSERT INTO idempotency_keys (key, fingerprint, expires_at) VALUES (:key, :fingerprint, :expires_at) "
+    "ON CONFLICT (key) DO NOTHING"
+)
+_SELECT = text("SELECT fingerprint, status, headers, body, expires_at FROM idempotency_keys WHERE key = :key")
+_COMPLETE = text(
+    "UPDATE idempotency_keys SET status = :status, headers = :headers, body = :body, expires_at = :expires_at "
+    "WHERE key = :key"
+)
+_RELEASE = text("DELETE FROM idempotency_keys WHERE key = :key AND status IS NULL")
+_EXPIRE = text("DELETE FROM idempotency_keys WHERE key = :key AND expires_at < :now")
+_SWEEP = text("DELETE FROM idempotency_keys WHERE expires_at < :now")
+
+
+class SQLIdempotencyStore:
+    """Claims and responses shared by every worker using the same database"""
+
+    def __init__(self, engine, ttl: float = IDEMPOTENCY_TTL_SECONDS):
+        self.engine = engine
+        self.ttl = ttl
+        self._claims = 0
+        metadata.create_all(engine)
+
+    def _try_claim(self, key: str, fingerprint: str):
+        """(claimed, row of the existing entry); a write transaction"""
+        now = time.time()
+        self._claims += 1
+        with self.engine.begin() as conn:
+            if self._claims % _SWEEP_EVERY == 0:
+                conn.execute(_SWEEP, {"now": now})
+            else:
+                conn.execute(_EXPIRE, {"key": key, "now": now})
+            if conn.execute(_CLAIM, {"key": key, "fingerprint": fingerprint,
+                                     "expires_at": now + _CLAIM_TTL}).rowcount:
+                return True, None
+            return False, conn.execute(_SELECT, {"key": key}).first()
+
+    def _read(self, key: str):
+        with self.engine.connect() as conn:
+            return conn.execute(_SELECT, {"key": key}).first()
+
+    async def claim(self, key: str, fingerprint: str, wait: float) -> Optional[StoredResponse]:
+        deadline = time.monotonic() + wait
+        claimed, row = self._try_claim(key, fingerprint)
+        while True:
+            if claimed:
+                return None
+            if row is not None:
+                stored_fingerprint, status, headers, body, _ = row
+                if stored_fingerprint != fingerprint:
+                    raise KeyReused
+                if status is not None:
+                    return StoredResponse(stored_fingerprint, status, [tuple(h) for h in json.loads(headers)],
+                                          bytes(body))
+            if time.monotonic() >= deadline:
+                raise KeyInFlight
+            # Held by a request in another worker (or this one): poll with plain reads until it finishes,
+            # and only try to claim again (a write) once the claim is gone or abandoned
+            await asyncio.sleep(_POLL_SECONDS)
+            row = self._read(key)
+            if row is None or row[4] < time.time():
+                claimed, row = self._try_claim(key, fingerprint)
+
+    def complete(self, key: str, response: StoredResponse):
+        with self.engine.begin() as conn:
+            conn.execute(_COMPLETE, {"key": key, "status": response.status, "headers": json.dumps(response.headers),
+                                     "body": response.body, "expires_at": time.time() + self.ttl})
+
+    def release(self, key: str):
+        with self.engine.begin() as conn:
+            conn.execute(_RELEASE, {"key": key})
+
+
+def create_idempotency_store(shared: bool):
+    """SQLIdempotencyStore when workers share the database (DATA_BACKEND=sql), else a local store"""
+    if not shared:
+        return LocalIdempotencyStore()
+    from app.database import engine
+    return SQLIdempotencyStore(engine)
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware honoring Idempotency-Key on POSTs to `paths`.
+
+    `identify(headers)` returns the authenticated user the key is scoped to,
+    or None to let the request through untouched (the endpoint rejects it).
+    """
+
+    def __init__(self, app, paths: Collection[str], identify: Callable[[Headers], Optional[str]],
+                 store, wait: float = 10.0):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.identify = identify
+        self.store = store
+        self.wait = wait
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        key = headers.get("idempotency-key")
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not 0 < len(key) <= MAX_KEY_LENGTH:
+            await _error(send, 400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+            return
+        user = self.identify(headers)
+        if user is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Buffer the (small) body to fingerprint it, then hand it to the app unchanged
+        messages, body = [], b""
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+        fingerprint = hashlib.sha256(b"%s %s\n%s" % (scope["method"].encode(), scope["path"].encode(), body)).hexdigest()
+
+        scoped_key = f"{user}:{key}"
+        try:
+            stored = await self.store.claim(scoped_key, fingerprint, self.wait)
+        except KeyReused:
+            await _error(send, 422, "Idempotency-Key was already used for a different request")
+            return
+        except KeyInFlight:
+            await _error(send, 409, "A request with this Idempotency-Key is still in progress", retry_after=1)
+            return
+        if stored is not None:
+            await _replay(send, stored)
+            return
+
+        async def buffered_receive():
+            return messages.pop(0) if messages else await receive()
+
+        status, response_headers, chunks = 0, [], []
+
+        async def capture(message):
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = [(name.decode("latin-1"), value.decode("latin-1"))
+                                    for name, value in message.get("headers", [])]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, buffered_receive, capture)
+        except BaseException:
+            self.store.release(scoped_key)
+            raise
+        if 200 <= status < 300:
+            self.store.complete(scoped_key, StoredResponse(fingerprint, status, response_headers, b"".join(chunks)))
+        else:
+            self.store.release(scoped_key)
+
+
+async def _replay(send, stored: StoredResponse):
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in stored.headers]
+    headers.append((b"idempotent-replayed", b"true"))
+    await send({"type": "http.response.start", "status": stored.status, "headers": headers})
+    await send({"type": "http.response.body", "body": stored.body})
+
+
+async def _error(send, status: int, detail: str, retry_after: Optional[int] = None):
+    body = json.dumps({"detail": detail}).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if retry_after is not None:
+        headers.append((b"retry-after", str(retry_after).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
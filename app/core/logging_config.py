@@ -0,0 +1,121 @@
+"""Structured, non-blocking logging.
+
+Request code only pays for building a LogRecord, merging its arguments into
+the message and a put_nowait() onto a bounded queue; formatting (JSON,
+tracebacks) and writing happen on a QueueListener thread. When the queue is
+full, records are dropped rather than blocking the event loop, and counted in
+the pesaprime_log_records_dropped_total metric. High-frequency events pass `extra={"sample_rate": ...}` and are
+kept with that probability.
+
+Environment:
+    LOG_LEVEL        root level (default INFO)
+    LOG_LEVELS       per-module overrides, e.g. "app.main=DEBUG,uvicorn.access=WARNING"
+    LOG_FORMAT       json (default) or text
+    LOG_QUEUE_SIZE   max records buffered before dropping (default 10000)
+    LOG_SAMPLE_RATE  default sample rate for high-frequency events (default 0.01)
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from datetime import datetime, timezone
+
+from app.core.metrics import LOG_RECORDS_DROPPED
+
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line; `extra` fields become top-level keys"""
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep records carrying a `sample_rate` extra with that probability"""
+
+    def filter(self, record):
+        rate = getattr(record, "sample_rate", None)
+        return rate is None or rate >= 1 or random.random() < rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The stdlib prepare() formats the whole record here, on the logging
+        # thread. Only resolve the arguments, which the caller may mutate after
+        # the call; the listener's formatter does the rest, exc_info included.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+
+
+def parse_levels(spec: str):
+    """Parse "module=LEVEL,module=LEVEL" into a dict"""
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """Install the queue-based handler on the root logger (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    stream_handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json") == "json":
+        stream_handler.setFormatter(JSONFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    for name, level in parse_levels(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
@@ -0,0 +1,213 @@
+"""Shared market price snapshots.
+
+Prices are regenerated at most once per refresh window (PRICE_REFRESH_SECONDS)
+and every request inside the window sees the same PriceSnapshot. The
+snapshot carries a monotonically increasing version and serializes its
+JSON body once, so the market endpoints hand out the same bytes to every
+client until the next refresh.
+
+snapshot_response() adds HTTP caching on top: an ETag derived from the
+snapshot version and body (plus the content coding, so each encoding of the
+body has its own strong ETag), Last-Modified at generation time, max-age equal
+to the time left in the window, and 304s for matching conditional requests.
+It also serves the body pre-compressed, compressing once per snapshot and
+encoding rather than once per request.
+
+With a shared document store (several workers), PriceCache publishes each
+snapshot to the store, and a worker whose snapshot expires adopts one
+another worker already published for the new window. All workers therefore
+quote, and trade at, the same prices. A worker publishing the next window
+generates it from the last published snapshot (passed to `generate` when
+another worker published it), so the workers extend one price path rather
+than each following its own.
+
+Within a worker, a refresh is single-flight: requests that find the snapshot
+expired while a refresh is already running wait for that refresh.
+"""
+import hashlib
+import math
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Awaitable, Callable, List, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.core.compression import COMPRESSION_MIN_SIZE, choose_encoding, compress
+from app.core.responses import RawJSONResponse, dumps
+from app.utils.singleflight import SingleFlight
+
+
+class PriceSnapshot:
+    __slots__ = ("version", "assets", "generated_at", "expires_at", "_body", "_by_id", "_etag", "_encoded")
+
+    def __init__(self, version: int, assets: List[dict], ttl: float, generated_at: Optional[float] = None):
+        self.version = version
+        self.assets = assets
+        self.generated_at = time.time() if generated_at is None else generated_at
+        self.expires_at = time.monotonic() + ttl
+        self._body: Optional[bytes] = None
+        self._by_id: Optional[dict] = None
+        self._etag: Optional[str] = None
+        self._encoded: dict = {}
+
+    @property
+    def body(self) -> bytes:
+        """The asset list as JSON, serialized once per snapshot"""
+        if self._body is None:
+            self._body = dumps(self.assets)
+        return self._body
+
+    def encoded_body(self, encoding: str) -> bytes:
+        """The body compressed with `encoding`, compressed once per snapshot"""
+        encoded = self._encoded.get(encoding)
+        if encoded is None:
+            encoded = self._encoded[encoding] = compress(self.body, encoding)
+        return encoded
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        """Strong ETag of the body as sent with `encoding` (None: uncompressed); the body digest
+        keeps it unique across workers whose versions overlap"""
+        if self._etag is None:
+            digest = hashlib.blake2b(self.body, digest_size=8).hexdigest()
+            self._etag = f"p{self.version}-{digest}"
+        return f'"{self._etag}-{encoding}"' if encoding else f'"{self._etag}"'
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.generated_at, usegmt=True)
+
+    def max_age(self) -> int:
+        """Seconds left in this snapshot's refresh window"""
+        return max(0, math.ceil(self.expires_at - time.monotonic()))
+
+    @property
+    def prices(self) -> dict:
+        """asset id -> current price"""
+        return {asset_id: asset["current_price"] for asset_id, asset in self.by_id.items()}
+
+    @property
+    def by_id(self) -> dict:
+        if self._by_id is None:
+            self._by_id = {asset["id"]: asset for asset in self.assets}
+        return self._by_id
+
+    def get(self, asset_id: str) -> Optional[dict]:
+        return self.by_id.get(asset_id)
+
+    def is_fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+
+class PriceCache:
+    """Hold the current snapshot and regenerate it once it expires.
+
+    `generate(previous)` produces the next asset list. `previous` is the last
+    published asset list if another worker published it, else None (continue
+    from this process's own state).
+
+    `store` and `document` name a shared document store to publish snapshots
+    through (see the module docstring); without them the cache is per process.
+    """
+
+    def __init__(self, generate: Callable[[Optional[List[dict]]], Awaitable[List[dict]]], ttl: float,
+                 store=None, document: Optional[str] = None):
+        self.generate = generate
+        self.ttl = ttl
+        self.store = store
+        self.document = document
+        self.version = 0
+        # Version of the last shared snapshot this process generated itself
+        self._published = 0
+        self.snapshot: Optional[PriceSnapshot] = None
+        # Requests arriving while a refresh is in flight wait for it instead of starting their own
+        self._refreshes = SingleFlight()
+
+    async def refresh(self) -> PriceSnapshot:
+        if self.store is None:
+            assets = await self.generate(None)
+            self.version += 1
+            self.snapshot = PriceSnapshot(self.version, assets, self.ttl)
+            return self.snapshot
+
+        shared = self.store.load(self.document)
+        if shared and shared["expires_at"] > time.time():
+            return self._adopt(shared)
+        base_version = shared["version"] if shared else 0
+        previous = shared["assets"] if shared and base_version != self._published else None
+        assets = await self.generate(previous)
+        return self._publish(assets, base_version)
+
+    def _publish(self, assets: List[dict], base_version: int) -> PriceSnapshot:
+        """Publish `assets` as the successor of `base_version`, unless another worker
+        published first; use whichever is current"""
+        with self.store.transaction():
+            shared = self.store.load(self.document)
+            now = time.time()
+            if (shared or {}).get("version", 0) == base_version and (not shared or shared["expires_at"] <= now):
+                shared = {
+                    "version": base_version + 1,
+                    "generated_at": now,
+                    "expires_at": now + self.ttl,
+                    "assets": assets,
+                }
+                self.store.save(shared, self.document)
+                self._published = shared["version"]
+        return self._adopt(shared)
+
+    def _adopt(self, shared: dict) -> PriceSnapshot:
+        now = time.time()
+        self.version = shared["version"]
+        self.snapshot = PriceSnapshot(self.version, shared["assets"], shared["expires_at"] - now,
+                                      generated_at=shared["generated_at"])
+        return self.snapshot
+
+    async def get(self) -> PriceSnapshot:
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.is_fresh():
+            return snapshot
+        return await self._refreshes.do("refresh", self.refresh)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    # If-None-Match uses weak comparison
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _not_modified_since(if_modified_since: str, generated_at: float) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(generated_at) <= since
+
+
+def snapshot_response(request: Request, snapshot: PriceSnapshot) -> Response:
+    """Serve the snapshot body with caching headers, or 304 if the client's copy is current"""
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if len(snapshot.body) < COMPRESSION_MIN_SIZE:
+        encoding = None
+    etag = snapshot.etag(encoding)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": snapshot.last_modified,
+        "Cache-Control": f"public, max-age={snapshot.max_age()}",
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        not_modified = if_modified_since is not None and _not_modified_since(if_modified_since, snapshot.generated_at)
+
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+        return RawJSONResponse(snapshot.encoded_body(encoding), headers=headers)
+    return RawJSONResponse(snapshot.body, headers=headers)
@@ -0,0 +1,213 @@
+"""In-process request and hot-path metrics, exposed in Prometheus text format.
+
+MetricsMiddleware records a latency histogram per route. span()/timed() wrap
+the hot paths (JSON store I/O, price generation, revaluation, password
+hashing, DB queries): each span feeds a per-stage histogram and, when it runs
+inside a request, adds its time to that route's per-stage breakdown. Spans
+nest, so a stage's time includes the stages it calls.
+"""
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, labels, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic float counter keyed by a tuple of label values"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, [('le', le)])} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {series[-1]}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "pesaprime_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route", "status"),
+))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "pesaprime_stage_duration_seconds",
+    "Latency of instrumented hot-path stages",
+    ("stage", "target"),
+))
+REQUEST_STAGE_SECONDS = REGISTRY.register(Counter(
+    "pesaprime_request_stage_seconds_total",
+    "Time spent in each stage while serving a route (nested stages overlap)",
+    ("route", "stage"),
+))
+LOG_RECORDS_DROPPED = REGISTRY.register(Counter(
+    "pesaprime_log_records_dropped_total",
+    "Log records dropped because the logging queue was full",
+))
+# Exposed as 0 before the first drop
+LOG_RECORDS_DROPPED.inc(0)
+
+# Per-request stage totals, set by MetricsMiddleware for the duration of a request
+_request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_stages", default=None)
+
+
+def record_stage(stage: str, target: str, seconds: float):
+    """Record a finished stage in the histogram and the current request's breakdown"""
+    STAGE_LATENCY.observe(seconds, stage, target)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def span(stage: str, target: str = ""):
+    """Time the enclosed block as `stage`"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, target, time.perf_counter() - started)
+
+
+def timed(stage: str):
+    """Decorator form of span() for sync and async functions"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and per-stage breakdowns.
+
+    The route label is the matched path template (e.g.
+    /api/wallet/balance/{phone_number}) so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stages: Dict[str, float] = {}
+        token = _request_stages.set(stages)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_LATENCY.observe(elapsed, scope["method"], route, str(status_code))
+            for stage, seconds in stages.items():
+                REQUEST_STAGE_SECONDS.inc(seconds, route, stage)
+            _request_stages.reset(token)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
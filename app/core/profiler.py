@@ -0,0 +1,73 @@
+"""Thread-based sampling profiler for the live worker.
+
+A sampler thread wakes every `interval` seconds, reads the current stack of
+the target threads via sys._current_frames() and counts each stack in
+collapsed form ("outer;inner;leaf"), the input format of flamegraph.pl and
+speedscope. Nothing runs between profiles, so the idle cost is zero.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Iterable, Optional
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Sample the stacks of `thread_ids` (all other threads if None) until stopped"""
+
+    def __init__(self, interval: float = 0.005, thread_ids: Optional[Iterable[int]] = None, max_depth: int = 128):
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self, own_ident: int):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_ident or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                continue
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.reverse()
+            self.stacks[";".join(labels)] += 1
+        self.samples += 1
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        started = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            self._sample(own_ident)
+        self.duration = time.perf_counter() - started
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def collapsed(self) -> str:
+        """Collapsed-stack text, one "stack count" line per distinct stack"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def to_dict(self, limit: Optional[int] = None) -> dict:
+        return {
+            "samples": self.samples,
+            "duration_seconds": round(self.duration, 3),
+            "interval_seconds": self.interval,
+            "stacks": [{"stack": stack, "count": count} for stack, count in self.stacks.most_common(limit)],
+        }
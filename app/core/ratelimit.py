@@ -0,0 +1,141 @@
+"""Token-bucket rate limiting keyed by client IP and by account.
+
+A Limit allows `burst` requests at once and refills at `per_minute` tokens a
+minute. Buckets live in a bucket store:
+
+- LocalBucketStore keeps them in a dict, for one worker (and tests).
+- SQLBucketStore keeps them in a `rate_limits` table, so every worker draws
+  from the same buckets. Refilling and taking a token is one atomic upsert.
+
+A bucket left alone long enough to refill completely is the same as no
+bucket, so both stores drop buckets once they are full again (their TTL);
+memory and table size follow the number of recently active clients.
+
+Environment:
+    RATE_LIMITING       0 disables rate limiting (default 1)
+    RATE_LIMIT_<NAME>   "per_minute,burst" overriding a limit, e.g.
+                        RATE_LIMIT_LOGIN_IP=30,10
+"""
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, bindparam, text
+
+RATE_LIMITING = os.getenv("RATE_LIMITING", "1") != "0"
+
+# Expired buckets are swept every this many takes
+_SWEEP_EVERY = 1024
+
+
+class Limit:
+    def __init__(self, name: str, per_minute: float, burst: int):
+        override = os.getenv(f"RATE_LIMIT_{name.upper()}")
+        if override:
+            per_minute, burst = override.split(",")
+        self.name = name
+        self.rate = float(per_minute) / 60
+        self.burst = int(burst)
+
+    @property
+    def ttl(self) -> float:
+        """Seconds after which an untouched bucket is full again"""
+        return self.burst / self.rate
+
+
+class LocalBucketStore:
+    def __init__(self):
+        # key -> (tokens, updated at, expires at)
+        self.buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._takes = 0
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def take(self, key: str, limit: Limit, now: float, cost: float = 1.0) -> float:
+        """Take `cost` tokens if there are enough; the tokens left, negative (the shortfall) if not"""
+        self._takes += 1
+        if self._takes % _SWEEP_EVERY == 0:
+            self.sweep(now)
+        bucket = self.buckets.get(key)
+        tokens = limit.burst if bucket is None else min(limit.burst, bucket[0] + (now - bucket[1]) * limit.rate)
+        if tokens < cost:
+            return tokens - cost
+        tokens -= cost
+        self.buckets[key] = (tokens, now, now + (limit.burst - tokens) / limit.rate)
+        return tokens
+
+    def sweep(self, now: float):
+        self.buckets = {key: bucket for key, bucket in self.buckets.items() if bucket[2] > now}
+
+
+metadata = MetaData()
+
+rate_limits = Table(
+    "rate_limits",
+    metadata,
+    Column("key", String(255), primary_key=True),
+    Column("tokens", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),
+    Column("expires_at", Float, nullable=False, index=True),
+    # Whether the last take was granted, so the upsert can report it
+    Column("granted", Integer, nullable=False),
+)
+
+_REFILL = "{least}(:burst, rate_limits.tokens + (:now - rate_limits.updated_at) * :rate)"
+_TAKE = (
+    "INSERT INTO rate_limits (key, tokens, updated_at, expires_at, granted) "
+    "VALUES (:key, :burst - :cost, :now, :now + :cost / :rate, 1) "
+    "ON CONFLICT (key) DO UPDATE SET "
+    "granted = CASE WHEN {refill} >= :cost THEN 1 ELSE 0 END, "
+    "tokens = CASE WHEN {refill} >= :cost THEN {refill} - :cost ELSE {refill} END, "
+    "expires_at = :now + (:burst - CASE WHEN {refill} >= :cost THEN {refill} - :cost ELSE {refill} END) / :rate, "
+    "updated_at = :now "
+    "RETURNING tokens, granted"
+)
+_SWEEP = text("DELETE FROM rate_limits WHERE expires_at < :now")
+
+
+class SQLBucketStore:
+    """Buckets shared by every worker using the same database"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        least = "MIN" if engine.dialect.name == "sqlite" else "LEAST"
+        self._take = text(_TAKE.format(refill=_REFILL.format(least=least))).bindparams(
+            *(bindparam(name, type_=Float) for name in ("burst", "cost", "now", "rate")))
+        self._takes = 0
+        metadata.create_all(engine)
+
+    def take(self, key: str, limit: Limit, now: float, cost: float = 1.0) -> float:
+        self._takes += 1
+        with self.engine.begin() as conn:
+            if self._takes % _SWEEP_EVERY == 0:
+                conn.execute(_SWEEP, {"now": now})
+            tokens, granted = conn.execute(self._take, {
+                "key": key, "burst": limit.burst, "cost": cost, "now": now, "rate": limit.rate,
+            }).one()
+        return tokens if granted else tokens - cost
+
+
+def create_bucket_store(shared: bool):
+    """SQLBucketStore when workers share the database (DATA_BACKEND=sql), else a local store"""
+    if not shared:
+        return LocalBucketStore()
+    from app.database import engine
+    return SQLBucketStore(engine)
+
+
+class RateLimiter:
+    def __init__(self, bucket_store, enabled: bool = RATE_LIMITING):
+        self.store = bucket_store
+        self.enabled = enabled
+
+    def check(self, limit: Limit, key: str, cost: float = 1.0) -> Optional[float]:
+        """Take from the bucket of `key` under `limit`; None if allowed, else seconds until it would be"""
+        if not self.enabled:
+            return None
+        tokens = self.store.take(f"{limit.name}:{key}", limit, time.time(), cost)
+        if tokens >= 0:
+            return None
+        return -tokens / limit.rate
@@ -0,0 +1,32 @@
+"""Fast JSON responses.
+
+FastJSONResponse renders with orjson when it is installed (falling back to
+compact stdlib json). Returning it, or RawJSONResponse with bytes that were
+already serialized, from an endpoint bypasses FastAPI's response_model
+re-validation and jsonable_encoder pass, so it is meant for data the app
+produced itself. Keep response_model on the route for the OpenAPI schema.
+"""
+import json
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib
+    orjson = None
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class RawJSONResponse(Response):
+    """Response for a body that is already serialized JSON"""
+    media_type = "application/json"
@@ -0,0 +1,66 @@
+"""Write-time rollups of activity and positions for reports.
+
+Rollups are kept up to date as activity is logged and investments are made,
+so reports never scan the activity or investment history:
+
+    user rollups       one small document per user:
+                       {day: {activity_type: {"count", "amount"}}}
+    platform rollups   {"daily": {day: {activity_type: {"count", "amount"}}},
+                        "assets": {asset_id: {"name", "positions", "units", "invested"}}}
+
+Logging an activity rewrites only the acting user's document and the
+platform document, whose size grows with days and assets, not with users.
+
+Days are UTC dates (YYYY-MM-DD) taken from the ISO timestamps the app
+stores. build_rollups() recomputes both from the history, for first start
+or to repair drift.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+
+
+def _bump(bucket: dict, amount: float, count: int = 1):
+    bucket["count"] = bucket.get("count", 0) + count
+    bucket["amount"] = round(bucket.get("amount", 0.0) + amount, 2)
+
+
+def add_activity(user_days: dict, platform_rollups: dict, activity_type: str, amount: float, timestamp: str):
+    """Count an activity in its user's rollup (`user_days`) and the platform's"""
+    day = timestamp[:10]
+    _bump(user_days.setdefault(day, {}).setdefault(activity_type, {}), amount)
+    _bump(platform_rollups.setdefault("daily", {}).setdefault(day, {}).setdefault(activity_type, {}), amount)
+
+
+def add_position(platform_rollups: dict, asset_id: str, asset_name: str, units: float, invested: float):
+    asset = platform_rollups.setdefault("assets", {}).setdefault(
+        asset_id, {"name": asset_name, "positions": 0, "units": 0.0, "invested": 0.0})
+    asset["positions"] += 1
+    asset["units"] += units
+    asset["invested"] = round(asset["invested"] + invested, 2)
+
+
+def build_rollups(activities: Iterable[dict], investments: Iterable[dict]) -> Tuple[dict, dict]:
+    """({phone: user rollup}, platform rollups) recomputed from the full history"""
+    user_rollups: dict = {}
+    platform_rollups: dict = {"daily": {}, "assets": {}}
+    for activity in activities:
+        add_activity(user_rollups.setdefault(activity["user_phone"], {}), platform_rollups,
+                     activity["activity_type"], activity.get("amount", 0), activity["timestamp"])
+    for investment in investments:
+        if investment.get("status", "active") == "active":
+            add_position(platform_rollups, investment["asset_id"], investment.get("asset_name", ""),
+                         investment.get("units", 0.0), investment.get("invested_amount", 0.0))
+    return user_rollups, platform_rollups
+
+
+def daily_range(days: Dict[str, dict], start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, dict]:
+    """The days in [start, end] (inclusive ISO dates), oldest first"""
+    return {day: days[day] for day in sorted(days) if (start is None or day >= start) and (end is None or day <= end)}
+
+
+def totals(days: Dict[str, dict]) -> Dict[str, dict]:
+    """Per activity type count and amount summed over `days`"""
+    result: Dict[str, dict] = {}
+    for by_type in days.values():
+        for activity_type, bucket in by_type.items():
+            _bump(result.setdefault(activity_type, {}), bucket["amount"], bucket["count"])
+    return result
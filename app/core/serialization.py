@@ -0,0 +1,164 @@
+"""Pluggable serialization for the JSON data store.
+
+Callers keep addressing documents by their canonical ``.json`` path; the
+configured backend decides the bytes on disk:
+
+    json     stdlib json, pretty-printed (the original format)
+    orjson   compact JSON via orjson, same .json files, much faster
+    msgpack  binary snapshot in a sibling .msgpack file
+
+DATA_FORMAT selects the backend ("auto" = orjson when installed, else json).
+Reads always pick the newest existing variant of a document, and a document
+found in a different format is converted to the configured one on the spot,
+so existing .json files migrate automatically (and back, if the format is
+switched again). Writes go to a temporary file and are renamed into place.
+
+DATA_BACKEND selects where documents live: "file" (default, one worker
+only) or "sql", the shared SQLDocumentStore that multiple workers can use.
+"""
+import json
+import os
+from contextlib import nullcontext
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional, only needed for DATA_FORMAT=msgpack
+    msgpack = None
+
+
+def _json_loads(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class JSONBackend:
+    name = "json"
+    extension = ".json"
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj, indent=2).encode()
+
+    def loads(self, data: bytes):
+        return _json_loads(data)
+
+
+class ORJSONBackend(JSONBackend):
+    name = "orjson"
+
+    def dumps(self, obj) -> bytes:
+        return orjson.dumps(obj)
+
+
+class MsgpackBackend:
+    name = "msgpack"
+    extension = ".msgpack"
+
+    def dumps(self, obj) -> bytes:
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def loads(self, data: bytes):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def available_backends():
+    backends = {"json": JSONBackend()}
+    if orjson is not None:
+        backends["orjson"] = ORJSONBackend()
+    if msgpack is not None:
+        backends["msgpack"] = MsgpackBackend()
+    return backends
+
+
+def get_backend(name: str = "auto"):
+    backends = available_backends()
+    if name == "auto":
+        return backends.get("orjson", backends["json"])
+    if name not in backends:
+        raise ValueError(f"Unknown or unavailable data format: {name} (available: {', '.join(backends)})")
+    return backends[name]
+
+
+# Loader for each on-disk extension, independent of the configured backend
+_READERS = {".json": _json_loads}
+if msgpack is not None:
+    _READERS[".msgpack"] = MsgpackBackend().loads
+
+
+class DataStore:
+    """Load and save documents addressed by their canonical .json path"""
+
+    # Only one process may use the files
+    shared = False
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def _variants(filename: str):
+        stem = os.path.splitext(filename)[0]
+        return [(stem + extension, reader) for extension, reader in _READERS.items()]
+
+    def path_for(self, filename: str) -> str:
+        return os.path.splitext(filename)[0] + self.backend.extension
+
+    def _newest(self, filename: str):
+        newest = None
+        for path, reader in self._variants(filename):
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            if newest is None or mtime > newest[0]:
+                newest = (mtime, path, reader)
+        return newest
+
+    def exists(self, filename: str) -> bool:
+        return self._newest(filename) is not None
+
+    def mtime(self, filename: str) -> Optional[float]:
+        newest = self._newest(filename)
+        return newest[0] if newest else None
+
+    def load(self, filename: str, default: Any = None):
+        newest = self._newest(filename)
+        if newest is None:
+            return default
+        _, path, reader = newest
+        with open(path, "rb") as f:
+            data = reader(f.read())
+        if path != self.path_for(filename):
+            # Stored in another format: convert it to the configured one
+            self.save(data, filename)
+        return data
+
+    def transaction(self):
+        """Read-modify-write section. Within one process, code that does not
+        await between load and save already runs atomically on the event loop"""
+        return nullcontext()
+
+    def save(self, data, filename: str):
+        path = self.path_for(filename)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.backend.dumps(data))
+        os.replace(tmp_path, path)
+
+
+def create_store():
+    files = DataStore(get_backend(os.getenv("DATA_FORMAT", "auto")))
+    backend = os.getenv("DATA_BACKEND", "file")
+    if backend == "file":
+        return files
+    if backend != "sql":
+        raise ValueError(f"Unknown data backend: {backend} (expected file or sql)")
+    from app.core.sql_store import SQLDocumentStore
+    from app.database import engine
+    return SQLDocumentStore(engine, files.backend, fallback=files)
+
+
+store = create_store()
@@ -0,0 +1,174 @@
+"""Shared document store in SQL, for running several workers.
+
+The JSON-file DataStore is only safe with a single process: every write
+rewrites a whole document, and two workers would silently overwrite each
+other's changes. SQLDocumentStore keeps the same documents (addressed by
+the same canonical .json paths, encoded with the configured serialization
+backend) as rows of a `documents` table in the DATABASE_URL database
+(SQLite in WAL mode or Postgres).
+
+- transaction() is a cross-worker exclusive section (BEGIN IMMEDIATE on
+  SQLite, a transaction-scoped advisory lock on Postgres). Read-modify-write
+  sequences run inside it, so concurrent requests in other workers cannot
+  interleave with them.
+- Every save bumps the row's version and updated_at. mtime() returns
+  updated_at, which lets callers that cache derived state (the user index,
+  the position store) notice writes made by other workers and reload.
+- Each worker keeps the last encoded body it read per document. A load only
+  transfers the body again when the version changed.
+- Documents missing from the table are imported from the JSON files on
+  first use, so an existing single-worker deployment migrates in place.
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import Column, Float, Integer, LargeBinary, MetaData, String, Table, text
+
+metadata = MetaData()
+
+documents = Table(
+    "documents",
+    metadata,
+    Column("name", String(255), primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("updated_at", Float, nullable=False),
+    Column("body", LargeBinary),
+)
+
+# Connection of the transaction() the current task is in, if any
+_connection: ContextVar = ContextVar("document_store_connection", default=None)
+
+# Postgres advisory lock key for the document store's writer lock
+ADVISORY_LOCK_KEY = 0x70657361
+
+_SELECT = text(
+    "SELECT version, updated_at, CASE WHEN version = :cached THEN NULL ELSE body END "
+    "FROM documents WHERE name = :name"
+)
+# updated_at only moves forward, even if two saves land in the same clock tick
+_UPSERT = text(
+    "INSERT INTO documents (name, version, updated_at, body) VALUES (:name, 1, :now, :body) "
+    "ON CONFLICT (name) DO UPDATE SET body = excluded.body, version = documents.version + 1, "
+    "updated_at = CASE WHEN excluded.updated_at > documents.updated_at "
+    "THEN excluded.updated_at ELSE documents.updated_at + 0.000001 END "
+    "RETURNING version, updated_at"
+)
+_IMPORT = text(
+    "INSERT INTO documents (name, version, updated_at, body) VALUES (:name, 1, :now, :body) "
+    "ON CONFLICT (name) DO NOTHING"
+)
+
+
+class SQLDocumentStore:
+    # Safe to use from several processes at once
+    shared = True
+
+    def __init__(self, engine, backend, fallback=None):
+        self.engine = engine
+        self.backend = backend
+        # File store to import documents from the first time they are read
+        self.fallback = fallback
+        self.dialect = engine.dialect.name
+        # document name -> (version, updated_at, encoded body)
+        self._cache: Dict[str, Tuple[int, float, bytes]] = {}
+        metadata.create_all(engine)
+
+    @staticmethod
+    def document_name(filename: str) -> str:
+        return os.path.splitext(os.path.basename(filename))[0]
+
+    def path_for(self, filename: str) -> str:
+        return filename
+
+    @contextmanager
+    def _connect(self):
+        conn = _connection.get()
+        if conn is not None:
+            yield conn
+            return
+        with self.engine.begin() as conn:
+            yield conn
+
+    @contextmanager
+    def transaction(self):
+        """Exclusive across workers; nested calls join the outer transaction.
+
+        Do not await inside it: the lock is held on a database connection, and
+        another task of the same worker waiting for it would block the event loop.
+        """
+        if _connection.get() is not None:
+            yield
+            return
+        with self.engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            if self.dialect == "sqlite":
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+            else:
+                conn.exec_driver_sql("BEGIN")
+                if self.dialect == "postgresql":
+                    conn.exec_driver_sql(f"SELECT pg_advisory_xact_lock({ADVISORY_LOCK_KEY})")
+            token = _connection.set(conn)
+            try:
+                yield
+            except BaseException:
+                conn.exec_driver_sql("ROLLBACK")
+                # Bodies saved in the transaction never became those versions
+                self._cache.clear()
+                raise
+            else:
+                conn.exec_driver_sql("COMMIT")
+            finally:
+                _connection.reset(token)
+
+    def _fetch(self, name: str) -> Optional[Tuple[int, float, bytes]]:
+        cached = self._cache.get(name)
+        with self._connect() as conn:
+            row = conn.execute(_SELECT, {"name": name, "cached": cached[0] if cached else -1}).first()
+        if row is None:
+            return None
+        version, updated_at, body = row
+        if body is None:
+            body = cached[2]
+        entry = self._cache[name] = (version, updated_at, bytes(body))
+        return entry
+
+    def _import(self, filename: str) -> Optional[Tuple[int, float, bytes]]:
+        """Copy a document that only exists as a file into the table"""
+        if self.fallback is None or not self.fallback.exists(filename):
+            return None
+        data = self.fallback.load(filename)
+        # A no-op if another worker imported it first
+        with self._connect() as conn:
+            conn.execute(_IMPORT, {"name": self.document_name(filename), "now": time.time(),
+                                   "body": self.backend.dumps(data)})
+        return self._fetch(self.document_name(filename))
+
+    def _entry(self, filename: str) -> Optional[Tuple[int, float, bytes]]:
+        return self._fetch(self.document_name(filename)) or self._import(filename)
+
+    def exists(self, filename: str) -> bool:
+        return self._entry(filename) is not None
+
+    def mtime(self, filename: str) -> Optional[float]:
+        with self._connect() as conn:
+            updated_at = conn.execute(text("SELECT updated_at FROM documents WHERE name = :name"),
+                                      {"name": self.document_name(filename)}).scalar()
+        if updated_at is None and self.fallback is not None:
+            return self.fallback.mtime(filename)
+        return updated_at
+
+    def load(self, filename: str, default: Any = None):
+        entry = self._entry(filename)
+        if entry is None:
+            return default
+        return self.backend.loads(entry[2])
+
+    def save(self, data, filename: str):
+        name = self.document_name(filename)
+        body = self.backend.dumps(data)
+        with self._connect() as conn:
+            version, updated_at = conn.execute(_UPSERT, {"name": name, "now": time.time(), "body": body}).one()
+        self._cache[name] = (version, updated_at, body)
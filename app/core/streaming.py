@@ -0,0 +1,185 @@
+"""Fan-out of live price snapshots and portfolio updates to streaming clients.
+
+One ticker publishes each new price snapshot to the Broadcaster, which
+serializes it once and places the same StreamMessage on every subscriber's
+queue, for WebSocket and SSE clients alike. Queues are bounded: when a slow
+consumer falls behind, its oldest pending message is dropped (prices
+supersede each other, so the newest one is what matters). A slow client
+therefore never grows memory or holds up the others.
+
+For authenticated subscribers the PortfolioTracker keeps each user's
+holdings aggregated as units per asset. A tick refreshes the position store
+and builds the price vector once, then costs one dot product per subscribed
+user, and a portfolio message is only sent when the value actually changed.
+"""
+import asyncio
+from typing import Callable, Dict, Iterable, Optional, Set
+
+import numpy as np
+
+from app.core.responses import dumps
+
+
+class StreamMessage:
+    """A message serialized once and shared by every subscriber it is sent to"""
+    __slots__ = ("event", "data", "id", "_sse", "_ws")
+
+    def __init__(self, event: str, payload, id: Optional[int] = None):
+        self.event = event
+        # Already-serialized JSON (a snapshot body) is used as is
+        self.data = (payload if isinstance(payload, bytes) else dumps(payload)).decode()
+        self.id = id
+        self._sse: Optional[bytes] = None
+        self._ws: Optional[str] = None
+
+    @property
+    def sse(self) -> bytes:
+        """Server-sent events frame"""
+        if self._sse is None:
+            frame = f"event: {self.event}\n"
+            if self.id is not None:
+                frame += f"id: {self.id}\n"
+            self._sse = (frame + f"data: {self.data}\n\n").encode()
+        return self._sse
+
+    @property
+    def ws(self) -> str:
+        """WebSocket text frame: {"event": ..., "id": ..., "data": ...}"""
+        if self._ws is None:
+            event_id = "null" if self.id is None else self.id
+            self._ws = f'{{"event":"{self.event}","id":{event_id},"data":{self.data}}}'
+        return self._ws
+
+
+class Subscription:
+    def __init__(self, phone_number: Optional[str], max_pending: int):
+        self.phone_number = phone_number
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self.dropped = 0
+        # event -> newest id offered, so a snapshot sent on connect is not repeated by the next tick
+        self.last_ids: Dict[str, int] = {}
+
+    def offer(self, message: StreamMessage):
+        """Enqueue without blocking, discarding the oldest pending message if full"""
+        if message.id is not None:
+            if message.id <= self.last_ids.get(message.event, -1):
+                return
+            self.last_ids[message.event] = message.id
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[StreamMessage]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broadcaster:
+    def __init__(self, max_pending: int = 8):
+        self.max_pending = max_pending
+        self.subscriptions: Set[Subscription] = set()
+        self.by_phone: Dict[str, Set[Subscription]] = {}
+
+    def __len__(self):
+        return len(self.subscriptions)
+
+    def subscribe(self, phone_number: Optional[str] = None) -> Subscription:
+        subscription = Subscription(phone_number, self.max_pending)
+        self.subscriptions.add(subscription)
+        if phone_number:
+            self.by_phone.setdefault(phone_number, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> bool:
+        """Remove a subscription; True if it was its user's last one"""
+        self.subscriptions.discard(subscription)
+        phone_number = subscription.phone_number
+        if not phone_number or phone_number not in self.by_phone:
+            return False
+        user_subscriptions = self.by_phone[phone_number]
+        user_subscriptions.discard(subscription)
+        if user_subscriptions:
+            return False
+        del self.by_phone[phone_number]
+        return True
+
+    def publish(self, message: StreamMessage):
+        for subscription in self.subscriptions:
+            subscription.offer(message)
+
+    def publish_to(self, phone_number: str, message: StreamMessage):
+        for subscription in self.by_phone.get(phone_number, ()):
+            subscription.offer(message)
+
+    def dropped(self) -> int:
+        return sum(subscription.dropped for subscription in self.subscriptions)
+
+
+class PortfolioTracker:
+    """Per-user aggregated holdings and last pushed value for streaming subscribers"""
+
+    def __init__(self, get_positions: Callable):
+        self.get_positions = get_positions
+        # phone -> (units per asset index, entry value per asset index, total invested)
+        self._holdings: Dict[str, tuple] = {}
+        self._last_value: Dict[str, float] = {}
+        self._positions = None
+
+    def invalidate(self, phone_number: str):
+        self._holdings.pop(phone_number, None)
+
+    def forget(self, phone_number: str):
+        self._holdings.pop(phone_number, None)
+        self._last_value.pop(phone_number, None)
+
+    def _holdings_for(self, store, phone_number: str, asset_count: int):
+        if store is not self._positions:
+            # Rebuilt (e.g. after another worker's writes): every cached aggregate may be stale
+            self._holdings.clear()
+            self._positions = store
+        holdings = self._holdings.get(phone_number)
+        if holdings is None or len(holdings[0]) != asset_count:
+            positions = store.for_user(phone_number)
+            assets = positions["asset"]
+            units = np.bincount(assets, weights=positions["units"], minlength=asset_count)
+            entry_values = np.bincount(assets, weights=positions["units"] * positions["entry_price"],
+                                       minlength=asset_count)
+            invested = float(positions["invested_amount"].sum())
+            holdings = self._holdings[phone_number] = (units, entry_values, invested)
+        return holdings
+
+    def _portfolio(self, store, phone_number: str, price_vector: np.ndarray, force: bool) -> Optional[dict]:
+        units, entry_values, invested = self._holdings_for(store, phone_number, len(price_vector))
+        # Same valuation as PositionStore.totals: assets without a price count at entry
+        value = float(np.where(np.isnan(price_vector), entry_values, units * price_vector).sum())
+        previous = self._last_value.get(phone_number)
+        if not force and previous is not None and abs(value - previous) < 0.005:
+            return None
+        self._last_value[phone_number] = value
+        profit_loss = value - invested
+        return {
+            "current_value": round(value, 2),
+            "invested": round(invested, 2),
+            "profit_loss": round(profit_loss, 2),
+            "percentage": round(profit_loss / invested * 100, 2) if invested else 0.0,
+            "change": round(value - previous, 2) if previous is not None else 0.0,
+        }
+
+    def update(self, phone_number: str, prices: Dict[str, float], force: bool = False) -> Optional[dict]:
+        """The user's portfolio if its value changed since the last push (or `force`), else None"""
+        store = self.get_positions()
+        return self._portfolio(store, phone_number, store.price_vector(prices), force)
+
+    def update_all(self, phone_numbers: Iterable[str], prices: Dict[str, float]) -> Dict[str, dict]:
+        """update() for many users against one store refresh and one price vector; only changed portfolios"""
+        store = self.get_positions()
+        price_vector = store.price_vector(prices)
+        updates = {}
+        for phone_number in phone_numbers:
+            portfolio = self._portfolio(store, phone_number, price_vector, False)
+            if portfolio is not None:
+                updates[phone_number] = portfolio
+        return updates
@@ -0,0 +1,97 @@
+"""Email <-> phone index over the users store.
+
+users.json is keyed by email, so answering "is this phone registered?" used
+to mean scanning every user. The index maps emails to (user id, phone) and
+phones back to emails, is written next to users.json and is reloaded
+from there on startup when it is at least as new as the users file (otherwise
+it is rebuilt from the users themselves).
+"""
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+
+class UserIndex:
+    def __init__(self):
+        # email -> (user id, phone number)
+        self.by_email: Dict[str, Tuple[str, str]] = {}
+        self.by_phone: Dict[str, str] = {}
+        # mtime of the users file this index reflects
+        self.source_mtime: Optional[float] = None
+
+    def __len__(self):
+        return len(self.by_email)
+
+    @classmethod
+    def build(cls, users: dict) -> "UserIndex":
+        index = cls()
+        for user in users.values():
+            if isinstance(user, dict):
+                index.add(user)
+        return index
+
+    def add(self, user: dict):
+        email, user_id, phone_number = user["email"], str(user["id"]), user.get("phone_number")
+        self.remove(email)
+        self.by_email[email] = (user_id, phone_number)
+        if phone_number:
+            self.by_phone[phone_number] = email
+
+    def remove(self, email: str):
+        entry = self.by_email.pop(email, None)
+        if entry:
+            _, phone_number = entry
+            if self.by_phone.get(phone_number) == email:
+                del self.by_phone[phone_number]
+
+    def has_phone(self, phone_number: str) -> bool:
+        return phone_number in self.by_phone
+
+    def phone_for_email(self, email: str) -> Optional[str]:
+        entry = self.by_email.get(email)
+        return entry[1] if entry else None
+
+    def save(self, filename: str):
+        tmp_filename = f"{filename}.tmp"
+        with open(tmp_filename, "w") as f:
+            json.dump({"version": 1, "users": self.by_email}, f, separators=(",", ":"))
+        os.replace(tmp_filename, filename)
+
+    @classmethod
+    def load(cls, filename: str) -> "UserIndex":
+        with open(filename) as f:
+            data = json.load(f)
+        index = cls()
+        for email, (user_id, phone_number) in data["users"].items():
+            index.by_email[email] = (user_id, phone_number)
+            if phone_number:
+                index.by_phone[phone_number] = email
+        return index
+
+
+def file_mtime(filename: str) -> Optional[float]:
+    try:
+        return os.stat(filename).st_mtime
+    except OSError:
+        return None
+
+
+def load_or_build_index(index_file: str, users_mtime: Optional[float], load_users) -> UserIndex:
+    """Load the persisted index if it is current, otherwise rebuild and persist it.
+
+    `users_mtime` is the modification time of the users store; `load_users` is
+    only called when a rebuild is needed.
+    """
+    index_mtime = file_mtime(index_file)
+    if index_mtime is not None and (users_mtime is None or index_mtime >= users_mtime):
+        try:
+            index = UserIndex.load(index_file)
+            index.source_mtime = users_mtime
+            return index
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    index = UserIndex.build(load_users())
+    index.source_mtime = users_mtime
+    index.save(index_file)
+    return index
@@ -1,18 +1,50 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List, Dict
 import jwt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import secrets
 from passlib.context import CryptContext
-import json
+import logging
+import math
 import os
-import random
 import uuid
+import heapq
 import aiohttp
+import numpy as np
 import asyncio
+import threading
+import time
+import shutil
+import tempfile
+import urllib.parse
+
+from app.core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, render_metrics, span, timed
+from app.core.market import PriceCache, PriceSnapshot, snapshot_response
+from app.core import exports, rollups
+from app.core.admission import AdmissionClass, AdmissionMiddleware
+from app.core.idempotency import IdempotencyMiddleware, create_idempotency_store
+from app.core.compression import CompressionMiddleware
+from app.core.equity import EquityStore
+from app.core.history import PriceHistory
+from app.core.logging_config import LOG_SAMPLE_RATE, configure_logging
+from app.core.positions import PositionStore
+from app.core.profiler import StackSampler
+from app.core.ratelimit import Limit, RateLimiter, create_bucket_store
+from app.core.responses import FastJSONResponse
+from app.core.serialization import store
+from app.core.simulation import MarketSimulator
+from app.core.streaming import Broadcaster, PortfolioTracker, StreamMessage
+from app.core.user_index import UserIndex, load_or_build_index
+from app.utils.downsampling import lttb
+from app.utils.ids import new_id
+from app.utils.singleflight import SingleFlight
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 # Security setup
 security = HTTPBearer()
@@ -20,6 +52,8 @@ pwd_context = CryptContext(schemes=["md5_crypt"], deprecated="auto")
 SECRET_KEY = os.getenv("SECRET_KEY", "5L5vfBJhjFPBGfMtXh_m5AjPVBXNTXCcPyqlYyJTsOU")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "70"))
+PRICE_REFRESH_SECONDS = float(os.getenv("PRICE_REFRESH_SECONDS", "5"))
+ADMIN_EMAILS = {email.strip() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
 
 # Get allowed origins from environment
 FRONTEND_URL = os.getenv("FRONTEND_URL", "https://pesaprime.vercel.app")
@@ -36,6 +70,57 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Idempotency-Key on money movements: a retried request replays the first response instead of running again
+IDEMPOTENT_PATHS = ("/api/wallet/deposit", "/api/wallet/withdraw", "/api/investments/buy")
+
+def token_subject(headers) -> Optional[str]:
+    """Email of a valid bearer token in `headers`, else None"""
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return decode_access_token(token)
+    except HTTPException:
+        return None
+
+# Admission control: priority classes with their own concurrency limits and bounded queues
+# (concurrency, queue size, queue timeout), so cheap reads are never stuck behind expensive writes
+ADMISSION_CLASSES = {
+    "market": AdmissionClass("market", 64, 256, 0.5),
+    "read": AdmissionClass("read", 32, 64, 1.0),
+    "write": AdmissionClass("write", 8, 32, 2.0),
+    "export": AdmissionClass("export", 2, 4, 2.0),
+}
+# Route-level limits, taking precedence over the class: password hashing and buys
+# get their own slots, so a burst of one cannot use up the write class for the rest
+ADMISSION_ROUTES = {
+    ("POST", "/api/auth/register"): AdmissionClass("register", 4, 16, 2.0),
+    ("POST", "/api/auth/login"): AdmissionClass("login", 4, 32, 2.0),
+    ("POST", "/api/investments/buy"): AdmissionClass("buy", 4, 16, 2.0),
+}
+ADMISSION_EXEMPT = ("/", "/api/health", "/metrics")
+
+def admission_class(method: str, path: str) -> Optional[AdmissionClass]:
+    if path in ADMISSION_EXEMPT or path.startswith("/api/stream/") or method == "OPTIONS":
+        return None
+    route = ADMISSION_ROUTES.get((method, path))
+    if route is not None:
+        return route
+    if method != "GET":
+        return ADMISSION_CLASSES["write"]
+    if path.startswith("/api/assets/") or path == "/api/investments/assets":
+        return ADMISSION_CLASSES["market"]
+    if path.endswith("/export") or path.startswith("/api/admin/exports/"):
+        return ADMISSION_CLASSES["export"]
+    return ADMISSION_CLASSES["read"]
+
+# Inside CORS, so shed requests still carry CORS headers and browsers see the 503
+app.add_middleware(AdmissionMiddleware, classify=admission_class)
+
+# Outside admission control, so a duplicate waiting for the original request does not hold a write slot
+app.add_middleware(IdempotencyMiddleware, paths=IDEMPOTENT_PATHS, identify=token_subject,
+                   store=create_idempotency_store(store.shared))
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -45,12 +130,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for large JSON bodies (inside the metrics middleware so its cost is measured)
+app.add_middleware(CompressionMiddleware)
+
+# Per-route latency and hot-path stage metrics, served on /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Use absolute paths for production
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-USERS_FILE = os.path.join(BASE_DIR, "users.json")
-USER_ACTIVITY_FILE = os.path.join(BASE_DIR, "user_activity.json")
-USER_WALLETS_FILE = os.path.join(BASE_DIR, "user_wallets.json")
-USER_INVESTMENTS_FILE = os.path.join(BASE_DIR, "user_investments.json")
+DATA_DIR = os.getenv("DATA_DIR", BASE_DIR)
+USERS_FILE = os.path.join(DATA_DIR, "users.json")
+USER_ACTIVITY_FILE = os.path.join(DATA_DIR, "user_activity.json")
+USER_WALLETS_FILE = os.path.join(DATA_DIR, "user_wallets.json")
+USER_INVESTMENTS_FILE = os.path.join(DATA_DIR, "user_investments.json")
+USERS_INDEX_FILE = os.path.join(DATA_DIR, "users_index.json")
+USER_POSITIONS_FILE = os.path.join(DATA_DIR, "user_positions.bin")
+MARKET_PRICES_FILE = os.path.join(DATA_DIR, "market_prices.json")
+POSITIONS_STATE_FILE = os.path.join(DATA_DIR, "positions_state.json")
+USER_ROLLUPS_DIR = os.path.join(DATA_DIR, "user_rollups")
+PLATFORM_ROLLUPS_FILE = os.path.join(DATA_DIR, "platform_rollups.json")
+EQUITY_SNAPSHOTS_FILE = os.path.join(DATA_DIR, "equity_snapshots.bin")
+EQUITY_STATE_FILE = os.path.join(DATA_DIR, "equity_state.json")
+EQUITY_SNAPSHOT_SECONDS = int(os.getenv("EQUITY_SNAPSHOT_SECONDS", "300"))
+
+if store.shared:
+    # Several workers: each maps a private copy of the positions, rebuilt when another worker changes them
+    USER_POSITIONS_FILE = os.path.join(tempfile.mkdtemp(prefix="pesaprime-positions-"), "user_positions.bin")
 
 # Pydantic models
 class UserBase(BaseModel):
@@ -154,6 +259,14 @@ class PnLData(BaseModel):
     percentage: float
     trend: str
 
+class DashboardData(BaseModel):
+    user: UserResponse
+    wallet: WalletData
+    pnl: PnLData
+    investments: List[UserInvestment]
+    activities: List[UserActivity]
+    prices_version: int
+
 # PRODUCTION ASSETS DATA (same as before)
 PRODUCTION_ASSETS = {
     'crypto': [
@@ -171,43 +284,102 @@ TODAYS_BASE_PRICES = {
 
 # CRITICAL: Add missing load_data function
 def load_data(filename, default=None):
-    """Load data from JSON file"""
+    """Load a data file through the configured serialization backend"""
     if default is None:
         default = {}
     try:
-        if os.path.exists(filename):
-            with open(filename, 'r') as f:
-                return json.load(f)
-        return default
+        with span("load_data", os.path.basename(filename)):
+            return store.load(filename, default)
     except Exception as e:
-        print(f"Error loading data from {filename}: {e}")
+        logger.error("Error loading data", extra={"file": filename, "error": str(e)})
         return default
 
 def save_data(data, filename):
-    """Save data to JSON file"""
+    """Save a data file through the configured serialization backend"""
     try:
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2)
+        with span("save_data", os.path.basename(filename)):
+            store.save(data, filename)
     except Exception as e:
-        print(f"Error saving data to {filename}: {e}")
+        logger.error("Error saving data", extra={"file": filename, "error": str(e)})
 
-def get_next_id(data):
-    """Generate next ID for data that uses numeric IDs"""
-    if not data:
-        return "1"
-    
-    numeric_keys = []
-    for key in data.keys():
-        try:
-            numeric_keys.append(int(key))
-        except ValueError:
-            continue
-    
-    if not numeric_keys:
-        return "1"
-    
-    max_id = max(numeric_keys)
-    return str(max_id + 1)
+def user_rollups_file(phone_number: str) -> str:
+    """The document holding one user's rollups; quoted so any phone number is a safe file name"""
+    return os.path.join(USER_ROLLUPS_DIR, f"rollups_{urllib.parse.quote(phone_number, safe='')}.json")
+
+def new_record_id(data) -> str:
+    """A fresh snowflake ID for a new record in `data`"""
+    record_id = str(new_id())
+    # Unique while node ids are distinct (see app.utils.ids); the check is a cheap guard against a misconfigured NODE_ID
+    while record_id in data:
+        record_id = str(new_id())
+    return record_id
+
+_user_index: Optional[UserIndex] = None
+
+def get_user_index() -> UserIndex:
+    """Email/phone/id index over users.json, reloaded if the file changed behind our back"""
+    global _user_index
+    users_mtime = store.mtime(USERS_FILE)
+    if _user_index is None or _user_index.source_mtime != users_mtime:
+        _user_index = load_or_build_index(USERS_INDEX_FILE, users_mtime, lambda: load_data(USERS_FILE))
+    return _user_index
+
+_positions: Optional[PositionStore] = None
+_positions_state: Optional[float] = None
+
+# Investments added last, kept in the positions_state marker so other workers can append them
+# instead of rebuilding from the whole investments document
+RECENT_POSITIONS = 64
+POSITION_FIELDS = ("id", "user_phone", "asset_id", "status", "units", "invested_amount", "entry_price",
+                   "created_at", "completion_time")
+
+def get_positions() -> PositionStore:
+    """Memory-mapped columnar copy of the investments, rebuilt from user_investments.json on first use.
+
+    With a shared store, positions other workers added are appended from the
+    positions_state marker; the store is only rebuilt if it fell further behind.
+    """
+    global _positions, _positions_state
+    state = store.mtime(POSITIONS_STATE_FILE) if store.shared else None
+    if _positions is not None and state != _positions_state:
+        marker = load_data(POSITIONS_STATE_FILE, default={})
+        recent = marker.get("recent", [])
+        missing = marker.get("count", 0) - len(_positions)
+        if 0 <= missing <= len(recent):
+            for investment in recent[len(recent) - missing:]:
+                _positions.append(investment)
+            _positions_state = state
+    if _positions is None or state != _positions_state:
+        with span("rebuild_positions"):
+            _positions = PositionStore.rebuild(USER_POSITIONS_FILE, load_data(USER_INVESTMENTS_FILE, default={}))
+        _positions_state = state
+    return _positions
+
+def add_position(investment: dict):
+    """Append a new investment to the position store and tell the other workers about it.
+
+    Call it before saving the investment to user_investments.json: if the
+    store is stale, get_positions() rebuilds it from that document, which
+    must not hold the new investment yet or it would be counted twice.
+    """
+    global _positions_state
+    positions = get_positions()
+    positions.append(investment)
+    if store.shared:
+        recent = load_data(POSITIONS_STATE_FILE, default={}).get("recent", [])
+        recent.append({field: investment[field] for field in POSITION_FIELDS if field in investment})
+        save_data({"count": len(positions), "recent": recent[-RECENT_POSITIONS:]}, POSITIONS_STATE_FILE)
+        _positions_state = store.mtime(POSITIONS_STATE_FILE)
+
+_equity_store: Optional[EquityStore] = None
+_last_equity_slot = 0
+
+def get_equity_store() -> EquityStore:
+    """Append-only per-user equity history behind the equity-curve endpoint"""
+    global _equity_store
+    if _equity_store is None:
+        _equity_store = EquityStore(EQUITY_SNAPSHOTS_FILE)
+    return _equity_store
 
 def generate_user_id():
     """Generate a unique user ID"""
@@ -216,13 +388,15 @@ def generate_user_id():
 # Utility functions
 def verify_password(plain_password, hashed_password):
     try:
-        return pwd_context.verify(plain_password, hashed_password)
+        with span("password_verify"):
+            return pwd_context.verify(plain_password, hashed_password)
     except:
         return plain_password == hashed_password
 
 def get_password_hash(password):
     try:
-        return pwd_context.hash(password)
+        with span("password_hash"):
+            return pwd_context.hash(password)
     except:
         return password
 
@@ -236,9 +410,10 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def decode_access_token(token: str) -> str:
+    """The email a JWT was issued to; raises 401 if it is invalid or expired"""
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -246,53 +421,139 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    return email
+
+# Concurrent identical lookups and revaluations share one in-flight call
+user_lookups = SingleFlight()
+revaluations = SingleFlight()
+
+def load_user(email: str) -> Optional[dict]:
+    return load_data(USERS_FILE).get(email)
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    email = decode_access_token(credentials.credentials)
     
-    users = load_data(USERS_FILE)
-    user = users.get(email)
+    # Parsed off the event loop; a burst of requests from one user parses the users file once
+    user = await user_lookups.do(email, asyncio.to_thread, load_user, email)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
 
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    if current_user["email"] not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+# Token buckets (per minute, burst) for auth and money endpoints, shared by all workers in SQL mode
+RATE_LIMITS = {
+    "login_ip": Limit("login_ip", 20, 10),
+    "login_account": Limit("login_account", 5, 5),
+    "register_ip": Limit("register_ip", 5, 5),
+    "money_ip": Limit("money_ip", 120, 30),
+    "money_account": Limit("money_account", 30, 10),
+}
+rate_limiter = RateLimiter(create_bucket_store(store.shared))
+
+# Proxies in front of the app that each append the address they received from to X-Forwarded-For
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+def client_ip(request: Request) -> str:
+    """Address of the client, for per-IP rate limits.
+
+    Behind TRUSTED_PROXY_HOPS proxies it is the entry the outermost trusted
+    proxy appended, counting from the right: entries further left are
+    whatever the client chose to send, and must not be trusted.
+    """
+    if TRUSTED_PROXY_HOPS:
+        hops = [hop.strip() for value in request.headers.getlist("x-forwarded-for")
+                for hop in value.split(",") if hop.strip()]
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+def enforce_rate_limits(*checks):
+    """Take a token for each (limit name, key); 429 with Retry-After once any bucket is empty"""
+    for name, key in checks:
+        retry_after = rate_limiter.check(RATE_LIMITS[name], key)
+        if retry_after is not None:
+            raise HTTPException(status_code=429, detail="Too many requests, please retry later",
+                                headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
 def log_user_activity(user_phone: str, activity_type: str, amount: float, description: str, status: str = "completed"):
     """Log user activity for tracking"""
-    activities = load_data(USER_ACTIVITY_FILE, default={})
-    activity_id = get_next_id(activities)
-    
-    activity = {
-        "id": activity_id,
-        "user_phone": user_phone,
-        "activity_type": activity_type,
-        "amount": amount,
-        "description": description,
-        "timestamp": datetime.utcnow().isoformat(),
-        "status": status
-    }
+    with store.transaction():
+        activities = load_data(USER_ACTIVITY_FILE, default={})
+        activity_id = new_record_id(activities)
+    
+        activity = {
+            "id": activity_id,
+            "user_phone": user_phone,
+            "activity_type": activity_type,
+            "amount": amount,
+            "description": description,
+            "timestamp": datetime.utcnow().isoformat(),
+            "status": status
+        }
     
-    activities[activity_id] = activity
-    save_data(activities, USER_ACTIVITY_FILE)
+        activities[activity_id] = activity
+        save_data(activities, USER_ACTIVITY_FILE)
+
+        user_file = user_rollups_file(user_phone)
+        user_days = load_data(user_file, default={})
+        platform_rollups = load_data(PLATFORM_ROLLUPS_FILE, default={})
+        rollups.add_activity(user_days, platform_rollups, activity_type, amount, activity["timestamp"])
+        save_data(user_days, user_file)
+        save_data(platform_rollups, PLATFORM_ROLLUPS_FILE)
     return activity
 
-async def update_investment_values(user_phone: str):
-    """Update investment values based on current market prices"""
+def revalue_investments(user_phone: str, prices: Dict[str, float]) -> List[dict]:
+    """The user's active investments valued at `prices`.
+
+    Values are computed on every read and never saved: a read takes no write
+    lock and rewrites nothing.
+    """
+    # The position store tells us which records to read without scanning every investment
+    position_ids = get_positions().for_user(user_phone)["id"]
+    if not len(position_ids):
+        return []
+
     investments = load_data(USER_INVESTMENTS_FILE, default={})
-    current_assets = await generate_dynamic_prices()
-    
-    for inv_id, investment in investments.items():
-        if investment["user_phone"] == user_phone and investment["status"] == "active":
-            asset = next((a for a in current_assets if a["id"] == investment["asset_id"]), None)
-            if asset:
-                current_value = investment["units"] * asset["current_price"]
-                profit_loss = current_value - investment["invested_amount"]
-                profit_loss_percentage = (profit_loss / investment["invested_amount"]) * 100
-                
-                investment.update({
-                    "current_value": current_value,
-                    "current_price": asset["current_price"],
-                    "profit_loss": profit_loss,
-                    "profit_loss_percentage": profit_loss_percentage
-                })
-    
-    save_data(investments, USER_INVESTMENTS_FILE)
+    user_investments = []
+    for inv_id in position_ids:
+        investment = investments.get(str(inv_id))
+        if not investment:
+            continue
+        user_investments.append(investment)
+        current_price = prices.get(investment["asset_id"])
+        if current_price is not None:
+            current_value = investment["units"] * current_price
+            profit_loss = current_value - investment["invested_amount"]
+            profit_loss_percentage = (profit_loss / investment["invested_amount"]) * 100
+
+            investment.update({
+                "current_value": current_value,
+                "current_price": current_price,
+                "profit_loss": profit_loss,
+                "profit_loss_percentage": profit_loss_percentage
+            })
+    return user_investments
+
+async def _revalue_at_current_prices(user_phone: str) -> List[dict]:
+    prices = (await get_price_snapshot()).prices
+    # Nothing awaits past this point, so a caller that joins this call never gets positions older than its arrival
+    return revalue_investments(user_phone, prices)
+
+@timed("update_investment_values")
+async def update_investment_values(user_phone: str, snapshot: Optional[PriceSnapshot] = None):
+    """Value the user's investments at current market prices.
+
+    Returns the user's active investments with their current values. Pass
+    `snapshot` to value them at the prices the caller is already using.
+    Concurrent calls for the same user share one revaluation.
+    """
+    if snapshot is not None:
+        return revalue_investments(user_phone, snapshot.prices)
+    return await revaluations.do(user_phone, _revalue_at_current_prices, user_phone)
 
 # REAL-TIME PRICE FETCHING FUNCTIONS (same as before)
 async def fetch_real_crypto_price(coin_id: str, symbol: str):
@@ -311,31 +572,54 @@ async def generate_real_time_prices():
     # ... (your existing implementation)
     pass
 
-async def generate_dynamic_prices():
+@timed("generate_dynamic_prices")
+async def generate_dynamic_prices(previous: Optional[List[dict]] = None):
     """Generate realistic dynamic prices with real-time data"""
     try:
-        return await generate_real_time_prices()
+        prices = await generate_real_time_prices()
+        if prices:
+            return prices
     except Exception as e:
-        print(f"Error generating real-time prices: {e}")
-        # Fallback to simulated data with today's prices
-        return await generate_fallback_prices()
+        logger.warning("Error generating real-time prices",
+                       extra={"error": str(e), "sample_rate": LOG_SAMPLE_RATE})
+    # Fallback to simulated data with today's prices
+    return await generate_fallback_prices(previous)
 
-async def generate_fallback_prices():
-    """Fallback price generation using today's market prices"""
+# Fallback feed: all assets advance together, one simulated tick per price refresh
+FALLBACK_ASSETS = [asset for category_assets in PRODUCTION_ASSETS.values() for asset in category_assets]
+MARKET_SEED = os.getenv("MARKET_SEED")
+market_simulator = MarketSimulator.for_assets(
+    FALLBACK_ASSETS,
+    TODAYS_BASE_PRICES,
+    dt=PRICE_REFRESH_SECONDS,
+    time_scale=float(os.getenv("MARKET_TIME_SCALE", "60")),
+    seed=int(MARKET_SEED) if MARKET_SEED else None,
+)
+# Hourly income in KSH (120-350 range), fixed per asset. Its own seeded generator, so every
+# worker quotes the same income whichever of them publishes the prices
+FALLBACK_HOURLY_INCOME = np.random.default_rng(int(MARKET_SEED) if MARKET_SEED else 0).uniform(
+    120, 350, len(FALLBACK_ASSETS))
+
+async def generate_fallback_prices(previous: Optional[List[dict]] = None):
+    """Fallback price generation: the next tick of the market simulation.
+
+    `previous` is the last published price list when another worker produced
+    it: the simulation continues from those prices, so all workers extend one
+    price path. The moving average needs the tick history;
+    generate_market_prices adds it."""
+    if previous:
+        previous_prices = {asset["id"]: asset["current_price"] for asset in previous}
+        market_simulator.resume([previous_prices.get(asset["id"], float(price))
+                                 for asset, price in zip(FALLBACK_ASSETS, market_simulator.prices)])
+    prices = market_simulator.step()
+    change_percentages = market_simulator.change_percentage()
     assets_with_prices = []
     
-    all_assets = []
-    for category_assets in PRODUCTION_ASSETS.values():
-        all_assets.extend(category_assets)
-    
-    for asset in all_assets:
-        base_price = TODAYS_BASE_PRICES.get(asset['symbol'], 100)
-        change = random.uniform(-0.01, 0.01)
-        current_price = base_price * (1 + change)
-        change_percentage = change * 100
+    for i, asset in enumerate(FALLBACK_ASSETS):
+        current_price = float(prices[i])
+        change_percentage = float(change_percentages[i])
         
-        # Hourly income in KSH (120-350 range)
-        hourly_income_kes = random.uniform(120, 350)
+        hourly_income_kes = float(FALLBACK_HOURLY_INCOME[i])
         total_income_kes = hourly_income_kes * asset['duration']
         roi_percentage = (total_income_kes / asset['min_investment_kes']) * 100
         
@@ -346,7 +630,6 @@ async def generate_fallback_prices():
             "type": asset["type"],
             "current_price": round(current_price, 4),
             "change_percentage": round(change_percentage, 2),
-            "moving_average": round(current_price * random.uniform(0.98, 1.02), 4),
             "trend": "up" if change_percentage >= 0 else "down",
             "chart_url": f"https://www.tradingview.com/chart/?symbol={asset['symbol']}",
             "hourly_income": round(hourly_income_kes, 2),
@@ -358,16 +641,169 @@ async def generate_fallback_prices():
     
     return assets_with_prices
 
+# Tick history of every asset: moving averages, changes, trends and candles come from here
+price_history = PriceHistory(
+    [asset["id"] for asset in FALLBACK_ASSETS],
+    capacity=int(os.getenv("PRICE_HISTORY_TICKS", "720")),
+    window=int(os.getenv("MOVING_AVERAGE_TICKS", "20")),
+)
+
+async def generate_market_prices(previous: Optional[List[dict]] = None):
+    """Current prices, with moving average, change and trend as of this tick from the history"""
+    assets = await generate_dynamic_prices(previous)
+    stats = price_history.stats({asset["id"]: asset["current_price"] for asset in assets})
+    for asset in assets:
+        asset_stats = stats.get(asset["id"])
+        if asset_stats is not None:
+            asset["moving_average"] = round(asset_stats["moving_average"], 4)
+            asset["change_percentage"] = round(asset_stats["change_percentage"], 2)
+            asset["trend"] = asset_stats["trend"]
+    return assets
+
+# Every request inside a refresh window shares one snapshot (and its serialized body)
+price_cache = PriceCache(
+    generate_market_prices,
+    ttl=PRICE_REFRESH_SECONDS,
+    store=store if store.shared else None,
+    document=MARKET_PRICES_FILE,
+)
+
+async def get_price_snapshot() -> PriceSnapshot:
+    snapshot = await price_cache.get()
+    if price_history.last_timestamp is None or snapshot.generated_at > price_history.last_timestamp:
+        price_history.record(snapshot.generated_at, snapshot.prices)
+    return snapshot
+
+# Live price / portfolio streaming (WebSocket and SSE share one broadcaster)
+STREAM_MAX_PENDING = int(os.getenv("STREAM_MAX_PENDING", "8"))
+STREAM_KEEPALIVE_SECONDS = 15
+
+broadcaster = Broadcaster(max_pending=STREAM_MAX_PENDING)
+portfolio_tracker = PortfolioTracker(get_positions)
+
+def publish_snapshot(snapshot: PriceSnapshot):
+    """Fan a new snapshot out to every subscriber, plus portfolio updates to users whose value moved"""
+    broadcaster.publish(StreamMessage("prices", snapshot.body, id=snapshot.version))
+    if not broadcaster.by_phone:
+        return
+    for phone_number, portfolio in portfolio_tracker.update_all(list(broadcaster.by_phone), snapshot.prices).items():
+        broadcaster.publish_to(phone_number, StreamMessage("portfolio", portfolio, id=snapshot.version))
+
+async def price_ticker():
+    """Refresh prices every window, keeping the tick history continuous, and publish each new snapshot"""
+    last_version = None
+    while True:
+        try:
+            snapshot = await get_price_snapshot()
+            if snapshot.version != last_version:
+                last_version = snapshot.version
+                if len(broadcaster):
+                    publish_snapshot(snapshot)
+            delay = snapshot.expires_at - time.monotonic()
+        except Exception:
+            logger.exception("Price tick failed")
+            delay = PRICE_REFRESH_SECONDS
+        await asyncio.sleep(max(delay, 0.1))
+
+async def record_equity_snapshot(timestamp: int) -> int:
+    """Record every user's equity (cash balance plus market value of active positions) at `timestamp`"""
+    global _last_equity_slot
+    if timestamp <= _last_equity_slot:
+        return 0
+    _last_equity_slot = timestamp
+    if store.shared:
+        # Only one worker records each slot
+        with store.transaction():
+            state = load_data(EQUITY_STATE_FILE, default={})
+            if state.get("last_snapshot", 0) >= timestamp:
+                return 0
+            save_data({"last_snapshot": timestamp}, EQUITY_STATE_FILE)
+
+    snapshot = await get_price_snapshot()
+    positions = get_positions()
+    position_values = positions.values_by_user(snapshot.prices)
+    equities = {phone_number: float(value) for phone_number, value in zip(positions.users, position_values)}
+    for phone_number, wallet in load_data(USER_WALLETS_FILE, default={}).items():
+        equities[phone_number] = equities.get(phone_number, 0.0) + wallet.get("balance", 0)
+    with span("record_equity_snapshot"):
+        return get_equity_store().record(timestamp, equities)
+
+async def equity_snapshotter():
+    """Take an equity snapshot at every EQUITY_SNAPSHOT_SECONDS boundary"""
+    while True:
+        await asyncio.sleep(EQUITY_SNAPSHOT_SECONDS - time.time() % EQUITY_SNAPSHOT_SECONDS)
+        try:
+            slot = round(time.time() / EQUITY_SNAPSHOT_SECONDS) * EQUITY_SNAPSHOT_SECONDS
+            written = await record_equity_snapshot(slot)
+            logger.debug("Equity snapshot recorded", extra={"slot": slot, "records": written})
+        except Exception:
+            logger.exception("Equity snapshot failed")
+
+def stream_user_phone(token: Optional[str]) -> Optional[str]:
+    """Phone number of the user a stream token belongs to; None for anonymous streams"""
+    if not token:
+        return None
+    email = decode_access_token(token)
+    phone_number = get_user_index().phone_for_email(email)
+    if phone_number is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return phone_number
+
+async def open_stream(phone_number: Optional[str]):
+    """Subscribe, queueing the current prices (and portfolio) for the new client"""
+    subscription = broadcaster.subscribe(phone_number)
+    snapshot = await get_price_snapshot()
+    subscription.offer(StreamMessage("prices", snapshot.body, id=snapshot.version))
+    if phone_number:
+        portfolio = portfolio_tracker.update(phone_number, snapshot.prices, force=True)
+        subscription.offer(StreamMessage("portfolio", portfolio, id=snapshot.version))
+    return subscription
+
+def close_stream(subscription):
+    if broadcaster.unsubscribe(subscription):
+        portfolio_tracker.forget(subscription.phone_number)
+
 # Create database tables on startup
 @app.on_event("startup")
 async def startup_event():
-    # Ensure JSON files exist (for fallback)
+    # Ensure data files exist (for fallback)
     required_files = [USERS_FILE, USER_ACTIVITY_FILE, USER_WALLETS_FILE, USER_INVESTMENTS_FILE]
     for file_path in required_files:
-        if not os.path.exists(file_path):
-            with open(file_path, 'w') as f:
-                json.dump({}, f)
-            print(f"Created {file_path}")
+        if not store.exists(file_path):
+            save_data({}, file_path)
+            logger.info("Created data file", extra={"file": file_path})
+
+    if not store.shared:
+        os.makedirs(USER_ROLLUPS_DIR, exist_ok=True)
+    with store.transaction():
+        if not store.exists(PLATFORM_ROLLUPS_FILE):
+            with span("rebuild_rollups"):
+                user_rollups, platform_rollups = rollups.build_rollups(
+                    load_data(USER_ACTIVITY_FILE, default={}).values(),
+                    load_data(USER_INVESTMENTS_FILE, default={}).values(),
+                )
+            for phone_number, user_days in user_rollups.items():
+                save_data(user_days, user_rollups_file(phone_number))
+            save_data(platform_rollups, PLATFORM_ROLLUPS_FILE)
+            logger.info("Built rollups", extra={"users": len(user_rollups)})
+
+    index = get_user_index()
+    logger.info("User index ready", extra={"users": len(index)})
+    positions = get_positions()
+    logger.info("Position store ready", extra={"positions": len(positions)})
+    equity = get_equity_store()
+    logger.info("Equity history ready", extra={"snapshots": len(equity)})
+    app.state.background_tasks = [
+        asyncio.create_task(price_ticker()),
+        asyncio.create_task(equity_snapshotter()),
+    ]
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in getattr(app.state, "background_tasks", []):
+        task.cancel()
+    if store.shared:
+        shutil.rmtree(os.path.dirname(USER_POSITIONS_FILE), ignore_errors=True)
 
 # Routes
 @app.get("/")
@@ -378,46 +814,58 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "PesaDash API", "timestamp": datetime.utcnow().isoformat()}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 # Authentication endpoints
 @app.post("/api/auth/register", response_model=AuthResponse)
-async def register(user_data: UserCreate):
-    users = load_data(USERS_FILE)
+async def register(user_data: UserCreate, request: Request):
+    enforce_rate_limits(("register_ip", client_ip(request)))
+    # Hashing is slow: keep it out of the transaction, which serializes writers across workers
+    hashed_password = get_password_hash(user_data.password)
+    with store.transaction():
+        users = load_data(USERS_FILE)
     
-    if user_data.email in users:
-        raise HTTPException(status_code=400, detail="Email already registered")
+        if user_data.email in users:
+            raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Check if phone number is already registered
-    for existing_user in users.values():
-        if isinstance(existing_user, dict) and existing_user.get("phone_number") == user_data.phone_number:
+        # Check if phone number is already registered
+        user_index = get_user_index()
+        if user_index.has_phone(user_data.phone_number):
             raise HTTPException(status_code=400, detail="Phone number already registered")
     
-    user_id = generate_user_id()
-    hashed_password = get_password_hash(user_data.password)
+        user_id = generate_user_id()
     
-    user = {
-        "id": user_id,
-        "name": user_data.name,
-        "email": user_data.email,
-        "phone_number": user_data.phone_number,
-        "hashed_password": hashed_password,
-        "created_at": datetime.utcnow().isoformat()
-    }
+        user = {
+            "id": user_id,
+            "name": user_data.name,
+            "email": user_data.email,
+            "phone_number": user_data.phone_number,
+            "hashed_password": hashed_password,
+            "created_at": datetime.utcnow().isoformat()
+        }
     
-    # Initialize user wallet
-    wallets = load_data(USER_WALLETS_FILE, default={})
-    wallets[user_data.phone_number] = {
-        "balance": 5000.0,  # Start with 5000 KES
-        "equity": 5000.0,
-        "currency": "KES"
-    }
+        # Initialize user wallet
+        wallets = load_data(USER_WALLETS_FILE, default={})
+        wallets[user_data.phone_number] = {
+            "balance": 5000.0,  # Start with 5000 KES
+            "equity": 5000.0,
+            "currency": "KES"
+        }
     
-    users[user_data.email] = user
-    save_data(users, USERS_FILE)
-    save_data(wallets, USER_WALLETS_FILE)
+        users[user_data.email] = user
+        save_data(users, USERS_FILE)
+        save_data(wallets, USER_WALLETS_FILE)
+
+        user_index.add(user)
+        user_index.source_mtime = store.mtime(USERS_FILE)
+        user_index.save(USERS_INDEX_FILE)
     
-    # Log registration activity
-    log_user_activity(user_data.phone_number, "registration", 0, "User registered successfully")
-    log_user_activity(user_data.phone_number, "deposit", 5000, "Welcome bonus deposited")
+        # Log registration activity
+        log_user_activity(user_data.phone_number, "registration", 0, "User registered successfully")
+        log_user_activity(user_data.phone_number, "deposit", 5000, "Welcome bonus deposited")
     
     access_token = create_access_token(
         data={"sub": user_data.email}, 
@@ -433,20 +881,21 @@ async def register(user_data: UserCreate):
     )
 
 @app.post("/api/auth/login", response_model=AuthResponse)
-async def login(login_data: UserLogin):
+async def login(login_data: UserLogin, request: Request):
+    # Checked before the password hash, so a credential-stuffing burst is turned away cheaply
+    enforce_rate_limits(("login_ip", client_ip(request)), ("login_account", login_data.email.lower()))
     users = load_data(USERS_FILE)
     
-    print(f"Login attempt for email: {login_data.email}")
-    print(f"Available users: {list(users.keys())}")
+    logger.debug("Login attempt", extra={"email": login_data.email})
     
     user = users.get(login_data.email)
     
     if not user:
-        print(f"User not found: {login_data.email}")
+        logger.info("Login failed: unknown email", extra={"email": login_data.email})
         raise HTTPException(status_code=401, detail="Incorrect email or password")
     
     if not verify_password(login_data.password, user["hashed_password"]):
-        print("Password verification failed")
+        logger.info("Login failed: wrong password", extra={"email": login_data.email})
         raise HTTPException(status_code=401, detail="Incorrect email or password")
     
     access_token = create_access_token(
@@ -454,7 +903,7 @@ async def login(login_data: UserLogin):
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     
-    print(f"Login successful for: {user['email']}")
+    logger.info("Login successful", extra={"email": user["email"], "sample_rate": LOG_SAMPLE_RATE})
     
     return AuthResponse(
         success=True,
@@ -469,170 +918,175 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     """Get current user information"""
     return UserResponse(**{k: v for k, v in current_user.items() if k != 'hashed_password'})
 
+def pnl_summary(phone_number: str, prices: Dict[str, float]) -> dict:
+    """Overall PnL across the user's active investments at the given prices"""
+    total_invested, total_current_value = get_positions().totals(phone_number, prices)
+    
+    if total_invested == 0:
+        profit_loss = 0
+        percentage = 0
+        trend = "neutral"
+    else:
+        profit_loss = total_current_value - total_invested
+        percentage = (profit_loss / total_invested) * 100
+        trend = "up" if profit_loss >= 0 else "down"
+    
+    return {
+        "profit_loss": round(profit_loss, 2),
+        "percentage": round(percentage, 2),
+        "trend": trend
+    }
+
 # Wallet endpoints
 @app.get("/api/wallet/balance/{phone_number}", response_model=WalletData)
 async def get_wallet_balance(phone_number: str):
     wallets = load_data(USER_WALLETS_FILE, default={})
     user_wallet = wallets.get(phone_number, {"balance": 0, "equity": 0, "currency": "KES"})
-    
-    # Update equity based on investments
-    await update_investment_values(phone_number)
-    
-    return WalletData(**user_wallet)
+    return user_wallet
 
 @app.post("/api/wallet/deposit", response_model=TransactionResponse)
-async def deposit_funds(deposit_data: DepositRequest, current_user: dict = Depends(get_current_user)):
+async def deposit_funds(deposit_data: DepositRequest, request: Request, current_user: dict = Depends(get_current_user)):
     if deposit_data.phone_number != current_user["phone_number"]:
         raise HTTPException(status_code=403, detail="Unauthorized")
+    enforce_rate_limits(("money_ip", client_ip(request)), ("money_account", current_user["phone_number"]))
     
-    wallets = load_data(USER_WALLETS_FILE, default={})
-    user_wallet = wallets.get(current_user["phone_number"], {"balance": 0, "equity": 0, "currency": "KES"})
+    with store.transaction():
+        wallets = load_data(USER_WALLETS_FILE, default={})
+        user_wallet = wallets.get(current_user["phone_number"], {"balance": 0, "equity": 0, "currency": "KES"})
     
-    user_wallet["balance"] += deposit_data.amount
-    user_wallet["equity"] += deposit_data.amount
+        user_wallet["balance"] += deposit_data.amount
+        user_wallet["equity"] += deposit_data.amount
     
-    wallets[current_user["phone_number"]] = user_wallet
-    save_data(wallets, USER_WALLETS_FILE)
+        wallets[current_user["phone_number"]] = user_wallet
+        save_data(wallets, USER_WALLETS_FILE)
     
-    log_user_activity(
-        current_user["phone_number"], 
-        "deposit", 
-        deposit_data.amount, 
-        f"Deposit of KSh {deposit_data.amount}"
-    )
+        activity = log_user_activity(
+            current_user["phone_number"], 
+            "deposit", 
+            deposit_data.amount, 
+            f"Deposit of KSh {deposit_data.amount}"
+        )
     
     return TransactionResponse(
         success=True,
         message="Deposit successful",
         new_balance=user_wallet["balance"],
         new_equity=user_wallet["equity"],
-        transaction_id=f"DEP{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+        transaction_id=f"DEP{activity['id']}"
     )
 
 @app.post("/api/wallet/withdraw", response_model=TransactionResponse)
-async def withdraw_funds(withdraw_data: WithdrawRequest, current_user: dict = Depends(get_current_user)):
+async def withdraw_funds(withdraw_data: WithdrawRequest, request: Request, current_user: dict = Depends(get_current_user)):
     if withdraw_data.phone_number != current_user["phone_number"]:
         raise HTTPException(status_code=403, detail="Unauthorized")
+    enforce_rate_limits(("money_ip", client_ip(request)), ("money_account", current_user["phone_number"]))
     
-    wallets = load_data(USER_WALLETS_FILE, default={})
-    user_wallet = wallets.get(current_user["phone_number"], {"balance": 0, "equity": 0, "currency": "KES"})
+    with store.transaction():
+        wallets = load_data(USER_WALLETS_FILE, default={})
+        user_wallet = wallets.get(current_user["phone_number"], {"balance": 0, "equity": 0, "currency": "KES"})
     
-    if user_wallet["balance"] < withdraw_data.amount:
-        raise HTTPException(status_code=400, detail="Insufficient balance")
+        if user_wallet["balance"] < withdraw_data.amount:
+            raise HTTPException(status_code=400, detail="Insufficient balance")
     
-    user_wallet["balance"] -= withdraw_data.amount
-    user_wallet["equity"] -= withdraw_data.amount
+        user_wallet["balance"] -= withdraw_data.amount
+        user_wallet["equity"] -= withdraw_data.amount
     
-    wallets[current_user["phone_number"]] = user_wallet
-    save_data(wallets, USER_WALLETS_FILE)
+        wallets[current_user["phone_number"]] = user_wallet
+        save_data(wallets, USER_WALLETS_FILE)
     
-    log_user_activity(
-        current_user["phone_number"], 
-        "withdraw", 
-        withdraw_data.amount, 
-        f"Withdrawal of KSh {withdraw_data.amount}"
-    )
+        activity = log_user_activity(
+            current_user["phone_number"], 
+            "withdraw", 
+            withdraw_data.amount, 
+            f"Withdrawal of KSh {withdraw_data.amount}"
+        )
     
     return TransactionResponse(
         success=True,
         message="Withdrawal successful",
         new_balance=user_wallet["balance"],
         new_equity=user_wallet["equity"],
-        transaction_id=f"WD{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+        transaction_id=f"WD{activity['id']}"
     )
 
 @app.get("/api/wallet/pnl", response_model=PnLData)
 async def get_user_pnl(current_user: dict = Depends(get_current_user)):
     """Calculate user's overall PnL across active investments"""
-    await update_investment_values(current_user["phone_number"])
-    investments = load_data(USER_INVESTMENTS_FILE, default={})
-    
-    total_invested = 0
-    total_current_value = 0
-    
-    for inv in investments.values():
-        if inv["user_phone"] == current_user["phone_number"] and inv["status"] == "active":
-            total_invested += inv.get("invested_amount", 0)
-            total_current_value += inv.get("current_value", 0)
-    
-    if total_invested == 0:
-        profit_loss = 0
-        percentage = 0
-        trend = "neutral"
-    else:
-        profit_loss = total_current_value - total_invested
-        percentage = (profit_loss / total_invested) * 100
-        trend = "up" if profit_loss >= 0 else "down"
-    
-    return PnLData(
-        profit_loss=round(profit_loss, 2),
-        percentage=round(percentage, 2),
-        trend=trend
-    )
+    prices = (await get_price_snapshot()).prices
+    return PnLData(**pnl_summary(current_user["phone_number"], prices))
 
 # Investment endpoints
 @app.post("/api/investments/buy")
-async def buy_investment(investment_data: InvestmentRequest, current_user: dict = Depends(get_current_user)):
+async def buy_investment(investment_data: InvestmentRequest, request: Request, current_user: dict = Depends(get_current_user)):
     if investment_data.phone_number != current_user["phone_number"]:
         raise HTTPException(status_code=403, detail="Unauthorized")
+    enforce_rate_limits(("money_ip", client_ip(request)), ("money_account", current_user["phone_number"]))
     
-    wallets = load_data(USER_WALLETS_FILE, default={})
-    user_wallet = wallets.get(current_user["phone_number"], {"balance": 0, "equity": 0, "currency": "KES"})
+    snapshot = await get_price_snapshot()
     
-    # Convert investment amount to KES for validation
-    amount_kes = investment_data.amount
+    with store.transaction():
+        wallets = load_data(USER_WALLETS_FILE, default={})
+        user_wallet = wallets.get(current_user["phone_number"], {"balance": 0, "equity": 0, "currency": "KES"})
     
-    if user_wallet["balance"] < amount_kes:
-        raise HTTPException(status_code=400, detail="Insufficient balance")
+        # Convert investment amount to KES for validation
+        amount_kes = investment_data.amount
     
-    assets = await generate_dynamic_prices()
-    asset = next((a for a in assets if a["id"] == investment_data.asset_id), None)
-    if not asset:
-        raise HTTPException(status_code=404, detail="Asset not found")
+        if user_wallet["balance"] < amount_kes:
+            raise HTTPException(status_code=400, detail="Insufficient balance")
     
-    # Check minimum investment (already in KES)
-    if amount_kes < asset["min_investment"]:
-        raise HTTPException(status_code=400, detail=f"Minimum investment is {asset['min_investment']} KES")
+        asset = snapshot.get(investment_data.asset_id)
+        if not asset:
+            raise HTTPException(status_code=404, detail="Asset not found")
     
-    units = amount_kes / asset["current_price"]
+        # Check minimum investment (already in KES)
+        if amount_kes < asset["min_investment"]:
+            raise HTTPException(status_code=400, detail=f"Minimum investment is {asset['min_investment']} KES")
     
-    investments = load_data(USER_INVESTMENTS_FILE, default={})
-    investment_id = get_next_id(investments)
-    
-    investment = {
-        "id": investment_id,
-        "user_phone": current_user["phone_number"],
-        "asset_id": investment_data.asset_id,
-        "asset_name": asset["name"],
-        "invested_amount": amount_kes,
-        "current_value": amount_kes,
-        "units": units,
-        "entry_price": asset["current_price"],
-        "current_price": asset["current_price"],
-        "hourly_income": asset["hourly_income"],
-        "total_income": asset["total_income"],
-        "duration": asset["duration"],
-        "roi_percentage": asset["roi_percentage"],
-        "profit_loss": 0.0,
-        "profit_loss_percentage": 0.0,
-        "status": "active",
-        "created_at": datetime.utcnow().isoformat(),
-        "completion_time": (datetime.utcnow() + timedelta(hours=asset["duration"])).isoformat()
-    }
+        units = amount_kes / asset["current_price"]
     
-    investments[investment_id] = investment
-    save_data(investments, USER_INVESTMENTS_FILE)
+        investments = load_data(USER_INVESTMENTS_FILE, default={})
+        investment_id = new_record_id(investments)
     
-    user_wallet["balance"] -= amount_kes
-    wallets[current_user["phone_number"]] = user_wallet
-    save_data(wallets, USER_WALLETS_FILE)
+        investment = {
+            "id": investment_id,
+            "user_phone": current_user["phone_number"],
+            "asset_id": investment_data.asset_id,
+            "asset_name": asset["name"],
+            "invested_amount": amount_kes,
+            "current_value": amount_kes,
+            "units": units,
+            "entry_price": asset["current_price"],
+            "current_price": asset["current_price"],
+            "hourly_income": asset["hourly_income"],
+            "total_income": asset["total_income"],
+            "duration": asset["duration"],
+            "roi_percentage": asset["roi_percentage"],
+            "profit_loss": 0.0,
+            "profit_loss_percentage": 0.0,
+            "status": "active",
+            "created_at": datetime.utcnow().isoformat(),
+            "completion_time": (datetime.utcnow() + timedelta(hours=asset["duration"])).isoformat()
+        }
     
-    log_user_activity(
-        current_user["phone_number"], 
-        "investment", 
-        amount_kes, 
-        f"Investment in {asset['name']} - {units:.4f} units"
-    )
+        investments[investment_id] = investment
+        add_position(investment)
+        save_data(investments, USER_INVESTMENTS_FILE)
+        portfolio_tracker.invalidate(current_user["phone_number"])
+    
+        platform_rollups = load_data(PLATFORM_ROLLUPS_FILE, default={})
+        rollups.add_position(platform_rollups, investment["asset_id"], investment["asset_name"], units, amount_kes)
+        save_data(platform_rollups, PLATFORM_ROLLUPS_FILE)
+    
+        user_wallet["balance"] -= amount_kes
+        wallets[current_user["phone_number"]] = user_wallet
+        save_data(wallets, USER_WALLETS_FILE)
+    
+        log_user_activity(
+            current_user["phone_number"], 
+            "investment", 
+            amount_kes, 
+            f"Investment in {asset['name']} - {units:.4f} units"
+        )
     
     return {
         "success": True,
@@ -642,37 +1096,99 @@ async def buy_investment(investment_data: InvestmentRequest, current_user: dict
     }
 
 # Market data endpoints
+# List endpoints return FastJSONResponse or pre-serialized snapshot bytes: the data is produced by
+# the app itself, so re-validating it against response_model is wasted work
 @app.get("/api/assets/market", response_model=List[Asset])
-async def get_market_assets():
-    return await generate_dynamic_prices()
+async def get_market_assets(request: Request):
+    return snapshot_response(request, await get_price_snapshot())
+
+@app.get("/api/assets/{asset_id}/candles")
+async def get_asset_candles(asset_id: str, resolution: str = "5m", limit: int = Query(100, ge=1, le=500)):
+    """OHLC bars for an asset, oldest first"""
+    await get_price_snapshot()
+    if resolution not in price_history.candles:
+        raise HTTPException(status_code=400, detail=f"Resolution must be one of {', '.join(price_history.candles)}")
+    candles = price_history.candle_bars(asset_id, resolution, limit)
+    if candles is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return FastJSONResponse({"asset_id": asset_id, "resolution": resolution, "candles": candles})
+
+# Live streams: "prices" events carry the market asset list on every refresh; with ?token= the
+# stream also carries "portfolio" events whenever the user's portfolio value changes
+@app.get("/api/stream/prices")
+async def stream_prices(request: Request, token: Optional[str] = None):
+    """Server-sent events stream of prices (and the user's portfolio when a token is given)"""
+    phone_number = stream_user_phone(token)
+
+    async def events():
+        subscription = await open_stream(phone_number)
+        try:
+            while not await request.is_disconnected():
+                message = await subscription.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                yield message.sse if message is not None else b": keepalive\n\n"
+        finally:
+            close_stream(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/api/stream/ws")
+async def stream_prices_ws(websocket: WebSocket, token: Optional[str] = None):
+    """WebSocket stream of prices (and the user's portfolio when a token is given)"""
+    try:
+        phone_number = stream_user_phone(token)
+    except HTTPException as exc:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=exc.detail)
+        return
+    await websocket.accept()
+
+    async def wait_for_disconnect():
+        # Incoming messages are ignored; this only notices the client going away
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    disconnected = asyncio.create_task(wait_for_disconnect())
+    subscription = await open_stream(phone_number)
+    try:
+        while not disconnected.done():
+            next_message = asyncio.create_task(subscription.get(timeout=STREAM_KEEPALIVE_SECONDS))
+            await asyncio.wait({next_message, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                next_message.cancel()
+                break
+            message = next_message.result()
+            await websocket.send_text(message.ws if message is not None else '{"event":"keepalive"}')
+    except WebSocketDisconnect:
+        pass
+    finally:
+        disconnected.cancel()
+        close_stream(subscription)
 
 @app.get("/api/investments/my/{phone_number}", response_model=List[UserInvestment])
 async def get_my_investments(phone_number: str):
-    investments = load_data(USER_INVESTMENTS_FILE, default={})
-    user_investments = [
-        inv for inv in investments.values() 
-        if inv["user_phone"] == phone_number and inv["status"] == "active"
-    ]
-    
-    await update_investment_values(phone_number)
-    
-    return user_investments
+    return FastJSONResponse(await update_investment_values(phone_number))
+
+def recent_user_activities(phone_number: str, limit: int = 20):
+    """The user's `limit` most recent activities, newest first"""
+    activities = load_data(USER_ACTIVITY_FILE, default={})
+    return heapq.nlargest(
+        limit,
+        (activity for activity in activities.values() if activity["user_phone"] == phone_number),
+        key=lambda x: x["timestamp"]
+    )
 
 @app.get("/api/activities/my/{phone_number}", response_model=List[UserActivity])
 async def get_my_activities(phone_number: str):
-    activities = load_data(USER_ACTIVITY_FILE, default={})
-    user_activities = [
-        activity for activity in activities.values() 
-        if activity["user_phone"] == phone_number
-    ]
-    user_activities.sort(key=lambda x: x["timestamp"], reverse=True)
-    return user_activities[:20]
+    return FastJSONResponse(recent_user_activities(phone_number))
 
 # ADD MISSING ROUTES THAT YOUR FRONTEND EXPECTS
 @app.get("/api/investments/assets")
-async def get_investment_assets():
+async def get_investment_assets(request: Request):
     """Alternative route for assets"""
-    return await generate_dynamic_prices()
+    return snapshot_response(request, await get_price_snapshot())
 
 @app.get("/api/investments/my-investments")
 async def get_my_investments_alt(current_user: dict = Depends(get_current_user)):
@@ -682,13 +1198,212 @@ async def get_my_investments_alt(current_user: dict = Depends(get_current_user))
 @app.get("/api/activities")
 async def get_activities_alt(current_user: dict = Depends(get_current_user)):
     """Alternative route for activities without phone number in URL"""
+    return FastJSONResponse(recent_user_activities(current_user["phone_number"]))
+
+def utc_iso(value: Optional[datetime]) -> Optional[str]:
+    """A datetime as the naive-UTC ISO string activities are stamped with"""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+def iter_activities(phone_number: Optional[str], start: Optional[str], end: Optional[str],
+                    activity_type: Optional[str]):
+    """Matching activities lazily, in the order they were logged (chronological per user).
+
+    Rows are filtered as they are streamed, but the activity document itself
+    is loaded whole: the store has no per-user or per-range access."""
     activities = load_data(USER_ACTIVITY_FILE, default={})
-    user_activities = [
-        activity for activity in activities.values() 
-        if activity["user_phone"] == current_user["phone_number"]
-    ]
-    user_activities.sort(key=lambda x: x["timestamp"], reverse=True)
-    return user_activities[:20]
+    for activity in activities.values():
+        if phone_number is not None and activity["user_phone"] != phone_number:
+            continue
+        if activity_type is not None and activity["activity_type"] != activity_type:
+            continue
+        if exports.in_range(activity["timestamp"], start, end):
+            yield activity
+
+def activity_export(filename: str, columns, phone_number: Optional[str], start: Optional[datetime],
+                    end: Optional[datetime], activity_type: Optional[str], export_format: str, gzip: bool):
+    start, end = utc_iso(start), utc_iso(end)
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    media_type, headers = exports.export_response_args(filename, export_format, gzip)
+    rows = iter_activities(phone_number, start, end, activity_type)
+    return StreamingResponse(exports.export_chunks(rows, columns, export_format, gzip),
+                             media_type=media_type, headers=headers)
+
+@app.get("/api/activities/export")
+async def export_my_activities(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    activity_type: Optional[str] = None,
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    gzip: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """The user's full activity statement as CSV or JSON Lines, streamed"""
+    phone_number = current_user["phone_number"]
+    return activity_export(f"statement-{phone_number}", exports.ACTIVITY_COLUMNS, phone_number,
+                           start, end, activity_type, format, gzip)
+
+@app.get("/api/dashboard", response_model=DashboardData)
+async def get_dashboard(current_user: dict = Depends(get_current_user)):
+    """Everything the dashboard page needs, authenticated once and priced from one snapshot"""
+    phone_number = current_user["phone_number"]
+    snapshot = await get_price_snapshot()
+    wallets = load_data(USER_WALLETS_FILE, default={})
+    wallet = wallets.get(phone_number, {"balance": 0, "equity": 0, "currency": "KES"})
+    return FastJSONResponse({
+        "user": {k: v for k, v in current_user.items() if k != 'hashed_password'},
+        "wallet": wallet,
+        "pnl": pnl_summary(phone_number, snapshot.prices),
+        "investments": await update_investment_values(phone_number, snapshot),
+        "activities": recent_user_activities(phone_number),
+        "prices_version": snapshot.version,
+    })
+
+def epoch_seconds(value: datetime) -> float:
+    """Timestamp of a datetime, reading naive values as UTC like the rest of the API"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+@app.get("/api/portfolio/equity")
+async def get_equity_curve(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    points: int = Query(500, ge=10, le=2000),
+    current_user: dict = Depends(get_current_user)
+):
+    """The user's equity over [start, end] (default: the last 30 days), downsampled to at most `points` points"""
+    phone_number = current_user["phone_number"]
+    end_ts = epoch_seconds(end) if end else time.time()
+    start_ts = epoch_seconds(start) if start else end_ts - 30 * 86400
+    if start_ts >= end_ts:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    timestamps, equity = get_equity_store().series(phone_number, start_ts, end_ts)
+    if end is None:
+        # Close the curve with the live value
+        snapshot = await get_price_snapshot()
+        _, current_value = get_positions().totals(phone_number, snapshot.prices)
+        wallet = load_data(USER_WALLETS_FILE, default={}).get(phone_number, {})
+        timestamps = np.append(timestamps, int(end_ts))
+        equity = np.append(equity, current_value + wallet.get("balance", 0))
+
+    keep = lttb(timestamps, equity, points)
+    return FastJSONResponse({
+        "start": int(start_ts),
+        "end": int(end_ts),
+        "points": [
+            {"time": int(t), "equity": round(float(v), 2)}
+            for t, v in zip(timestamps[keep].tolist(), equity[keep].tolist())
+        ],
+    })
+
+# Admin endpoints
+# Reports read the write-time rollups; none of them scans activity or investment history
+@app.get("/api/admin/reports/overview")
+async def report_overview(admin: dict = Depends(get_admin_user)):
+    """Platform totals: users, activity by type, active positions and assets under management"""
+    platform_rollups = load_data(PLATFORM_ROLLUPS_FILE, default={})
+    prices = (await get_price_snapshot()).prices
+    assets = platform_rollups.get("assets", {})
+    return FastJSONResponse({
+        "users": len(get_user_index()),
+        "activity": rollups.totals(platform_rollups.get("daily", {})),
+        "active_positions": sum(asset["positions"] for asset in assets.values()),
+        "invested": round(sum(asset["invested"] for asset in assets.values()), 2),
+        "aum": round(sum(asset["units"] * prices.get(asset_id, 0) for asset_id, asset in assets.items()), 2),
+    })
+
+@app.get("/api/admin/reports/daily")
+async def report_daily(
+    start: Optional[str] = Query(None, description="first day, YYYY-MM-DD"),
+    end: Optional[str] = Query(None, description="last day, YYYY-MM-DD"),
+    admin: dict = Depends(get_admin_user)
+):
+    """Platform activity (deposits, withdrawals, investments, ...) per day and type"""
+    days = rollups.daily_range(load_data(PLATFORM_ROLLUPS_FILE, default={}).get("daily", {}), start, end)
+    return FastJSONResponse({"days": days, "totals": rollups.totals(days)})
+
+@app.get("/api/admin/reports/assets")
+async def report_assets(admin: dict = Depends(get_admin_user)):
+    """Active positions, units, invested amount and current AUM per asset"""
+    assets = load_data(PLATFORM_ROLLUPS_FILE, default={}).get("assets", {})
+    prices = (await get_price_snapshot()).prices
+    report = []
+    for asset_id, asset in assets.items():
+        price = prices.get(asset_id)
+        report.append({
+            "asset_id": asset_id,
+            **asset,
+            "current_price": price,
+            "aum": round(asset["units"] * price, 2) if price is not None else None,
+        })
+    report.sort(key=lambda row: row["invested"], reverse=True)
+    return FastJSONResponse(report)
+
+@app.get("/api/admin/reports/users/{phone_number}")
+async def report_user(
+    phone_number: str,
+    start: Optional[str] = Query(None, description="first day, YYYY-MM-DD"),
+    end: Optional[str] = Query(None, description="last day, YYYY-MM-DD"),
+    admin: dict = Depends(get_admin_user)
+):
+    """One user's activity per day and type"""
+    user_file = user_rollups_file(phone_number)
+    if not store.exists(user_file):
+        raise HTTPException(status_code=404, detail="No activity for this user")
+    user_days = load_data(user_file)
+    days = rollups.daily_range(user_days, start, end)
+    return FastJSONResponse({"phone_number": phone_number, "days": days, "totals": rollups.totals(days)})
+
+_profile_lock = asyncio.Lock()
+
+@app.get("/api/admin/exports/activities")
+async def export_activities(
+    phone_number: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    activity_type: Optional[str] = None,
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    gzip: bool = False,
+    admin: dict = Depends(get_admin_user)
+):
+    """Activity of every user (or one) as CSV or JSON Lines, streamed"""
+    return activity_export("activities", ("user_phone",) + exports.ACTIVITY_COLUMNS, phone_number,
+                           start, end, activity_type, format, gzip)
+
+@app.get("/api/admin/profile")
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=60),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+    all_threads: bool = False,
+    limit: Optional[int] = Query(None, ge=1),
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Sample this worker's stacks for `seconds` and return collapsed stacks (flamegraph input)"""
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    async with _profile_lock:
+        # By default sample only the event loop thread, which is where request handling runs
+        sampler = StackSampler(
+            interval=interval_ms / 1000,
+            thread_ids=None if all_threads else [threading.get_ident()]
+        )
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+
+    if format == "json":
+        return sampler.to_dict(limit)
+    return PlainTextResponse(sampler.collapsed())
 
 if __name__ == "__main__":
     import uvicorn
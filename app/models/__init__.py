@@ -0,0 +1,2 @@
+# Registers the write-time rollup listeners on the Activity/Transaction/Investment models
+from app.models import rollup  # noqa: F401
@@ -0,0 +1,121 @@
+# app/models/rollup.py
+"""Rollup tables maintained at write time.
+
+Inserting an Activity or Transaction bumps its user's row for the day,
+type and source ("activity" or "transaction"; the same event can be logged
+as both) in activity_rollups. Inserting an Investment bumps its asset's row in
+asset_rollups. The bump runs in the inserting transaction, so the rollups
+commit or roll back with the rows they summarize. Bulk Core inserts bypass
+ORM events; call rebuild_rollups() after them.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import Column, Date, Float, Integer, String, UniqueConstraint, and_, event, func, select
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models.activity import Activity
+from app.models.transaction import Investment, Transaction
+
+
+class ActivityRollup(Base):
+    __tablename__ = "activity_rollups"
+    __table_args__ = (UniqueConstraint("user_id", "day", "source", "activity_type"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, index=True)
+    day = Column(Date, index=True)
+    source = Column(String)  # activity, transaction
+    activity_type = Column(String)
+    count = Column(Integer, default=0)
+    amount = Column(Float, default=0.0)
+
+
+class AssetRollup(Base):
+    __tablename__ = "asset_rollups"
+
+    asset_id = Column(String, primary_key=True)
+    asset_name = Column(String, nullable=True)
+    positions = Column(Integer, default=0)
+    units = Column(Float, default=0.0)
+    invested_amount = Column(Float, default=0.0)
+
+
+def _increment(connection, table, keys: dict, increments: dict, defaults: dict = None):
+    """UPDATE the row matching `keys` by `increments`, inserting it if there is none"""
+    update = (table.update()
+              .where(and_(*(table.c[column] == value for column, value in keys.items())))
+              .values({column: table.c[column] + value for column, value in increments.items()}))
+    if connection.execute(update).rowcount == 0:
+        connection.execute(table.insert().values(**keys, **increments, **(defaults or {})))
+
+
+def _day(value) -> date:
+    # Server-side defaults (created_at, timestamp) are not loaded back after the insert
+    return (value or datetime.utcnow()).date()
+
+
+@event.listens_for(Activity, "after_insert")
+def _activity_inserted(mapper, connection, target):
+    amount = (target.data or {}).get("amount", 0) or 0
+    _increment(connection, ActivityRollup.__table__,
+               {"user_id": target.user_id, "day": _day(target.created_at), "source": "activity",
+                "activity_type": target.type},
+               {"count": 1, "amount": amount})
+
+
+@event.listens_for(Transaction, "after_insert")
+def _transaction_inserted(mapper, connection, target):
+    _increment(connection, ActivityRollup.__table__,
+               {"user_id": target.user_id, "day": _day(target.timestamp), "source": "transaction",
+                "activity_type": target.type},
+               {"count": 1, "amount": target.amount or 0})
+
+
+@event.listens_for(Investment, "after_insert")
+def _investment_inserted(mapper, connection, target):
+    if (target.status or "active") != "active":
+        return
+    _increment(connection, AssetRollup.__table__,
+               {"asset_id": target.asset_id},
+               {"positions": 1, "units": target.units or 0, "invested_amount": target.invested_amount or 0},
+               {"asset_name": target.asset_name})
+
+
+def rebuild_rollups(db: Session):
+    """Recompute both rollup tables from the activity, transaction and investment tables"""
+    db.query(ActivityRollup).delete()
+    db.query(AssetRollup).delete()
+
+    rows = {}
+    # Activity amounts live in the JSON payload, which cannot be summed portably in SQL
+    for user_id, created_at, activity_type, data in db.execute(
+        select(Activity.user_id, Activity.created_at, Activity.type, Activity.data)
+    ):
+        row = rows.setdefault((user_id, str(_day(created_at)), "activity", activity_type), [0, 0.0])
+        row[0] += 1
+        row[1] += (data or {}).get("amount", 0) or 0
+
+    transaction_day = func.date(Transaction.timestamp)
+    for user_id, day, activity_type, count, amount in db.execute(
+        select(Transaction.user_id, transaction_day, Transaction.type, func.count(), func.sum(Transaction.amount))
+        .group_by(Transaction.user_id, transaction_day, Transaction.type)
+    ):
+        row = rows.setdefault((user_id, str(day)[:10], "transaction", activity_type), [0, 0.0])
+        row[0] += count
+        row[1] += amount or 0
+
+    db.bulk_insert_mappings(ActivityRollup, [
+        {"user_id": user_id, "day": datetime.strptime(day, "%Y-%m-%d").date(), "source": source,
+         "activity_type": activity_type, "count": count, "amount": amount}
+        for (user_id, day, source, activity_type), (count, amount) in rows.items()
+    ])
+
+    db.execute(AssetRollup.__table__.insert().from_select(
+        ["asset_id", "asset_name", "positions", "units", "invested_amount"],
+        select(Investment.asset_id, func.max(Investment.asset_name), func.count(),
+               func.sum(Investment.units), func.sum(Investment.invested_amount))
+        .where(Investment.status == "active")
+        .group_by(Investment.asset_id),
+    ))
+    db.commit()
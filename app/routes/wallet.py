@@ -70,7 +70,7 @@ async def deposit_funds(
         message="Deposit successful",
         new_balance=wallet.balance,
         new_equity=wallet.equity,
-        transaction_id=f"DEP{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+        transaction_id=f"DEP{transaction.id}"
     )
 
 @router.post("/withdraw/", response_model=TransactionResponse)
@@ -109,5 +109,5 @@ async def withdraw_funds(
         message="Withdrawal successful",
         new_balance=wallet.balance,
         new_equity=wallet.equity,
-        transaction_id=f"WD{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+        transaction_id=f"WD{transaction.id}"
     )
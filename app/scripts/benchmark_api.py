@@ -0,0 +1,305 @@
+# app/scripts/benchmark_api.py
+"""Load-test and micro-benchmark the API.
+
+Generates a synthetic dataset (see generate_load_data.py), then drives the app
+either in-process through httpx's ASGI transport (no network, measures the
+app itself) or over a real uvicorn server (includes HTTP parsing and the
+event loop under socket load). Results are written as JSON so runs can be
+compared across commits:
+
+    python -m app.scripts.benchmark_api --users 10000 --concurrency 20 --output before.json
+    python -m app.scripts.benchmark_api --users 10000 --concurrency 20 --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+SCENARIOS = ["market", "register", "login", "balance", "pnl", "activities", "dashboard", "buy"]
+BENCH_PASSWORD = "benchpass123"
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, wall_time):
+    """Turn raw per-request latencies (seconds) into the reported metrics"""
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / wall_time, 2) if wall_time else 0.0,
+        "mean_ms": round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if count else 0.0,
+    }
+
+
+class BenchmarkSession:
+    """Runs the scenarios against one client and remembers the state they share.
+
+    register creates fresh accounts (used later by buy, since they have a known
+    balance), login authenticates generated users (used by the other
+    authenticated scenarios).
+    """
+
+    def __init__(self, client: httpx.AsyncClient, users: int, requests: int, concurrency: int):
+        self.client = client
+        self.users = users
+        self.requests = requests
+        self.concurrency = concurrency
+        self.registered = []
+        self.logged_in = []
+
+    def _generated_user(self, i):
+        index = i % self.users
+        return f"loadtest{index}@pesaprime.com", f"07{index:08d}"
+
+    async def _run(self, make_request):
+        latencies = []
+        errors = 0
+        counter = iter(range(self.requests))
+
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                started = time.perf_counter()
+                try:
+                    response = await make_request(i)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                latencies.append(time.perf_counter() - started)
+                errors += failed
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return summarize(latencies, errors, time.perf_counter() - started)
+
+    @staticmethod
+    def _auth(token):
+        return {"Authorization": f"Bearer {token}"}
+
+    async def market(self):
+        return await self._run(lambda i: self.client.get("/api/assets/market"))
+
+    async def register(self):
+        async def request(i):
+            phone_number = f"08{i:08d}"
+            response = await self.client.post("/api/auth/register", json={
+                "name": f"Bench User {i}",
+                "email": f"bench{i}@pesaprime.com",
+                "phone_number": phone_number,
+                "password": BENCH_PASSWORD,
+            })
+            if response.status_code == 200:
+                self.registered.append((response.json()["access_token"], phone_number))
+            return response
+        return await self._run(request)
+
+    async def login(self):
+        async def request(i):
+            email, phone_number = self._generated_user(i)
+            response = await self.client.post("/api/auth/login", json={"email": email, "password": "loadtest123"})
+            if response.status_code == 200:
+                self.logged_in.append((response.json()["access_token"], phone_number))
+            return response
+        return await self._run(request)
+
+    async def balance(self):
+        return await self._run(lambda i: self.client.get(f"/api/wallet/balance/{self._generated_user(i)[1]}"))
+
+    async def pnl(self):
+        return await self._run(lambda i: self.client.get(
+            "/api/wallet/pnl", headers=self._auth(self.logged_in[i % len(self.logged_in)][0])))
+
+    async def activities(self):
+        return await self._run(lambda i: self.client.get(
+            "/api/activities", headers=self._auth(self.logged_in[i % len(self.logged_in)][0])))
+
+    async def dashboard(self):
+        return await self._run(lambda i: self.client.get(
+            "/api/dashboard", headers=self._auth(self.logged_in[i % len(self.logged_in)][0])))
+
+    async def buy(self):
+        def request(i):
+            token, phone_number = self.registered[i % len(self.registered)]
+            return self.client.post("/api/investments/buy", headers=self._auth(token), json={
+                "asset_id": "bitcoin" if i % 2 else "ethereum",
+                "amount": 450,
+                "phone_number": phone_number,
+            })
+        return await self._run(request)
+
+    async def run(self, scenarios):
+        results = {}
+        for name in SCENARIOS:
+            if name not in scenarios:
+                continue
+            if name in ("pnl", "activities", "dashboard") and not self.logged_in:
+                await self.login()
+            if name == "buy" and not self.registered:
+                await self.register()
+            results[name] = await getattr(self, name)()
+            print(f"  {name:<11} {results[name]['rps']:>9.1f} req/s  "
+                  f"p50 {results[name]['p50_ms']:>8.2f}ms  p95 {results[name]['p95_ms']:>8.2f}ms  "
+                  f"p99 {results[name]['p99_ms']:>8.2f}ms  errors {results[name]['errors']}")
+        return results
+
+
+async def run_inprocess(args, scenarios):
+    """Drive the app through httpx's ASGI transport, with the app's lifespan running"""
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            session = BenchmarkSession(client, args.users, args.requests, args.concurrency)
+            return await session.run(scenarios)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_uvicorn(args, scenarios, data_dir):
+    """Start uvicorn in a subprocess on the given dataset and drive it over HTTP"""
+    port = free_port()
+    env = dict(os.environ, DATA_DIR=data_dir)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            for _ in range(100):
+                try:
+                    if (await client.get("/api/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn did not become healthy")
+            session = BenchmarkSession(client, args.users, args.requests, args.concurrency)
+            return await session.run(scenarios)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """Print per-scenario changes against a previous report"""
+    print(f"\nComparison against {baseline['meta'].get('commit') or 'baseline'}:")
+    for mode, scenarios in report["results"].items():
+        for name, current in scenarios.items():
+            previous = baseline.get("results", {}).get(mode, {}).get(name)
+            if not previous:
+                continue
+            changes = []
+            for metric in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+                if previous[metric]:
+                    delta = (current[metric] - previous[metric]) / previous[metric] * 100
+                    changes.append(f"{metric} {delta:+6.1f}%")
+            print(f"  {mode:<9} {name:<11} " + "  ".join(changes))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Pesaprime API")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "both"], default="inprocess")
+    parser.add_argument("--users", type=int, default=1000, help="size of the generated dataset")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent clients")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--data-dir", help="where to generate datasets (default: a temporary directory)")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="compare against a previous JSON report")
+    args = parser.parse_args(argv)
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    root = args.data_dir or tempfile.mkdtemp(prefix="pesaprime-bench-")
+    modes = ["inprocess", "uvicorn"] if args.mode == "both" else [args.mode]
+
+    # app.main reads DATA_DIR at import time, so it must be set before the
+    # dataset generator (which imports app.main) is loaded
+    os.environ["DATA_DIR"] = os.path.join(root, "inprocess")
+    # The benchmark client's own per-request logs would drown the report
+    os.environ.setdefault("LOG_LEVELS", "httpx=WARNING")
+    # Every benchmark client shares one IP and a few accounts; rate limits would turn the run into 429s
+    os.environ.setdefault("RATE_LIMITING", "0")
+    from app.scripts.generate_load_data import generate_dataset
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": args.users,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+
+    for mode in modes:
+        data_dir = os.path.join(root, mode)
+        print(f"Generating {args.users} users in {data_dir}...")
+        generate_dataset(args.users, seed=args.seed, data_dir=data_dir, progress=False)
+        print(f"Running {mode} benchmark (concurrency={args.concurrency}, requests={args.requests}):")
+        if mode == "inprocess":
+            report["results"][mode] = asyncio.run(run_inprocess(args, scenarios))
+        else:
+            report["results"][mode] = asyncio.run(run_uvicorn(args, scenarios, data_dir))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
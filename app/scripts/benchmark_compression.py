@@ -0,0 +1,98 @@
+# app/scripts/benchmark_compression.py
+"""Report the CPU-time vs bytes tradeoff of response compression.
+
+Compresses representative payloads (the market asset list, a heavy user's
+investment list and their recent activities) with gzip at several levels and,
+if installed, brotli at several qualities.
+
+    python -m app.scripts.benchmark_compression --users 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from app.core.compression import brotli, compress
+from app.core.responses import dumps
+
+GZIP_LEVELS = [1, 4, 6, 9]
+BROTLI_QUALITIES = [1, 4, 6, 11]
+
+
+def time_compression(data: bytes, encoding: str, level: int, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        compressed = compress(data, encoding, level)
+        timings.append(time.perf_counter() - started)
+    return len(compressed), statistics.median(timings)
+
+
+def build_payloads(data_dir: str):
+    from app.main import generate_market_prices
+
+    with open(os.path.join(data_dir, "user_investments.json")) as f:
+        investments = json.load(f)
+    with open(os.path.join(data_dir, "user_activity.json")) as f:
+        activities = json.load(f)
+
+    # The user with the longest activity history
+    per_user = {}
+    for activity in activities.values():
+        per_user.setdefault(activity["user_phone"], []).append(activity)
+    heavy_user = max(per_user, key=lambda phone: len(per_user[phone]))
+
+    return {
+        "market": dumps(asyncio.run(generate_market_prices())),
+        "investments": dumps([inv for inv in investments.values() if inv["user_phone"] == heavy_user]),
+        "activities": dumps(sorted(per_user[heavy_user], key=lambda a: a["timestamp"], reverse=True)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark gzip/brotli levels on API payloads")
+    parser.add_argument("--users", type=int, default=5000, help="size of the generated dataset")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-activities", type=int, default=200, help="history length of the heavy user")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    from app.scripts.generate_load_data import generate_dataset
+
+    data_dir = tempfile.mkdtemp(prefix="pesaprime-compression-")
+    try:
+        generate_dataset(args.users, seed=args.seed, data_dir=data_dir, progress=False,
+                         max_activities=args.max_activities)
+        payloads = build_payloads(data_dir)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    settings = [("gzip", level) for level in GZIP_LEVELS]
+    if brotli is not None:
+        settings += [("br", quality) for quality in BROTLI_QUALITIES]
+
+    results = {}
+    print(f"{'payload':<12} {'raw B':>9} {'encoding':>9} {'level':>6} {'out B':>9} {'ratio':>7} {'cpu us':>9} {'MB/s':>8}")
+    for name, data in payloads.items():
+        results[name] = {"raw_bytes": len(data), "settings": []}
+        for encoding, level in settings:
+            size, seconds = time_compression(data, encoding, level, args.repeat)
+            results[name]["settings"].append({
+                "encoding": encoding, "level": level, "bytes": size, "cpu_us": round(seconds * 1e6, 1),
+            })
+            print(f"{name:<12} {len(data):>9} {encoding:>9} {level:>6} {size:>9} {len(data) / size:>7.1f} "
+                  f"{seconds * 1e6:>9.1f} {len(data) / seconds / 1e6:>8.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
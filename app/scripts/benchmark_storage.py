@@ -0,0 +1,84 @@
+# app/scripts/benchmark_storage.py
+"""Benchmark load/save time and file size of each data store backend.
+
+    python -m app.scripts.benchmark_storage --users 100000
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from app.core.serialization import DataStore, available_backends
+
+DOCUMENTS = ["users.json", "user_wallets.json", "user_investments.json", "user_activity.json"]
+
+
+def best_of(func, repeat):
+    """Median wall time of `repeat` runs of func()"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def benchmark(source_dir: str, work_dir: str, repeat: int):
+    results = {}
+    for name, backend in available_backends().items():
+        backend_dir = os.path.join(work_dir, name)
+        os.makedirs(backend_dir, exist_ok=True)
+        store = DataStore(backend)
+        results[name] = {}
+        for document in DOCUMENTS:
+            source = os.path.join(source_dir, document)
+            if not os.path.exists(source):
+                continue
+            with open(source, "rb") as f:
+                data = json.load(f)
+            target = os.path.join(backend_dir, document)
+            store.save(data, target)
+            path = store.path_for(target)
+            results[name][document] = {
+                "save_ms": round(best_of(lambda: store.save(data, target), repeat) * 1000, 2),
+                "load_ms": round(best_of(lambda: store.load(target), repeat) * 1000, 2),
+                "size_bytes": os.path.getsize(path),
+            }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark data store serialization backends")
+    parser.add_argument("--users", type=int, default=10000, help="size of the generated dataset")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (median is reported)")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    from app.scripts.generate_load_data import generate_dataset
+
+    work_dir = tempfile.mkdtemp(prefix="pesaprime-storage-")
+    try:
+        source_dir = os.path.join(work_dir, "source")
+        generate_dataset(args.users, seed=args.seed, data_dir=source_dir, progress=False)
+        results = benchmark(source_dir, work_dir, args.repeat)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'backend':<9} {'document':<22} {'load ms':>9} {'save ms':>9} {'size MB':>9}")
+    for backend, documents in results.items():
+        for document, metrics in documents.items():
+            print(f"{backend:<9} {document:<22} {metrics['load_ms']:>9.1f} {metrics['save_ms']:>9.1f} "
+                  f"{metrics['size_bytes'] / 1e6:>9.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"users": args.users, "results": results}, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
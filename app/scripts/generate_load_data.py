@@ -0,0 +1,408 @@
+# app/scripts/generate_load_data.py
+"""Generate production-sized synthetic datasets for load testing.
+
+Writes N users with wallets, investments and activity histories to the JSON
+store (streamed record by record, so memory stays flat) and/or to the SQL
+database (bulk inserts in batches). The same --seed always produces the same
+dataset.
+
+Usage:
+    python -m app.scripts.generate_load_data --users 100000 --data-dir /tmp/pesaprime
+    python -m app.scripts.generate_load_data --users 100000 --target sql --database-url sqlite:///./load.db
+
+The JSON target replaces the store files in --data-dir. Writing into the
+app's own DATA_DIR (live data) additionally requires --allow-app-data-dir.
+The SQL target replaces the users generated by an earlier run (and their
+wallets, investments, transactions and activities), so it can be rerun
+against the same database; other users are kept.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import string
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.main import DATA_DIR, PRODUCTION_ASSETS, TODAYS_BASE_PRICES, pwd_context
+from app.models.activity import Activity
+from app.models.rollup import rebuild_rollups
+from app.models.transaction import Investment, Transaction
+from app.models.user import User
+from app.models.wallet import Wallet
+
+DEFAULT_ANCHOR = "2025-11-18T00:00:00"
+DEFAULT_PASSWORD = "loadtest123"
+GENERATED_EMAIL = re.compile(r"loadtest\d+@pesaprime\.com")
+
+FIRST_NAMES = ["Amina", "Brian", "Cynthia", "David", "Esther", "Felix", "Grace", "Hassan",
+               "Irene", "James", "Kevin", "Lydia", "Mercy", "Njeri", "Otieno", "Purity",
+               "Kamau", "Wanjiru", "Achieng", "Mwangi"]
+LAST_NAMES = ["Odhiambo", "Kariuki", "Wambui", "Mutua", "Chebet", "Kiptoo", "Njoroge",
+              "Omondi", "Atieno", "Mohamed", "Ochieng", "Wafula", "Kimani", "Nyambura"]
+
+
+def all_assets():
+    """Flatten PRODUCTION_ASSETS into a single list"""
+    assets = []
+    for category_assets in PRODUCTION_ASSETS.values():
+        assets.extend(category_assets)
+    return assets
+
+
+def deterministic_password_hash(rng: random.Random, password: str):
+    """Hash the shared load-test password with a seed-derived salt"""
+    handler = pwd_context.handler()
+    salt = "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(8))
+    return handler.using(salt=salt).hash(password)
+
+
+def generate_user(rng: random.Random, index: int, anchor: datetime, assets: list,
+                  hashed_password: str, max_investments: int, max_activities: int):
+    """Generate one user together with their wallet, investments and activities.
+
+    Investment and activity ids are left unset; the writers assign them so they
+    stay sequential across the whole dataset.
+    """
+    created_at = anchor - timedelta(days=rng.uniform(1, 365), seconds=rng.randint(0, 86399))
+    phone_number = f"07{index:08d}"
+    user = {
+        "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "email": f"loadtest{index}@pesaprime.com",
+        "phone_number": phone_number,
+        "hashed_password": hashed_password,
+        "created_at": created_at,
+    }
+
+    # Every user starts like a real registration: account + welcome bonus
+    activities = [
+        {"activity_type": "registration", "amount": 0, "description": "User registered successfully",
+         "timestamp": created_at},
+        {"activity_type": "deposit", "amount": 5000, "description": "Welcome bonus deposited",
+         "timestamp": created_at},
+    ]
+    balance = 5000.0
+    span_seconds = max((anchor - created_at).total_seconds(), 1)
+
+    for _ in range(rng.randint(0, max_activities)):
+        timestamp = created_at + timedelta(seconds=rng.uniform(0, span_seconds))
+        if rng.random() < 0.7:
+            amount = round(rng.choice([500, 1000, 2000, 2500, 5000, 10000]) * rng.uniform(0.5, 2), 2)
+            balance += amount
+            activities.append({"activity_type": "deposit", "amount": amount,
+                               "description": f"Deposit of KSh {amount}", "timestamp": timestamp})
+        elif balance > 500:
+            amount = round(rng.uniform(100, balance / 2), 2)
+            balance -= amount
+            activities.append({"activity_type": "withdraw", "amount": amount,
+                               "description": f"Withdrawal of KSh {amount}", "timestamp": timestamp})
+
+    investments = []
+    positions_value = 0.0
+    for _ in range(rng.randint(0, max_investments)):
+        asset = rng.choice(assets)
+        if balance < asset["min_investment_kes"]:
+            break
+        invested_amount = round(rng.uniform(asset["min_investment_kes"], min(balance, 20000)), 2)
+        base_price = TODAYS_BASE_PRICES.get(asset["symbol"], 100)
+        entry_price = round(base_price * (1 + rng.uniform(-0.05, 0.05)), 4)
+        current_price = round(base_price * (1 + rng.uniform(-0.01, 0.01)), 4)
+        units = invested_amount / entry_price
+        current_value = units * current_price
+        profit_loss = current_value - invested_amount
+        hourly_income = round(rng.uniform(120, 350), 2)
+        total_income = round(hourly_income * asset["duration"], 2)
+        if rng.random() < 0.4:
+            # Still running at the anchor time
+            opened_at = anchor - timedelta(hours=rng.uniform(0, asset["duration"]))
+        else:
+            opened_at = created_at + timedelta(seconds=rng.uniform(0, span_seconds))
+        completion_time = opened_at + timedelta(hours=asset["duration"])
+
+        balance -= invested_amount
+        positions_value += current_value
+        investments.append({
+            "user_phone": phone_number,
+            "asset_id": asset["id"],
+            "asset_name": asset["name"],
+            "invested_amount": invested_amount,
+            "current_value": current_value,
+            "units": units,
+            "entry_price": entry_price,
+            "current_price": current_price,
+            "hourly_income": hourly_income,
+            "total_income": total_income,
+            "duration": asset["duration"],
+            "roi_percentage": round((total_income / asset["min_investment_kes"]) * 100, 1),
+            "profit_loss": profit_loss,
+            "profit_loss_percentage": (profit_loss / invested_amount) * 100,
+            "status": "active" if completion_time > anchor else "completed",
+            "created_at": opened_at,
+            "completion_time": completion_time,
+        })
+        activities.append({"activity_type": "investment", "amount": invested_amount,
+                           "description": f"Investment in {asset['name']} - {units:.4f} units",
+                           "timestamp": opened_at})
+
+    activities.sort(key=lambda a: a["timestamp"])
+    wallet = {"balance": round(balance, 2), "equity": round(balance + positions_value, 2), "currency": "KES"}
+    return {"user": user, "wallet": wallet, "investments": investments, "activities": activities}
+
+
+class JSONStreamWriter:
+    """Write a {key: record} JSON object one record at a time.
+
+    The file is written to a temporary path and moved into place on close, so
+    a half-written dataset never replaces a good one.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.tmp_filename = f"{filename}.tmp"
+        self.file = open(self.tmp_filename, "w")
+        self.file.write("{")
+        self.count = 0
+
+    def write(self, key: str, record: dict):
+        if self.count:
+            self.file.write(",")
+        self.file.write(f"\n  {json.dumps(key)}: {json.dumps(record)}")
+        self.count += 1
+
+    def close(self):
+        self.file.write("\n}\n" if self.count else "}\n")
+        self.file.close()
+        os.replace(self.tmp_filename, self.filename)
+
+
+class JSONStoreWriter:
+    """Stream generated users into the four JSON store files used by app.main"""
+
+    # Derived documents the app rebuilds on startup when they are missing
+    DERIVED_FILES = ("platform_rollups.json",)
+    DERIVED_DIRS = ("user_rollups",)
+
+    def __init__(self, data_dir: str):
+        os.makedirs(data_dir, exist_ok=True)
+        for name in self.DERIVED_FILES:
+            path = os.path.join(data_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+        for name in self.DERIVED_DIRS:
+            shutil.rmtree(os.path.join(data_dir, name), ignore_errors=True)
+        self.users = JSONStreamWriter(os.path.join(data_dir, "users.json"))
+        self.wallets = JSONStreamWriter(os.path.join(data_dir, "user_wallets.json"))
+        self.investments = JSONStreamWriter(os.path.join(data_dir, "user_investments.json"))
+        self.activities = JSONStreamWriter(os.path.join(data_dir, "user_activity.json"))
+
+    def add(self, bundle: dict):
+        user = dict(bundle["user"], created_at=bundle["user"]["created_at"].isoformat())
+        self.users.write(user["email"], user)
+        self.wallets.write(user["phone_number"], bundle["wallet"])
+
+        for investment in bundle["investments"]:
+            investment_id = str(self.investments.count + 1)
+            record = {"id": investment_id, **investment,
+                      "created_at": investment["created_at"].isoformat(),
+                      "completion_time": investment["completion_time"].isoformat()}
+            self.investments.write(investment_id, record)
+
+        for activity in bundle["activities"]:
+            activity_id = str(self.activities.count + 1)
+            self.activities.write(activity_id, {
+                "id": activity_id,
+                "user_phone": user["phone_number"],
+                "activity_type": activity["activity_type"],
+                "amount": activity["amount"],
+                "description": activity["description"],
+                "timestamp": activity["timestamp"].isoformat(),
+                "status": "completed",
+            })
+
+    def close(self):
+        for writer in (self.users, self.wallets, self.investments, self.activities):
+            writer.close()
+
+
+class SQLStoreWriter:
+    """Buffer generated users and flush them to the SQL models with bulk inserts.
+
+    Generated emails are the same on every run (loadtest{index}@pesaprime.com)
+    and unique in the users table, so users left by a previous run are
+    deleted with all their rows before anything is inserted.
+    """
+
+    TRANSACTION_TYPES = {"deposit": "deposit", "withdraw": "withdrawal"}
+
+    def __init__(self, database_url: str, batch_size: int):
+        connect_args = {"check_same_thread": False} if database_url.startswith("sqlite") else {}
+        self.engine = create_engine(database_url, connect_args=connect_args)
+        Base.metadata.create_all(bind=self.engine)
+        self.session = Session(self.engine)
+        self.batch_size = batch_size
+        self._clear_generated()
+        self.next_user_id = (self.session.query(User.id).order_by(User.id.desc()).limit(1).scalar() or 0) + 1
+        self._reset()
+
+    def _clear_generated(self):
+        user_ids = [user_id for user_id, email in
+                    self.session.query(User.id, User.email).filter(User.email.like("loadtest%@pesaprime.com"))
+                    if GENERATED_EMAIL.fullmatch(email)]
+        for start in range(0, len(user_ids), self.batch_size):
+            batch = user_ids[start:start + self.batch_size]
+            # Users last so no row is left pointing at a deleted user
+            for model in (Activity, Transaction, Investment, Wallet):
+                self.session.query(model).filter(model.user_id.in_(batch)).delete(synchronize_session=False)
+            self.session.query(User).filter(User.id.in_(batch)).delete(synchronize_session=False)
+        self.session.commit()
+
+    def _reset(self):
+        self.rows = {User: [], Wallet: [], Investment: [], Transaction: [], Activity: []}
+        self.pending = 0
+
+    def add(self, bundle: dict):
+        user_id = self.next_user_id
+        self.next_user_id += 1
+        user = bundle["user"]
+
+        self.rows[User].append({
+            "id": user_id,
+            "name": user["name"],
+            "email": user["email"],
+            "phone_number": user["phone_number"],
+            "hashed_password": user["hashed_password"],
+            "created_at": user["created_at"],
+        })
+        self.rows[Wallet].append(dict(bundle["wallet"], user_id=user_id, created_at=user["created_at"]))
+
+        for investment in bundle["investments"]:
+            self.rows[Investment].append({
+                "user_id": user_id,
+                **{key: investment[key] for key in (
+                    "asset_id", "asset_name", "invested_amount", "current_value", "units",
+                    "entry_price", "current_price", "profit_loss", "profit_loss_percentage",
+                    "status", "created_at", "completion_time")},
+            })
+
+        for activity in bundle["activities"]:
+            self.rows[Activity].append({
+                "user_id": user_id,
+                "type": activity["activity_type"],
+                "data": {"amount": activity["amount"], "description": activity["description"]},
+                "created_at": activity["timestamp"],
+            })
+            transaction_type = self.TRANSACTION_TYPES.get(activity["activity_type"])
+            if transaction_type and activity["amount"]:
+                self.rows[Transaction].append({
+                    "user_id": user_id,
+                    "type": transaction_type,
+                    "amount": activity["amount"],
+                    "description": activity["description"],
+                    "timestamp": activity["timestamp"],
+                    "status": "completed",
+                    "currency": "KES",
+                })
+
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # Users first so the foreign keys of the other tables resolve
+        for model, rows in self.rows.items():
+            if rows:
+                self.session.execute(insert(model), rows)
+        self.session.commit()
+        self._reset()
+
+    def close(self):
+        self.flush()
+        # Bulk inserts bypass the ORM events that maintain the rollups
+        rebuild_rollups(self.session)
+        self.session.close()
+        self.engine.dispose()
+
+
+def generate_dataset(users: int, seed: int = 42, target: str = "json", data_dir: Optional[str] = None,
+                     database_url: str = "sqlite:///./pesaprime_load.db", anchor: str = DEFAULT_ANCHOR,
+                     password: str = DEFAULT_PASSWORD, max_investments: int = 5,
+                     max_activities: int = 20, batch_size: int = 5000, progress: bool = True):
+    """Generate a deterministic dataset of `users` users and write it to the chosen target(s)"""
+    if target in ("json", "both") and data_dir is None:
+        raise ValueError("data_dir is required for the JSON target")
+    rng = random.Random(seed)
+    anchor_time = datetime.fromisoformat(anchor)
+    assets = all_assets()
+    hashed_password = deterministic_password_hash(rng, password)
+
+    writers = []
+    if target in ("json", "both"):
+        writers.append(JSONStoreWriter(data_dir))
+    if target in ("sql", "both"):
+        writers.append(SQLStoreWriter(database_url, batch_size))
+
+    started = time.perf_counter()
+    try:
+        for index in range(users):
+            bundle = generate_user(rng, index, anchor_time, assets, hashed_password,
+                                   max_investments, max_activities)
+            for writer in writers:
+                writer.add(bundle)
+            if progress and (index + 1) % batch_size == 0:
+                print(f"  {index + 1}/{users} users ({time.perf_counter() - started:.1f}s)")
+    finally:
+        for writer in writers:
+            writer.close()
+
+    elapsed = time.perf_counter() - started
+    if progress:
+        print(f"✅ Generated {users} users in {elapsed:.1f}s (seed={seed}, target={target})")
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Pesaprime dataset for load testing")
+    parser.add_argument("--users", type=int, default=100000, help="number of users to generate")
+    parser.add_argument("--seed", type=int, default=42, help="random seed (same seed, same dataset)")
+    parser.add_argument("--target", choices=["json", "sql", "both"], default="json")
+    parser.add_argument("--data-dir", help="directory for the JSON store files (required for the JSON target)")
+    parser.add_argument("--allow-app-data-dir", action="store_true",
+                        help=f"allow --data-dir to be the app's DATA_DIR ({DATA_DIR}), replacing its data")
+    parser.add_argument("--database-url", default="sqlite:///./pesaprime_load.db")
+    parser.add_argument("--anchor", default=DEFAULT_ANCHOR, help="ISO timestamp treated as 'now'")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD, help="password shared by every generated user")
+    parser.add_argument("--max-investments", type=int, default=5, help="max investments per user")
+    parser.add_argument("--max-activities", type=int, default=20, help="max extra deposits/withdrawals per user")
+    parser.add_argument("--batch-size", type=int, default=5000, help="users per SQL bulk insert")
+    args = parser.parse_args(argv)
+    if args.target in ("json", "both"):
+        if args.data_dir is None:
+            parser.error("--data-dir is required for --target json/both")
+        if os.path.realpath(args.data_dir) == os.path.realpath(DATA_DIR) and not args.allow_app_data_dir:
+            parser.error(f"{args.data_dir} is the app's DATA_DIR; pass --allow-app-data-dir to replace its data")
+
+    generate_dataset(
+        users=args.users,
+        seed=args.seed,
+        target=args.target,
+        data_dir=args.data_dir,
+        database_url=args.database_url,
+        anchor=args.anchor,
+        password=args.password,
+        max_investments=args.max_investments,
+        max_activities=args.max_activities,
+        batch_size=args.batch_size,
+    )
+
+
+if __name__ == "__main__":
+    main()
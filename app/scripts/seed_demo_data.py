@@ -2,8 +2,7 @@
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.models.wallet import Wallet
-from app.models.investment import Investment
-from app.models.transaction import Transaction
+from app.models.transaction import Transaction, Investment
 from datetime import datetime, timedelta
 import random
 
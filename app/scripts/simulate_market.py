@@ -0,0 +1,65 @@
+# app/scripts/simulate_market.py
+"""Generate synthetic price histories with the market simulator.
+
+Simulates `--assets` assets (the first ones are the production assets, the
+rest synthetic, spread over the asset types) for `--steps` ticks in batched
+calls and writes the path as a .npy array of shape (steps, assets), plus a
+JSON sidecar describing the columns.
+
+    python -m app.scripts.simulate_market --assets 5000 --steps 100000 --seed 1 --output prices.npy
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.core.simulation import DEFAULT_VOLATILITY, MarketSimulator
+
+
+def build_assets(count: int, seed: int):
+    from app.main import FALLBACK_ASSETS, TODAYS_BASE_PRICES
+
+    assets = [{"id": a["id"], "symbol": a["symbol"], "type": a["type"]} for a in FALLBACK_ASSETS][:count]
+    types = sorted(DEFAULT_VOLATILITY)
+    rng = np.random.default_rng(seed)
+    base_prices = dict(TODAYS_BASE_PRICES)
+    for i in range(len(assets), count):
+        symbol = f"SYN{i}"
+        assets.append({"id": symbol.lower(), "symbol": symbol, "type": types[i % len(types)]})
+        base_prices[symbol] = float(rng.lognormal(4, 1.5))
+    return assets, base_prices
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate correlated price paths for many assets")
+    parser.add_argument("--assets", type=int, default=1000)
+    parser.add_argument("--steps", type=int, default=10000)
+    parser.add_argument("--dt", type=float, default=5.0, help="seconds per tick")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="simulated seconds per second")
+    parser.add_argument("--batch", type=int, default=10000, help="ticks simulated per batched call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the path to this .npy file")
+    args = parser.parse_args(argv)
+
+    assets, base_prices = build_assets(args.assets, args.seed)
+    simulator = MarketSimulator.for_assets(assets, base_prices, dt=args.dt, time_scale=args.time_scale, seed=args.seed)
+
+    path = np.empty((args.steps, len(assets)), dtype=np.float64)
+    started = time.perf_counter()
+    for start in range(0, args.steps, args.batch):
+        steps = min(args.batch, args.steps - start)
+        path[start:start + steps] = simulator.simulate(steps)
+    elapsed = time.perf_counter() - started
+    print(f"{args.steps} ticks x {len(assets)} assets in {elapsed:.3f}s "
+          f"({args.steps * len(assets) / elapsed / 1e6:.1f}M prices/s)")
+
+    if args.output:
+        np.save(args.output, path)
+        with open(f"{args.output}.json", "w") as f:
+            json.dump({"assets": assets, "dt": args.dt, "time_scale": args.time_scale, "seed": args.seed}, f)
+    return path
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Downsampling of time series for charts."""
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the points Largest-Triangle-Three-Buckets keeps.
+
+    Keeps the first and last points and, from each of `threshold - 2` equal
+    buckets in between, the point forming the largest triangle with the point
+    kept from the previous bucket and the average of the next bucket. Peaks and
+    troughs survive, unlike with plain decimation. `x` must be increasing.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        if i + 2 < len(edges):
+            next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        ax, ay = x[previous], y[previous]
+        areas = np.abs((ax - next_x) * (y[start:end] - ay) - (ax - x[start:end]) * (next_y - ay))
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
@@ -0,0 +1,92 @@
+"""Snowflake-style record IDs: unique across workers, sortable by creation time.
+
+An ID is a positive 63-bit integer:
+
+    41 bits  milliseconds since EPOCH_MS (2024-01-01 UTC, good for ~69 years)
+    10 bits  node id, distinct per worker process
+    12 bits  sequence within the millisecond (4096 IDs per ms per node)
+
+Workers never coordinate: uniqueness comes from the node id. Within a
+process, IDs strictly increase. If the clock steps back, IDs keep counting
+from the last millisecond used, and a node that exhausts a millisecond's
+sequence borrows the next one. IDs therefore sort by creation time (to the
+millisecond, across nodes), and they are larger than any of the small
+sequential IDs used before.
+
+The node id is NODE_ID (0-1023), default 0. Processes generating IDs into
+the same data must have distinct node ids; nothing random is relied on.
+gunicorn.conf.py sets NODE_ID in each worker to NODE_ID_BASE plus the
+worker's slot (0 to workers-1, reused when a worker is replaced), so one
+host needs no configuration and several hosts need disjoint NODE_ID_BASE
+ranges. A single process (uvicorn without --workers) uses NODE_ID as is.
+"""
+import os
+import threading
+import time
+
+EPOCH_MS = 1704067200000
+
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODE_ID = (1 << NODE_BITS) - 1
+_SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+
+
+def default_node_id() -> int:
+    return int(os.getenv("NODE_ID", "0"))
+
+
+class SnowflakeGenerator:
+    def __init__(self, node_id: int):
+        if not 0 <= node_id <= MAX_NODE_ID:
+            raise ValueError(f"node id must be between 0 and {MAX_NODE_ID}")
+        self.node_id = node_id
+        self._node_bits = node_id << SEQUENCE_BITS
+        self._last_ms = -1
+        self._sequence = 0
+        # Uncontended on the event loop; guards calls from worker threads
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            now = max(time.time_ns() // 1_000_000, self._last_ms)
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & _SEQUENCE_MASK
+                if self._sequence == 0:
+                    now += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return ((now - EPOCH_MS) << (NODE_BITS + SEQUENCE_BITS)) | self._node_bits | self._sequence
+
+
+def id_timestamp(record_id: int) -> float:
+    """Creation time (Unix seconds) encoded in an ID"""
+    return ((int(record_id) >> (NODE_BITS + SEQUENCE_BITS)) + EPOCH_MS) / 1000
+
+
+# Created on first use, so a worker picks up the NODE_ID its server set after forking
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # A forked worker (gunicorn --preload) must not reuse its parent's node id
+    global _generator, _generator_lock
+    _generator = None
+    _generator_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def new_id() -> int:
+    """Next ID from this process's generator"""
+    global _generator
+    generator = _generator
+    if generator is None:
+        with _generator_lock:
+            if _generator is None:
+                _generator = SnowflakeGenerator(default_node_id())
+            generator = _generator
+    return generator.next_id()
@@ -0,0 +1,39 @@
+"""Single-flight coalescing of concurrent identical async calls."""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers with the
+    same key await the call already in flight and share its result (or
+    exception) instead of repeating the work.
+
+    The call runs as its own task, so a caller that is cancelled (a client
+    disconnecting) does not cancel it for the others. Nothing is cached: once
+    the call finishes, the next caller with that key starts a new one.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        # Callers served by a call started for someone else
+        self.shared = 0
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even when every caller went away
+            task.exception()
@@ -0,0 +1,52 @@
+# gunicorn.conf.py
+"""Gunicorn settings: uvicorn workers, one per CPU core by default.
+
+Several workers need shared state (DATA_BACKEND=sql); with the JSON-file
+store the worker count is forced to 1, since workers would overwrite each
+other's files.
+
+Environment:
+    PORT                 listen port (default 8000)
+    WEB_CONCURRENCY      number of workers (default: CPU count)
+    DATA_BACKEND         file (default) or sql
+    NODE_ID_BASE         first snowflake node id of this host's workers (default 0);
+                         hosts sharing a database need disjoint ranges
+"""
+import logging
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+if workers > 1 and os.getenv("DATA_BACKEND", "file") != "sql":
+    logging.getLogger("gunicorn.error").warning(
+        "DATA_BACKEND=file supports a single worker; set DATA_BACKEND=sql to run %d workers", workers)
+    workers = 1
+
+# Each worker runs its own startup (indexes, position store, price ticker)
+preload_app = False
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+# The client address behind a proxy is taken from X-Forwarded-For by the app
+# (TRUSTED_PROXY_HOPS); uvicorn's own handling would trust the leftmost,
+# client-supplied entry
+forwarded_allow_ips = "127.0.0.1"
+accesslog = None
+
+NODE_ID_BASE = int(os.getenv("NODE_ID_BASE", "0"))
+if NODE_ID_BASE + workers > 1024:
+    raise RuntimeError(f"NODE_ID_BASE={NODE_ID_BASE} leaves no room for {workers} worker node ids (max 1023)")
+
+
+def pre_fork(server, worker):
+    # Each worker takes the lowest slot no live worker holds, so node ids stay
+    # in NODE_ID_BASE..NODE_ID_BASE+workers-1 as workers are replaced
+    taken = {getattr(w, "node_slot", None) for w in server.WORKERS.values()}
+    worker.node_slot = next(slot for slot in range(len(taken) + 1) if slot not in taken)
+
+
+def post_fork(server, worker):
+    # Snowflake node id of this worker (app.utils.ids), read when it generates its first ID
+    os.environ["NODE_ID"] = str(NODE_ID_BASE + worker.node_slot)
@@ -4,5 +4,8 @@
 pip install --upgrade pip
 pip install -r requirements.txt
 
-# Start the application
-python -m uvicorn app.main:app --host 0.0.0.0 --port $PORT
\ No newline at end of file
+# Several workers share state through the database; DATA_BACKEND=file runs one worker
+export DATA_BACKEND="${DATA_BACKEND:-sql}"
+
+# Start the application (workers and shared-state settings in gunicorn.conf.py)
+exec gunicorn app.main:app -c gunicorn.conf.py
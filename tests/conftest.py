@@ -0,0 +1,72 @@
+import os
+import tempfile
+
+# app.main reads its configuration at import time: point it at a scratch data
+# directory and database before any test imports it
+_DATA_DIR = tempfile.mkdtemp(prefix="pesaprime-tests-")
+os.environ["DATA_DIR"] = _DATA_DIR
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DATA_DIR, 'test.db')}"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import itertools  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+
+from app import main  # noqa: E402
+from app.core.ratelimit import LocalBucketStore  # noqa: E402
+from app.core.sql_store import SQLDocumentStore  # noqa: E402
+
+_phone_numbers = itertools.count(1)
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limits():
+    """Every test starts with full buckets"""
+    main.rate_limiter.store = LocalBucketStore()
+    main.rate_limiter.enabled = True
+
+
+def register_user(client, password: str = "secret123") -> dict:
+    """Register a new user; returns its email, phone number, password and auth headers"""
+    n = next(_phone_numbers)
+    user = {"name": f"Test {n}", "email": f"test{n}@example.com", "phone_number": f"0711{n:06d}",
+            "password": password}
+    response = client.post("/api/auth/register", json=user)
+    assert response.status_code == 200, response.text
+    user["headers"] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return user
+
+
+@pytest.fixture
+def user(client):
+    user = register_user(client)
+    # Registration counts against the register_ip bucket; start the test itself with full buckets
+    main.rate_limiter.store = LocalBucketStore()
+    return user
+
+
+@pytest.fixture
+def sql_mode(client, tmp_path, monkeypatch):
+    """Run the app on a SQL document store (DATA_BACKEND=sql).
+
+    Returns a factory for more stores on the same database: each one plays
+    another worker.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'documents.db'}")
+
+    def worker_store():
+        return SQLDocumentStore(engine, main.store.backend)
+
+    monkeypatch.setattr(main, "store", worker_store())
+    monkeypatch.setattr(main, "_user_index", None)
+    monkeypatch.setattr(main, "_positions", None)
+    monkeypatch.setattr(main, "_positions_state", None)
+    return worker_store
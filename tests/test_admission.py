@@ -0,0 +1,107 @@
+import asyncio
+
+import httpx
+
+from app import main
+from app.core.admission import AdmissionClass, AdmissionMiddleware
+
+
+def test_slots_then_queue_then_shed():
+    async def run():
+        admission = AdmissionClass("test", concurrency=2, queue_size=1, queue_timeout=1.0)
+        assert await admission.acquire() is None
+        assert await admission.acquire() is None
+        queued = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+        assert not queued.done()
+        assert await admission.acquire() == "queue_full"
+        # A released slot goes straight to the queued request
+        admission.release()
+        assert await queued is None
+        assert admission.active == 2
+        admission.release()
+        admission.release()
+        assert admission.active == 0
+
+    asyncio.run(run())
+
+
+def test_queued_request_times_out():
+    async def run():
+        admission = AdmissionClass("test", concurrency=1, queue_size=4, queue_timeout=0.05)
+        await admission.acquire()
+        assert await admission.acquire() == "timeout"
+        assert not admission.waiters
+        admission.release()
+        assert admission.active == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        admission = AdmissionClass("test", concurrency=1, queue_size=4, queue_timeout=1.0)
+        await admission.acquire()
+        cancelled = asyncio.ensure_future(admission.acquire())
+        queued = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        # The slot skips the cancelled request
+        admission.release()
+        assert await queued is None
+        admission.release()
+        assert admission.active == 0 and not admission.waiters
+
+    asyncio.run(run())
+
+
+def test_class_override_from_environment(monkeypatch):
+    monkeypatch.setenv("ADMISSION_SAMPLE", "3,5,0.25")
+    admission = AdmissionClass("sample", 1, 1, 1.0)
+    assert (admission.concurrency, admission.queue_size, admission.queue_timeout) == (3, 5, 0.25)
+    assert admission.retry_after == 1
+
+
+def test_classification():
+    assert main.admission_class("GET", "/api/health") is None
+    assert main.admission_class("GET", "/api/stream/prices") is None
+    assert main.admission_class("OPTIONS", "/api/wallet/deposit") is None
+    assert main.admission_class("POST", "/api/wallet/deposit") is main.ADMISSION_CLASSES["write"]
+    assert main.admission_class("GET", "/api/assets/BTC") is main.ADMISSION_CLASSES["market"]
+    assert main.admission_class("GET", "/api/activities/export") is main.ADMISSION_CLASSES["export"]
+    assert main.admission_class("GET", "/api/wallet/pnl") is main.ADMISSION_CLASSES["read"]
+
+
+def test_route_limits_take_precedence_over_the_class():
+    register = main.admission_class("POST", "/api/auth/register")
+    assert register is main.ADMISSION_ROUTES[("POST", "/api/auth/register")]
+    assert register is not main.admission_class("POST", "/api/investments/buy")
+    assert main.admission_class("POST", "/api/wallet/deposit") is main.ADMISSION_CLASSES["write"]
+
+
+def test_middleware_sheds_with_503_and_retry_after():
+    admission = AdmissionClass("test", concurrency=1, queue_size=0, queue_timeout=2.5)
+
+    async def run():
+        started, finish = asyncio.Event(), asyncio.Event()
+
+        async def slow_app(scope, receive, send):
+            started.set()
+            await finish.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        app = AdmissionMiddleware(slow_app, classify=lambda method, path: admission, enabled=True)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            first = asyncio.ensure_future(client.get("/"))
+            await started.wait()
+            shed = await client.get("/")
+            finish.set()
+            return (await first), shed
+
+    first, shed = asyncio.run(run())
+    assert first.status_code == 200
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "3"
+    assert admission.active == 0
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from app.core import equity
+from app.core.equity import EquityStore
+from app.utils.downsampling import lttb
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "equity.bin")
+
+
+def test_unchanged_values_are_skipped_until_max_gap(path):
+    store = EquityStore(path, max_gap=100)
+    assert store.record(10, {"a": 1.0, "b": 2.0}) == 2
+    assert store.record(20, {"a": 1.0, "b": 3.0}) == 1
+    assert store.record(110, {"a": 1.0, "b": 3.0}) == 1
+    assert store.series("a")[0].tolist() == [10, 110]
+    assert store.series("b")[1].tolist() == [2.0, 3.0]
+
+
+def test_series_range_and_unknown_user(path):
+    store = EquityStore(path)
+    for ts in range(10, 60, 10):
+        store.record(ts, {"a": float(ts)})
+    assert store.series("a", 20, 40)[0].tolist() == [20, 30, 40]
+    assert store.series("a", start=45)[0].tolist() == [50]
+    assert len(store.series("nobody")[0]) == 0
+
+
+def test_series_combines_sorted_and_pending_records(path, monkeypatch):
+    monkeypatch.setattr(equity, "_MERGE_THRESHOLD", 4)
+    store = EquityStore(path)
+    store.record(1, {"a": 1.0, "b": 1.0})
+    store.record(2, {"a": 2.0, "b": 2.0})
+    # The fourth record triggered a merge
+    assert len(store.pending) == 0 and len(store.sorted) == 4
+    store.record(3, {"a": 3.0, "c": 3.0})
+    assert len(store.pending) == 2
+    assert store.series("a")[0].tolist() == [1, 2, 3]
+    assert store.series("a", start=2)[1].tolist() == [2.0, 3.0]
+    # A user added after the last merge only has pending records
+    assert store.series("c")[0].tolist() == [3]
+
+
+def test_reopened_store_merges_the_whole_log(path):
+    store = EquityStore(path)
+    store.record(2, {"b": 1.0, "a": 1.0})
+    store.record(3, {"a": 2.0})
+    reopened = EquityStore(path)
+    assert len(reopened) == 3 and len(reopened.pending) == 0
+    assert reopened.series("a")[0].tolist() == [2, 3]
+    # The last points are known again, so unchanged values stay skipped
+    assert reopened.record(4, {"a": 2.0, "b": 1.0}) == 0
+
+
+def test_workers_agree_on_user_indexes(path):
+    first, second = EquityStore(path), EquityStore(path)
+    first.record(1, {"a": 1.0})
+    # second has not read "a" yet and interns new users of its own
+    second.record(2, {"b": 2.0, "c": 3.0})
+    first.record(3, {"d": 4.0, "b": 5.0})
+    for store in (first, second, EquityStore(path)):
+        assert store.series("b")[1].tolist() == [2.0, 5.0]
+        assert store.series("d")[1].tolist() == [4.0]
+        assert store.users == ["a", "b", "c", "d"]
+
+
+def test_lttb_keeps_endpoints_and_the_peak():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    y[437] = 10
+    selected = lttb(x, y, 50)
+    assert len(selected) == 50
+    assert selected[0] == 0 and selected[-1] == 999
+    assert np.all(np.diff(selected) > 0)
+    assert 437 in selected
+
+
+@pytest.mark.parametrize("threshold", [0, 2, 10, 11])
+def test_lttb_returns_everything_when_it_cannot_reduce(threshold):
+    x = np.arange(10)
+    assert lttb(x, x * 2, threshold).tolist() == list(range(10))
+
+
+def test_lttb_on_three_points():
+    x = np.arange(5, dtype=float)
+    y = np.array([0, 1, 9, 1, 0], dtype=float)
+    assert lttb(x, y, 3).tolist() == [0, 2, 4]
+
+
+def test_interning_reads_users_added_since_the_last_refresh(path):
+    first, second = EquityStore(path), EquityStore(path)
+    # Both interned between second's refresh and its write
+    assert first._intern(["a", "b"]) == [0, 1]
+    assert second._intern(["c", "a"]) == [2, 0]
+    assert EquityStore(path).users == ["a", "b", "c"]
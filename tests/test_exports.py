@@ -0,0 +1,51 @@
+import csv
+import gzip
+import io
+import json
+
+from app.core import exports
+
+
+def deposit(client, user, amount):
+    client.post("/api/wallet/deposit", json={"amount": amount, "phone_number": user["phone_number"]},
+                headers=user["headers"])
+
+
+def test_statement_as_csv(client, user):
+    deposit(client, user, 100)
+    response = client.get("/api/activities/export", headers=user["headers"])
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"].endswith('.csv"')
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert tuple(rows[0]) == exports.ACTIVITY_COLUMNS
+    assert [row["amount"] for row in rows if row["activity_type"] == "deposit"][-1] == "100.0"
+
+
+def test_statement_filters_and_gzip(client, user):
+    deposit(client, user, 100)
+    response = client.get("/api/activities/export", headers=user["headers"],
+                          params={"format": "jsonl", "gzip": "true", "activity_type": "deposit"})
+    assert response.headers["content-type"] == "application/gzip"
+    rows = [json.loads(line) for line in gzip.decompress(response.content).decode().splitlines()]
+    assert {row["activity_type"] for row in rows} == {"deposit"}
+    assert rows[-1]["amount"] == 100
+    # An offset in the bounds is converted to UTC before comparing
+    later = client.get("/api/activities/export", headers=user["headers"],
+                       params={"format": "jsonl", "start": "2999-01-01T00:00:00+03:00"})
+    assert later.text == ""
+
+
+def test_start_after_end_is_rejected(client, user):
+    response = client.get("/api/activities/export", headers=user["headers"],
+                          params={"start": "2024-02-01T00:00:00", "end": "2024-01-01T00:00:00"})
+    assert response.status_code == 400
+
+
+def test_chunks_are_split_and_gzip_stream_is_whole(monkeypatch):
+    monkeypatch.setattr(exports, "CHUNK_SIZE", 100)
+    rows = [{"id": i, "amount": i * 10} for i in range(50)]
+    chunks = list(exports.export_chunks(iter(rows), ("id", "amount"), "csv", gzip=True))
+    assert len(chunks) > 1
+    lines = gzip.decompress(b"".join(chunks)).decode().splitlines()
+    assert lines[0] == "id,amount" and lines[-1] == "49,490" and len(lines) == 51
@@ -0,0 +1,29 @@
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from app.models.activity import Activity
+from app.models.transaction import Investment
+from app.models.user import User
+from app.scripts.generate_load_data import generate_dataset
+
+
+def counts(database_url):
+    with Session(create_engine(database_url)) as session:
+        return tuple(session.scalar(select(func.count()).select_from(model)) for model in (User, Investment, Activity))
+
+
+def test_sql_target_can_be_rerun(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'load.db'}"
+    generate_dataset(3, target="sql", database_url=database_url, progress=False)
+    first = counts(database_url)
+    assert first[0] == 3
+
+    with Session(create_engine(database_url)) as session:
+        session.add(User(name="Kept", email="kept@example.com", phone_number="0799999999", hashed_password="x"))
+        session.commit()
+
+    # Same emails again: the earlier run's users are replaced, not duplicated
+    generate_dataset(3, target="sql", database_url=database_url, progress=False)
+    assert counts(database_url) == (first[0] + 1,) + first[1:]
+    generate_dataset(2, target="sql", database_url=database_url, progress=False)
+    assert counts(database_url)[0] == 3
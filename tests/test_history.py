@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from app.core.history import CandleSeries, PriceHistory
+
+
+def naive_stats(ticks, capacity, window):
+    """Stats of the last tick, computed over the whole list"""
+    buffered = ticks[-capacity:]
+    latest, moving_average = buffered[-1], sum(buffered[-window:]) / len(buffered[-window:])
+    return {
+        "moving_average": moving_average,
+        "change_percentage": (latest / buffered[0] - 1) * 100,
+        "trend": "up" if latest >= moving_average else "down",
+    }
+
+
+@pytest.mark.parametrize("count", [1, 3, 5, 6, 11, 23])
+def test_stats_match_a_full_scan_across_wraps(count):
+    history = PriceHistory(["a", "b"], capacity=5, window=3, resolutions={})
+    ticks = [100 + (i * 7) % 11 for i in range(count)]
+    for timestamp, price in enumerate(ticks[:-1]):
+        history.record(timestamp, {"a": price, "b": price * 2})
+
+    stats = history.stats({"a": ticks[-1], "b": ticks[-1] * 2})
+    expected = naive_stats(ticks, 5, 3)
+    assert stats["a"]["moving_average"] == pytest.approx(expected["moving_average"])
+    assert stats["a"]["change_percentage"] == pytest.approx(expected["change_percentage"])
+    assert stats["a"]["trend"] == expected["trend"]
+    assert stats["b"]["moving_average"] == pytest.approx(expected["moving_average"] * 2)
+
+    # Recording the tick gives the state stats() described
+    history.record(count, {"a": ticks[-1], "b": ticks[-1] * 2})
+    assert len(history) == min(count, 5)
+    assert history.ticks[history.head, 0] == ticks[-1]
+    assert history.window_sum[0] == pytest.approx(sum(ticks[-3:]))
+
+
+def test_stats_with_an_empty_buffer():
+    history = PriceHistory(["a"], capacity=4, window=2, resolutions={})
+    assert history.stats({"a": 50}) == {"a": {"moving_average": 50, "change_percentage": 0, "trend": "up"}}
+    # Unknown assets are left out, and nothing is recorded
+    assert history.stats({"x": 1}) == {}
+    assert len(history) == 0
+
+
+def test_stats_with_a_single_sample():
+    history = PriceHistory(["a"], capacity=4, window=2, resolutions={})
+    history.record(1, {"a": 50})
+    stats = history.stats({"a": 40})["a"]
+    assert stats["moving_average"] == pytest.approx(45)
+    assert stats["change_percentage"] == pytest.approx(-20)
+    assert stats["trend"] == "down"
+
+
+def test_missing_assets_keep_their_last_price():
+    history = PriceHistory(["a", "b"], capacity=4, window=2, resolutions={})
+    history.record(1, {"a": 1, "b": 2})
+    history.record(2, {"a": 3})
+    assert history.ticks[history.head].tolist() == [3, 2]
+
+
+def test_stale_ticks_are_ignored():
+    history = PriceHistory(["a"], capacity=4, window=2, resolutions={})
+    assert history.record(10, {"a": 1})
+    assert not history.record(10, {"a": 2})
+    assert not history.record(9, {"a": 2})
+    assert len(history) == 1
+
+
+def test_invalid_window():
+    with pytest.raises(ValueError):
+        PriceHistory(["a"], capacity=4, window=5)
+
+
+def test_candles_at_bucket_edges():
+    history = PriceHistory(["a"], capacity=10, window=2, resolutions={"1m": 60})
+    for timestamp, price in [(60, 10), (90, 12), (100, 8), (119.999, 11), (120, 20), (179, 19), (300, 5)]:
+        history.record(timestamp, {"a": price})
+    assert history.candle_bars("a", "1m") == [
+        {"time": 60, "open": 10, "high": 12, "low": 8, "close": 11},
+        # A tick exactly on the boundary opens the next bar
+        {"time": 120, "open": 20, "high": 20, "low": 19, "close": 19},
+        # Empty buckets are skipped, not filled
+        {"time": 300, "open": 5, "high": 5, "low": 5, "close": 5},
+    ]
+    assert history.candle_bars("a", "1m", limit=1)[0]["time"] == 300
+    assert history.candle_bars("a", "5m") is None
+    assert history.candle_bars("x", "1m") is None
+
+
+def test_candle_ring_keeps_the_latest_bars():
+    series = CandleSeries(60, 1, capacity=3)
+    for minute in range(5):
+        series.update(minute * 60, np.array([float(minute)]))
+    assert [bar["time"] for bar in series.latest(0, 10)] == [120, 180, 240]
@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import market
+from app.core.compression import CompressionMiddleware
+
+
+@pytest.fixture
+def compress_any_size(monkeypatch):
+    # The test dataset's market body is below the compression threshold
+    monkeypatch.setattr(market, "COMPRESSION_MIN_SIZE", 0)
+
+
+def test_each_encoding_has_its_own_etag(client, compress_any_size):
+    identity = client.get("/api/assets/market", headers={"Accept-Encoding": "identity"})
+    gzipped = client.get("/api/assets/market", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in identity.headers
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert identity.headers["ETag"] != gzipped.headers["ETag"]
+    assert not gzipped.headers["ETag"].startswith("W/")
+
+
+def test_not_modified_only_for_the_same_encoding(client, compress_any_size):
+    gzipped = client.get("/api/assets/market", headers={"Accept-Encoding": "gzip"})
+    etag = gzipped.headers["ETag"]
+    revalidated = client.get("/api/assets/market", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == etag
+    # The identity representation is different bytes
+    other = client.get("/api/assets/market", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert other.status_code == 200
+
+
+def test_compression_weakens_strong_etags():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json"), (b"etag", b'"v1"')]})
+        await send({"type": "http.response.body", "body": b"[" + b"1," * 2000 + b"1]"})
+
+    async def run(accept_encoding):
+        transport = httpx.ASGITransport(app=CompressionMiddleware(app))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/", headers={"Accept-Encoding": accept_encoding})
+
+    compressed = asyncio.run(run("gzip"))
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["ETag"] == 'W/"v1"'
+    assert asyncio.run(run("identity")).headers["ETag"] == '"v1"'
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from starlette.middleware.cors import CORSMiddleware
+
+from app import main
+from app.core import idempotency
+from app.core.admission import AdmissionMiddleware
+from app.core.idempotency import (IdempotencyMiddleware, KeyInFlight, KeyReused, LocalIdempotencyStore,
+                                  SQLIdempotencyStore, StoredResponse)
+
+RESPONSE = StoredResponse("fp", 200, [("content-type", "application/json")], b'{"ok":true}')
+
+
+@pytest.fixture(params=["local", "sql"])
+def make_store(request, tmp_path):
+    """A factory: SQL stores made by one test share a database, like workers do"""
+    if request.param == "local":
+        store = LocalIdempotencyStore()
+        return lambda: store
+    engine = create_engine(f"sqlite:///{tmp_path / 'idempotency.db'}")
+    return lambda: SQLIdempotencyStore(engine)
+
+
+def test_completed_response_is_replayed(make_store):
+    async def run():
+        store = make_store()
+        assert await store.claim("k", "fp", wait=1) is None
+        store.complete("k", RESPONSE)
+        return await make_store().claim("k", "fp", wait=1)
+
+    assert asyncio.run(run()) == RESPONSE
+
+
+def test_key_reused_for_another_request(make_store):
+    async def run():
+        store = make_store()
+        await store.claim("k", "fp", wait=1)
+        with pytest.raises(KeyReused):
+            await make_store().claim("k", "other", wait=1)
+        store.complete("k", RESPONSE)
+        with pytest.raises(KeyReused):
+            await make_store().claim("k", "other", wait=1)
+
+    asyncio.run(run())
+
+
+def test_released_key_can_be_claimed_again(make_store):
+    async def run():
+        store = make_store()
+        await store.claim("k", "fp", wait=1)
+        store.release("k")
+        return await make_store().claim("k", "fp", wait=1)
+
+    assert asyncio.run(run()) is None
+
+
+def test_duplicate_gives_up_while_key_in_flight(make_store):
+    async def run():
+        await make_store().claim("k", "fp", wait=1)
+        with pytest.raises(KeyInFlight):
+            await make_store().claim("k", "fp", wait=0.1)
+
+    asyncio.run(run())
+
+
+def test_duplicate_waits_for_the_original(make_store):
+    async def run():
+        store = make_store()
+        await store.claim("k", "fp", wait=1)
+        duplicate = asyncio.ensure_future(make_store().claim("k", "fp", wait=2))
+        await asyncio.sleep(0.1)
+        assert not duplicate.done()
+        store.complete("k", RESPONSE)
+        return await duplicate
+
+    assert asyncio.run(run()) == RESPONSE
+
+
+def test_sql_abandoned_claim_expires(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'idempotency.db'}")
+
+    async def run():
+        # A worker claimed the key and died before completing or releasing it
+        monkeypatch.setattr(idempotency, "_CLAIM_TTL", -1.0)
+        await SQLIdempotencyStore(engine).claim("k", "fp", wait=1)
+        monkeypatch.setattr(idempotency, "_CLAIM_TTL", 60.0)
+        return await SQLIdempotencyStore(engine).claim("k", "fp", wait=1)
+
+    assert asyncio.run(run()) is None
+
+
+def test_idempotency_runs_outside_admission_control():
+    # user_middleware lists the outermost middleware first
+    order = [middleware.cls for middleware in main.app.user_middleware]
+    assert order.index(CORSMiddleware) < order.index(IdempotencyMiddleware) < order.index(AdmissionMiddleware)
+
+
+def test_retried_deposit_runs_once(client, user):
+    deposit = {"amount": 100, "phone_number": user["phone_number"]}
+    headers = dict(user["headers"], **{"Idempotency-Key": "deposit-1"})
+    first = client.post("/api/wallet/deposit", json=deposit, headers=headers)
+    retry = client.post("/api/wallet/deposit", json=deposit, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.content == first.content
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert client.get(f"/api/wallet/balance/{user['phone_number']}").json()["balance"] == 5100
+
+    other = client.post("/api/wallet/deposit", json=dict(deposit, amount=200), headers=headers)
+    assert other.status_code == 422
+
+
+def test_failed_request_is_not_replayed(client, user):
+    withdrawal = {"amount": 10000, "phone_number": user["phone_number"]}
+    headers = dict(user["headers"], **{"Idempotency-Key": "withdraw-1"})
+    assert client.post("/api/wallet/withdraw", json=withdrawal, headers=headers).status_code == 400
+    client.post("/api/wallet/deposit", json={"amount": 6000, "phone_number": user["phone_number"]},
+                headers=user["headers"])
+    # The error released the key: the retry runs again, and now succeeds
+    retry = client.post("/api/wallet/withdraw", json=withdrawal, headers=headers)
+    assert retry.status_code == 200
+    assert "Idempotent-Replayed" not in retry.headers
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from app import main
+from app.utils import ids
+from app.utils.ids import EPOCH_MS, MAX_NODE_ID, SnowflakeGenerator, id_timestamp
+
+
+def test_ids_increase_and_encode_node_and_time():
+    generator = SnowflakeGenerator(5)
+    generated = [generator.next_id() for _ in range(10000)]
+    assert generated == sorted(set(generated))
+    assert all((record_id >> ids.SEQUENCE_BITS) & MAX_NODE_ID == 5 for record_id in generated)
+    assert id_timestamp(generated[0]) >= EPOCH_MS / 1000
+
+
+def test_invalid_node_id():
+    with pytest.raises(ValueError):
+        SnowflakeGenerator(MAX_NODE_ID + 1)
+
+
+def test_clock_stepping_back_keeps_ids_increasing(monkeypatch):
+    generator = SnowflakeGenerator(1)
+    monkeypatch.setattr(ids.time, "time_ns", lambda: (EPOCH_MS + 1000) * 1_000_000)
+    first = generator.next_id()
+    monkeypatch.setattr(ids.time, "time_ns", lambda: (EPOCH_MS + 500) * 1_000_000)
+    assert generator.next_id() > first
+
+
+def test_exhausted_sequence_borrows_the_next_millisecond(monkeypatch):
+    generator = SnowflakeGenerator(1)
+    monkeypatch.setattr(ids.time, "time_ns", lambda: (EPOCH_MS + 1000) * 1_000_000)
+    generated = [generator.next_id() for _ in range(4097)]
+    assert len(set(generated)) == 4097
+    assert id_timestamp(generated[-1]) == (EPOCH_MS + 1001) / 1000
+
+
+def test_nodes_never_collide():
+    generators = [SnowflakeGenerator(node_id) for node_id in range(4)]
+    generated = []
+
+    def run(generator):
+        generated.extend(generator.next_id() for _ in range(5000))
+
+    threads = [threading.Thread(target=run, args=(generator,)) for generator in generators * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(generated)) == len(generated)
+
+
+def test_node_id_is_read_on_first_use(monkeypatch):
+    # As in a worker whose NODE_ID was set by gunicorn's post_fork hook
+    monkeypatch.setattr(ids, "_generator", None)
+    monkeypatch.setenv("NODE_ID", "7")
+    assert (ids.new_id() >> ids.SEQUENCE_BITS) & MAX_NODE_ID == 7
+    ids._reset_after_fork()
+    monkeypatch.setenv("NODE_ID", "8")
+    assert (ids.new_id() >> ids.SEQUENCE_BITS) & MAX_NODE_ID == 8
+
+
+def test_deposit_transaction_id_is_the_activity_id(client, user):
+    response = client.post("/api/wallet/deposit", json={"amount": 10, "phone_number": user["phone_number"]},
+                           headers=user["headers"])
+    transaction_id = response.json()["transaction_id"]
+    activities = main.load_data(main.USER_ACTIVITY_FILE)
+    assert transaction_id.startswith("DEP")
+    assert activities[transaction_id[3:]]["activity_type"] == "deposit"
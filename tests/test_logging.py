@@ -0,0 +1,45 @@
+import json
+import logging
+import queue
+import sys
+
+from app.core.logging_config import DroppingQueueHandler, JSONFormatter, parse_levels
+from app.core.metrics import LOG_RECORDS_DROPPED
+
+
+def make_record(msg, args=(), exc_info=None):
+    return logging.LogRecord("app.test", logging.ERROR, __file__, 1, msg, args, exc_info)
+
+
+def test_prepare_only_resolves_the_message():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        exc_info = sys.exc_info()
+    items = ["a"]
+    record = make_record("items: %s", (items,), exc_info)
+    prepared = DroppingQueueHandler(queue.Queue()).prepare(record)
+    items.append("b")
+    assert prepared.msg == "items: ['a']" and prepared.args is None
+    # The traceback is left to the listener's formatter
+    assert prepared.exc_info is exc_info and prepared.exc_text is None
+    assert record.args == (items,)
+
+    payload = json.loads(JSONFormatter().format(prepared))
+    assert payload["msg"] == "items: ['a']"
+    assert "ValueError: boom" in payload["exc"]
+
+
+def test_full_queue_drops_and_counts(client):
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    before = LOG_RECORDS_DROPPED._values[()]
+    for _ in range(3):
+        handler.handle(make_record("x"))
+    assert handler.dropped == 2
+    assert LOG_RECORDS_DROPPED._values[()] == before + 2
+    assert f"pesaprime_log_records_dropped_total {before + 2}" in client.get("/metrics").text
+
+
+def test_parse_levels():
+    assert parse_levels("app.main=debug, uvicorn.access=WARNING,bad") == {"app.main": "DEBUG",
+                                                                         "uvicorn.access": "WARNING"}
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+
+from app import main
+from app.core.market import PriceCache
+from app.core.serialization import JSONBackend
+from app.core.sql_store import SQLDocumentStore
+
+
+def worker(store):
+    """A PriceCache whose generator, like the market simulator, keeps its own state"""
+    state = {"price": 0.0, "previous": []}
+
+    async def generate(previous):
+        state["previous"].append(previous)
+        if previous:
+            state["price"] = previous[0]["current_price"]
+        state["price"] += 1
+        return [{"id": "a", "current_price": state["price"]}]
+
+    # ttl=0: every get() starts a new window
+    return PriceCache(generate, ttl=0, store=store, document="market_prices.json"), state
+
+
+def test_workers_extend_one_published_path(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'documents.db'}")
+    (first, first_state), (second, second_state) = (worker(SQLDocumentStore(engine, JSONBackend()))
+                                                   for _ in range(2))
+
+    async def run():
+        return [(await cache.get()).prices["a"] for cache in (first, second, first, first, second)]
+
+    # Each snapshot is one step from the last published one, whichever worker made either
+    assert asyncio.run(run()) == [1, 2, 3, 4, 5]
+    # A worker continues from its own state when it published the last snapshot itself
+    assert first_state["previous"] == [None, [{"id": "a", "current_price": 2}], None]
+    assert second_state["previous"] == [[{"id": "a", "current_price": 1}], [{"id": "a", "current_price": 4}]]
+
+
+def test_fallback_prices_resume_from_previous(monkeypatch):
+    # Put the shared simulator back afterwards
+    monkeypatch.setattr(main.market_simulator, "prices", main.market_simulator.prices.copy())
+    previous = [{"id": asset["id"], "current_price": price * 2}
+                for asset, price in zip(main.FALLBACK_ASSETS, main.market_simulator.prices)]
+    assets = asyncio.run(main.generate_fallback_prices(previous))
+    for asset, before in zip(assets, previous):
+        # One tick away from the previous snapshot, not from this process's own path
+        assert asset["current_price"] == pytest.approx(before["current_price"], rel=0.05)
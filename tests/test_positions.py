@@ -0,0 +1,12 @@
+from app.core.positions import to_epoch_us
+
+
+def test_to_epoch_us_reads_naive_timestamps_as_utc():
+    assert to_epoch_us("1970-01-01T00:00:01.000002") == 1_000_002
+    assert to_epoch_us(None) == to_epoch_us("") == 0
+
+
+def test_to_epoch_us_converts_offsets_to_utc():
+    utc = to_epoch_us("2025-01-01T09:00:00")
+    assert to_epoch_us("2025-01-01T12:00:00+03:00") == utc
+    assert to_epoch_us("2025-01-01T09:00:00+00:00") == utc
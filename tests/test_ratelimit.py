@@ -0,0 +1,125 @@
+import pytest
+from sqlalchemy import create_engine
+
+from app import main
+from app.core.ratelimit import Limit, LocalBucketStore, RateLimiter, SQLBucketStore
+
+
+@pytest.fixture(params=["local", "sql"])
+def bucket_store(request, tmp_path):
+    if request.param == "local":
+        return LocalBucketStore()
+    return SQLBucketStore(create_engine(f"sqlite:///{tmp_path / 'buckets.db'}"))
+
+
+def test_burst_then_shortfall(bucket_store):
+    limit = Limit("test", per_minute=60, burst=3)
+    assert [bucket_store.take("k", limit, now=100.0) for _ in range(3)] == [2, 1, 0]
+    # No token left: the shortfall is reported and nothing is taken
+    assert bucket_store.take("k", limit, now=100.0) == -1
+    assert bucket_store.take("k", limit, now=100.0) == -1
+
+
+def test_refill(bucket_store):
+    limit = Limit("test", per_minute=60, burst=3)
+    for _ in range(3):
+        bucket_store.take("k", limit, now=100.0)
+    # One token a second
+    assert bucket_store.take("k", limit, now=101.5) == pytest.approx(0.5)
+    assert bucket_store.take("k", limit, now=101.5) == pytest.approx(-0.5)
+    # Refilling stops at the burst size
+    assert bucket_store.take("k", limit, now=1000.0) == 2
+
+
+def test_keys_are_independent(bucket_store):
+    limit = Limit("test", per_minute=60, burst=1)
+    assert bucket_store.take("a", limit, now=100.0) == 0
+    assert bucket_store.take("a", limit, now=100.0) < 0
+    assert bucket_store.take("b", limit, now=100.0) == 0
+
+
+def test_local_sweep_drops_refilled_buckets():
+    limit = Limit("test", per_minute=60, burst=3)
+    store = LocalBucketStore()
+    store.take("old", limit, now=100.0)
+    store.take("recent", limit, now=110.0)
+    # "old" was full again at 101, "recent" is not until 111
+    store.sweep(now=105.0)
+    assert set(store.buckets) == {"recent"}
+    store.sweep(now=111.0)
+    assert len(store) == 0
+
+
+def test_sql_buckets_are_shared(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'buckets.db'}")
+    limit = Limit("test", per_minute=60, burst=2)
+    worker_a, worker_b = SQLBucketStore(engine), SQLBucketStore(engine)
+    assert worker_a.take("k", limit, now=100.0) == 1
+    assert worker_b.take("k", limit, now=100.0) == 0
+    assert worker_a.take("k", limit, now=100.0) < 0
+
+
+def test_retry_after_is_time_to_next_token():
+    limit = Limit("test", per_minute=30, burst=1)
+    limiter = RateLimiter(LocalBucketStore(), enabled=True)
+    assert limiter.check(limit, "k") is None
+    # Half a token a second: the next one is about two seconds away
+    assert limiter.check(limit, "k") == pytest.approx(2.0, abs=0.05)
+
+
+def test_disabled_limiter_allows_everything():
+    limit = Limit("test", per_minute=1, burst=1)
+    limiter = RateLimiter(LocalBucketStore(), enabled=False)
+    assert all(limiter.check(limit, "k") is None for _ in range(10))
+
+
+def test_limit_override_from_environment(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_SAMPLE", "120,7")
+    limit = Limit("sample", per_minute=1, burst=1)
+    assert (limit.rate, limit.burst) == (2.0, 7)
+
+
+def test_login_is_limited_per_account(client, user):
+    attempts = [client.post("/api/auth/login", json={"email": user["email"], "password": "wrong"})
+                for _ in range(main.RATE_LIMITS["login_account"].burst + 1)]
+    assert [r.status_code for r in attempts[:-1]] == [401] * main.RATE_LIMITS["login_account"].burst
+    limited = attempts[-1]
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 1
+    # The right password does not get past an empty bucket either
+    assert client.post("/api/auth/login", json={"email": user["email"], "password": user["password"]}).status_code == 429
+
+
+def test_register_is_limited_per_ip(client):
+    burst = main.RATE_LIMITS["register_ip"].burst
+    statuses = [
+        client.post("/api/auth/register", json={"name": "R", "email": f"reg{i}@example.com",
+                                                "phone_number": f"0722{i:06d}", "password": "secret123"}).status_code
+        for i in range(burst + 1)
+    ]
+    assert statuses == [200] * burst + [429]
+
+
+def test_deposit_is_limited_per_account(client, user):
+    burst = main.RATE_LIMITS["money_account"].burst
+    deposit = {"amount": 10, "phone_number": user["phone_number"]}
+    statuses = [client.post("/api/wallet/deposit", json=deposit, headers=user["headers"]).status_code
+                for _ in range(burst + 1)]
+    assert statuses == [200] * burst + [429]
+    balance = client.get(f"/api/wallet/balance/{user['phone_number']}").json()["balance"]
+    # The welcome bonus plus the deposits that got through
+    assert balance == 5000 + 10 * burst
+
+
+def test_per_ip_limits_ignore_spoofed_forwarded_for(client, monkeypatch):
+    monkeypatch.setattr(main, "TRUSTED_PROXY_HOPS", 1)
+    burst = main.RATE_LIMITS["register_ip"].burst
+    statuses = [
+        client.post("/api/auth/register",
+                    json={"name": "S", "email": f"spoof{i}@example.com", "phone_number": f"0733{i:06d}",
+                          "password": "secret123"},
+                    # A fresh leftmost entry per request; the proxy-appended entry stays the same
+                    headers={"X-Forwarded-For": f"10.9.0.{i}, 203.0.113.7"}).status_code
+        for i in range(burst + 1)
+    ]
+    assert statuses == [200] * burst + [429]
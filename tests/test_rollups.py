@@ -0,0 +1,112 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import main
+from app.core import rollups
+from app.database import Base
+from app.models.activity import Activity
+from app.models.rollup import ActivityRollup, AssetRollup, rebuild_rollups
+from app.models.transaction import Investment, Transaction
+from app.models.user import User
+
+ACTIVITIES = [
+    {"user_phone": "0700", "activity_type": "deposit", "amount": 100, "timestamp": "2025-01-01T09:00:00"},
+    {"user_phone": "0700", "activity_type": "deposit", "amount": 50.5, "timestamp": "2025-01-01T23:59:59"},
+    {"user_phone": "0711", "activity_type": "withdraw", "amount": 30, "timestamp": "2025-01-02T00:00:00"},
+    {"user_phone": "0700", "activity_type": "investment", "amount": 20, "timestamp": "2025-01-03T12:00:00"},
+]
+INVESTMENTS = [
+    {"asset_id": "BTC", "asset_name": "Bitcoin", "units": 0.5, "invested_amount": 20, "status": "active"},
+    {"asset_id": "BTC", "asset_name": "Bitcoin", "units": 0.25, "invested_amount": 10},
+    {"asset_id": "ETH", "asset_name": "Ether", "units": 1, "invested_amount": 5, "status": "completed"},
+]
+
+
+def test_incremental_updates_match_a_full_build():
+    user_rollups, platform_rollups = {}, {}
+    for activity in ACTIVITIES:
+        rollups.add_activity(user_rollups.setdefault(activity["user_phone"], {}), platform_rollups,
+                             activity["activity_type"], activity["amount"], activity["timestamp"])
+    for investment in INVESTMENTS[:2]:
+        rollups.add_position(platform_rollups, investment["asset_id"], investment["asset_name"],
+                             investment["units"], investment["invested_amount"])
+
+    assert (user_rollups, platform_rollups) == rollups.build_rollups(ACTIVITIES, INVESTMENTS)
+    assert user_rollups["0700"]["2025-01-01"] == {"deposit": {"count": 2, "amount": 150.5}}
+    assert platform_rollups["assets"] == {"BTC": {"name": "Bitcoin", "positions": 2, "units": 0.75, "invested": 30}}
+
+
+def test_daily_range_and_totals():
+    days = rollups.build_rollups(ACTIVITIES, [])[1]["daily"]
+    selected = rollups.daily_range(days, "2025-01-02", "2025-01-03")
+    assert list(selected) == ["2025-01-02", "2025-01-03"]
+    assert list(rollups.daily_range(days, end="2025-01-01")) == ["2025-01-01"]
+    assert rollups.totals(days) == {"deposit": {"count": 2, "amount": 150.5}, "withdraw": {"count": 1, "amount": 30},
+                                    "investment": {"count": 1, "amount": 20}}
+
+
+def test_app_rollups_match_a_rebuild_from_history(client, user):
+    phone_number = user["phone_number"]
+    client.post("/api/wallet/deposit", json={"amount": 300, "phone_number": phone_number}, headers=user["headers"])
+    client.post("/api/wallet/withdraw", json={"amount": 100, "phone_number": phone_number}, headers=user["headers"])
+    bought = client.post("/api/investments/buy", headers=user["headers"],
+                         json={"asset_id": "bitcoin", "amount": 1000, "phone_number": phone_number})
+    assert bought.status_code == 200
+
+    user_rollups, platform_rollups = rollups.build_rollups(
+        main.load_data(main.USER_ACTIVITY_FILE).values(), main.load_data(main.USER_INVESTMENTS_FILE).values())
+    assert main.load_data(main.user_rollups_file(phone_number)) == user_rollups[phone_number]
+    assert main.load_data(main.PLATFORM_ROLLUPS_FILE) == platform_rollups
+    assert platform_rollups["assets"]["bitcoin"]["positions"] == 1
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rollups.db'}")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        session.add(User(id=1, name="A", email="a@example.com", phone_number="0700", hashed_password="x"))
+        session.commit()
+        yield session
+
+
+def rollup_rows(db):
+    activity = sorted((row.user_id, str(row.day), row.source, row.activity_type, row.count, round(row.amount, 2))
+                      for row in db.query(ActivityRollup))
+    assets = sorted((row.asset_id, row.asset_name, row.positions, row.units, row.invested_amount)
+                    for row in db.query(AssetRollup))
+    return activity, assets
+
+
+def test_listeners_update_rollups_and_match_a_rebuild(db):
+    day = datetime(2025, 1, 1, 10)
+    db.add_all([
+        Activity(user_id=1, type="deposit", data={"amount": 100}, created_at=day),
+        Activity(user_id=1, type="deposit", data={"amount": 25}, created_at=day),
+        Activity(user_id=1, type="login", data=None, created_at=day),
+        Transaction(user_id=1, type="deposit", amount=100, timestamp=day),
+        Investment(user_id=1, asset_id="BTC", asset_name="Bitcoin", units=0.5, invested_amount=20),
+        Investment(user_id=1, asset_id="BTC", asset_name="Bitcoin", units=0.5, invested_amount=30),
+        Investment(user_id=1, asset_id="ETH", asset_name="Ether", units=1, invested_amount=5, status="closed"),
+    ])
+    db.commit()
+
+    incremental = rollup_rows(db)
+    assert incremental == (
+        [(1, "2025-01-01", "activity", "deposit", 2, 125), (1, "2025-01-01", "activity", "login", 1, 0),
+         (1, "2025-01-01", "transaction", "deposit", 1, 100)],
+        [("BTC", "Bitcoin", 2, 1.0, 50.0)],
+    )
+    rebuild_rollups(db)
+    assert rollup_rows(db) == incremental
+
+
+def test_rolled_back_insert_leaves_rollups_unchanged(db):
+    db.add(Transaction(user_id=1, type="deposit", amount=100, timestamp=datetime(2025, 1, 1)))
+    db.flush()
+    assert db.query(ActivityRollup).count() == 1
+    db.rollback()
+    assert db.query(ActivityRollup).count() == 0
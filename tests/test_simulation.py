@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from app.core.simulation import MarketSimulator
+
+
+def simulator(seed=7):
+    return MarketSimulator([100.0, 50.0, 1.0], [0.8, 0.3, 0.1], sectors=[0, 1, 1], seed=seed)
+
+
+def test_zero_steps_is_an_empty_path():
+    market = simulator()
+    path = market.simulate(0)
+    assert path.shape == (0, 3)
+    np.testing.assert_array_equal(market.prices, [100.0, 50.0, 1.0])
+    assert market.tick == 0
+
+
+def test_negative_steps():
+    with pytest.raises(ValueError):
+        simulator().simulate(-1)
+
+
+def test_seed_reproduces_the_path():
+    np.testing.assert_array_equal(simulator().simulate(100), simulator().simulate(100))
+
+
+def test_path_continues_across_calls():
+    market = simulator()
+    first = market.simulate(10)
+    market.simulate(5)
+    assert market.tick == 15
+    np.testing.assert_array_equal(first.shape, (10, 3))
+    assert (first > 0).all()
+
+
+def test_resume_continues_from_given_prices():
+    market = simulator()
+    market.simulate(10)
+    market.resume([200.0, 100.0, 2.0])
+    np.testing.assert_allclose(market.step(), [200.0, 100.0, 2.0], rtol=0.05)
@@ -0,0 +1,64 @@
+from app import main
+from conftest import register_user
+
+
+def buy(client, user, amount=500):
+    response = client.post("/api/investments/buy", headers=user["headers"],
+                           json={"asset_id": "bitcoin", "amount": amount, "phone_number": user["phone_number"]})
+    assert response.status_code == 200, response.text
+    return response.json()["investment"]
+
+
+def test_buy_after_another_worker_added_positions(client, sql_mode):
+    other_worker = sql_mode()
+    user = register_user(client)
+    buy(client, user)
+    # Another worker bought something: it bumps the positions marker
+    other_worker.save({"count": 1}, main.POSITIONS_STATE_FILE)
+    buy(client, user)
+
+    assert len(main.get_positions().for_user(user["phone_number"])) == 2
+    investments = client.get(f"/api/investments/my/{user['phone_number']}").json()
+    assert len(investments) == 2
+    assert sum(investment["invested_amount"] for investment in investments) == 1000
+
+
+def test_positions_added_by_another_worker_are_appended(client, sql_mode):
+    user = register_user(client)
+    buy(client, user)
+    positions = main.get_positions()
+
+    # Another worker's buy: the investment document and the positions marker
+    other_worker = sql_mode()
+    investments = other_worker.load(main.USER_INVESTMENTS_FILE)
+    investment = dict(next(iter(investments.values())), id="42")
+    investments["42"] = investment
+    other_worker.save(investments, main.USER_INVESTMENTS_FILE)
+    marker = other_worker.load(main.POSITIONS_STATE_FILE)
+    other_worker.save({"count": marker["count"] + 1, "recent": marker["recent"] + [investment]},
+                      main.POSITIONS_STATE_FILE)
+
+    assert main.get_positions() is positions
+    assert 42 in positions.for_user(user["phone_number"])["id"].tolist()
+    assert len(positions.for_user(user["phone_number"])) == 2
+
+
+def test_store_is_rebuilt_when_the_marker_does_not_cover_the_gap(client, sql_mode):
+    user = register_user(client)
+    buy(client, user)
+    positions = main.get_positions()
+    sql_mode().save({"count": len(positions) + 1, "recent": []}, main.POSITIONS_STATE_FILE)
+    assert main.get_positions() is not positions
+
+
+def test_reading_investments_writes_nothing(client, sql_mode):
+    user = register_user(client)
+    buy(client, user)
+    saved = main.store.mtime(main.USER_INVESTMENTS_FILE)
+    investments = client.get(f"/api/investments/my/{user['phone_number']}").json()
+    assert client.get(f"/api/wallet/balance/{user['phone_number']}").status_code == 200
+    assert client.get("/api/dashboard", headers=user["headers"]).status_code == 200
+    assert main.store.mtime(main.USER_INVESTMENTS_FILE) == saved
+    # Valued at the current price all the same
+    investment = investments[0]
+    assert investment["current_value"] == investment["units"] * investment["current_price"]
@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import create_engine
+
+from app.core.serialization import DataStore, JSONBackend
+from app.core.sql_store import SQLDocumentStore
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'documents.db'}")
+
+
+def test_save_and_load(engine):
+    store = SQLDocumentStore(engine, JSONBackend())
+    assert not store.exists("/data/users.json")
+    assert store.load("/data/users.json", default={}) == {}
+    store.save({"a": 1}, "/data/users.json")
+    assert store.exists("/data/users.json")
+    # Documents are named by file name, wherever the path points
+    assert store.load("/elsewhere/users.json") == {"a": 1}
+
+
+def test_rolled_back_transaction_leaves_no_trace(engine):
+    store = SQLDocumentStore(engine, JSONBackend())
+    store.save({"balance": 100}, "wallets.json")
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.save({"balance": 0}, "wallets.json")
+            store.save({"x": 1}, "new.json")
+            raise RuntimeError
+    assert store.load("wallets.json") == {"balance": 100}
+    assert not store.exists("new.json")
+    assert SQLDocumentStore(engine, JSONBackend()).load("wallets.json") == {"balance": 100}
+
+
+def test_nested_transactions_join_the_outer_one(engine):
+    store = SQLDocumentStore(engine, JSONBackend())
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            with store.transaction():
+                store.save({"a": 1}, "doc.json")
+            raise RuntimeError
+    assert not store.exists("doc.json")
+
+
+def test_writes_by_another_worker_move_mtime_and_are_read(engine):
+    worker_a, worker_b = SQLDocumentStore(engine, JSONBackend()), SQLDocumentStore(engine, JSONBackend())
+    worker_a.save({"v": 1}, "doc.json")
+    assert worker_b.load("doc.json") == {"v": 1}
+    seen = worker_a.mtime("doc.json")
+    # Two saves in the same clock tick still move mtime forward
+    worker_b.save({"v": 2}, "doc.json")
+    worker_b.save({"v": 3}, "doc.json")
+    assert worker_a.mtime("doc.json") > seen
+    # worker_a's cached body is stale: the new version is fetched
+    assert worker_a.load("doc.json") == {"v": 3}
+
+
+def test_unchanged_document_is_served_from_the_cache(engine):
+    store = SQLDocumentStore(engine, JSONBackend())
+    store.save({"v": 1}, "doc.json")
+    version = store._cache["doc"][0]
+    assert store.load("doc.json") == {"v": 1}
+    assert store._cache["doc"][0] == version
+
+
+def test_documents_are_migrated_from_json_files(engine, tmp_path):
+    files = DataStore(JSONBackend())
+    path = str(tmp_path / "users.json")
+    files.save({"u@example.com": {"name": "U"}}, path)
+
+    store = SQLDocumentStore(engine, JSONBackend(), fallback=files)
+    assert store.mtime(path) == files.mtime(path)
+    assert store.load(path) == {"u@example.com": {"name": "U"}}
+    # Imported once: later file changes are not picked up, the table is the source of truth
+    files.save({}, path)
+    assert SQLDocumentStore(engine, JSONBackend(), fallback=files).load(path) == {"u@example.com": {"name": "U"}}
@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import numpy as np
+
+from app import main
+from app.core.positions import POSITION_DTYPE
+from app.core.streaming import Broadcaster, PortfolioTracker, StreamMessage
+
+
+def test_message_frames():
+    message = StreamMessage("prices", {"a": 1}, id=7)
+    assert message.sse == b'event: prices\nid: 7\ndata: {"a":1}\n\n'
+    assert json.loads(message.ws) == {"event": "prices", "id": 7, "data": {"a": 1}}
+    assert json.loads(StreamMessage("ping", b"[]").ws)["id"] is None
+
+
+def test_subscribe_and_unsubscribe():
+    broadcaster = Broadcaster()
+    anonymous = broadcaster.subscribe()
+    first, second = broadcaster.subscribe("0700"), broadcaster.subscribe("0700")
+    assert len(broadcaster) == 3
+    assert not broadcaster.unsubscribe(anonymous)
+    assert not broadcaster.unsubscribe(first)
+    # The user's last subscription
+    assert broadcaster.unsubscribe(second)
+    assert len(broadcaster) == 0 and not broadcaster.by_phone
+    assert not broadcaster.unsubscribe(second)
+
+
+def test_publish_to_reaches_only_that_user():
+    broadcaster = Broadcaster()
+    mine, theirs, anonymous = broadcaster.subscribe("0700"), broadcaster.subscribe("0711"), broadcaster.subscribe()
+    broadcaster.publish(StreamMessage("prices", {}, id=1))
+    broadcaster.publish_to("0700", StreamMessage("portfolio", {}, id=1))
+    assert [mine.queue.qsize(), theirs.queue.qsize(), anonymous.queue.qsize()] == [2, 1, 1]
+
+
+def test_slow_consumer_keeps_the_newest_messages():
+    broadcaster = Broadcaster(max_pending=2)
+    slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+
+    async def run():
+        received = []
+        for version in range(1, 5):
+            broadcaster.publish(StreamMessage("prices", {}, id=version))
+            received.append((await fast.get(timeout=1)).id)
+        return received, [(await slow.get(timeout=1)).id for _ in range(2)], await slow.get(timeout=0.01)
+
+    received, pending, empty = asyncio.run(run())
+    assert received == [1, 2, 3, 4]
+    assert pending == [3, 4] and empty is None
+    assert slow.dropped == 2 and broadcaster.dropped() == 2
+
+
+def test_message_already_sent_is_not_repeated():
+    subscription = Broadcaster().subscribe()
+    subscription.offer(StreamMessage("prices", {}, id=5))
+    subscription.offer(StreamMessage("prices", {}, id=5))
+    subscription.offer(StreamMessage("prices", {}, id=4))
+    subscription.offer(StreamMessage("portfolio", {}, id=5))
+    assert subscription.queue.qsize() == 2
+
+
+class FakePositions:
+    def __init__(self, holdings):
+        self.holdings = holdings
+        self.price_vectors = 0
+
+    def price_vector(self, prices):
+        self.price_vectors += 1
+        return np.array([prices.get("a", np.nan), prices.get("b", np.nan)])
+
+    def for_user(self, phone_number):
+        positions = np.zeros(len(self.holdings.get(phone_number, [])), dtype=POSITION_DTYPE)
+        for position, (asset, units, entry_price) in zip(positions, self.holdings.get(phone_number, [])):
+            position["asset"], position["units"], position["entry_price"] = asset, units, entry_price
+            position["invested_amount"] = units * entry_price
+        return positions
+
+
+def test_update_all_refreshes_positions_once():
+    store = FakePositions({"0700": [(0, 2, 10.0)], "0711": [(0, 1, 10.0), (1, 1, 5.0)]})
+    calls = []
+    tracker = PortfolioTracker(lambda: calls.append(1) or store)
+
+    first = tracker.update_all(["0700", "0711"], {"a": 10.0, "b": 5.0})
+    assert first["0700"]["current_value"] == 20 and first["0711"]["current_value"] == 15
+    assert len(calls) == 1 and store.price_vectors == 1
+
+    # Only portfolios whose value moved; a missing price counts at entry
+    assert tracker.update_all(["0700", "0711"], {"a": 10.0}) == {}
+    moved = tracker.update_all(["0700", "0711"], {"a": 11.0})
+    assert moved["0700"]["change"] == 2 and moved["0700"]["profit_loss"] == 2
+    assert len(calls) == 3 and store.price_vectors == 3
+    assert tracker.update("0700", {"a": 11.0}, force=True)["current_value"] == 22
+
+
+def test_publish_snapshot_refreshes_positions_once_per_tick(client, user, monkeypatch):
+    broadcaster = Broadcaster()
+    refreshes = []
+    tracker = PortfolioTracker(lambda: refreshes.append(1) or main.get_positions())
+    monkeypatch.setattr(main, "broadcaster", broadcaster)
+    monkeypatch.setattr(main, "portfolio_tracker", tracker)
+    subscriptions = [broadcaster.subscribe(user["phone_number"]), broadcaster.subscribe("0799000000"),
+                     broadcaster.subscribe()]
+
+    snapshot = asyncio.run(main.get_price_snapshot())
+    main.publish_snapshot(snapshot)
+    assert len(refreshes) == 1
+    # Prices to everyone, plus a first portfolio to each signed-in subscriber
+    assert [subscription.queue.qsize() for subscription in subscriptions] == [2, 2, 1]